@@ -21,7 +21,8 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-**c03#-+epz3&(*30_7h0961ic=vovsppt*t=9%vrznsrwqakf'
+# Esta clave solo sirve para desarrollo; settings_produccion.py exige DJANGO_SECRET_KEY
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', 'django-insecure-**c03#-+epz3&(*30_7h0961ic=vovsppt*t=9%vrznsrwqakf')
 
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
@@ -42,11 +43,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'descuentoGasApp.middleware.MetricasMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'descuentoGasApp.middleware.RolesMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -74,12 +77,15 @@ WSGI_APPLICATION = 'descuentoGas.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Las credenciales se leen del entorno (ver DOCS.md, Configuración de Base de Datos)
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.mysql',
-        'NAME': 'descuentogas_db',
-        'USER': 'root',
-        'PASSWORD': 'root1234',
+        'NAME': os.environ.get('DB_NAME', 'descuentogas_db'),
+        'USER': os.environ.get('DB_USER', 'root'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+        'HOST': os.environ.get('DB_HOST', ''),
+        'PORT': os.environ.get('DB_PORT', ''),
     }
 }
 
@@ -133,6 +139,60 @@ LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/'
 
+# Configuración de solicitudes
+SOLICITUDES_POR_PAGINA = 50
+
+# Vigencia de una solicitud aceptada antes de pasar a 'Expirada'
+SOLICITUD_VIGENCIA_DIAS = 30
+
+# Descuentos que una solicitud aceptada puede canjear por mes calendario
+CANJES_POR_MES = 1
+
+# Ingreso diferido: el formulario público anota las solicitudes en un diario
+# SQLite local y el comando procesar_ingresos las inserta por lotes. Requiere
+# que procesar_ingresos --continuo esté corriendo en el mismo servidor.
+INGRESO_DIFERIDO = False
+INGRESO_DIARIO = BASE_DIR / 'ingreso_diario.sqlite3'
+INGRESO_DIARIO_RETENCION_DIAS = 30
+
+# Caché
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+# Caché de búsquedas por RUT: alias de CACHES y duración en segundos.
+# Los RUT sin solicitud se guardan menos tiempo para que un ingreso nuevo se vea pronto.
+CACHE_RUT = 'default'
+CACHE_RUT_TTL = 300
+CACHE_RUT_TTL_NEGATIVO = 30
+
+# Caché de páginas completas (inicio, dashboard del vendedor y perfil). Cada
+# entrada depende de los roles o de los datos del usuario, así que no hay que
+# invalidarla; tras un despliegue con cambios en templates conviene vaciarla.
+CACHE_PAGINAS = 'default'
+CACHE_PAGINAS_TTL = 600
+
+# Límites de peticiones POST: regla -> (peticiones, ventana en segundos).
+# Se cuentan en el caché LIMITES_CACHE, que debe ser compartido entre procesos
+# en producción. Una regla ausente no se aplica.
+LIMITES_CACHE = 'default'
+LIMITES_PETICIONES = {
+    'ingreso_ip': (20, 3600),
+    'ingreso_rut': (3, 3600),
+    'login_ip': (30, 300),
+    'login_email': (5, 300),
+}
+# Clave de request.META con la IP del cliente cuando hay un proxy delante
+# (por ejemplo 'HTTP_X_REAL_IP'); None usa REMOTE_ADDR
+LIMITES_CABECERA_IP = None
+
+# Métricas: fracción de peticiones medidas (0 a 1) y repeticiones de una
+# misma consulta en una petición a partir de las cuales se marca como N+1
+METRICAS_MUESTREO = 0.1
+METRICAS_UMBRAL_N_MAS_1 = 10
+
 # Configuración de mensajes
 from django.contrib.messages import constants as messages
 MESSAGE_TAGS = {
@@ -0,0 +1,20 @@
+"""
+Configuración para los benchmarks: igual a settings.py pero con una base de
+datos SQLite propia, para no tocar la base MySQL.
+
+    python manage.py migrate --settings=descuentoGas.settings_benchmark
+    python manage.py generar_solicitudes 100000 --semilla 1 --settings=descuentoGas.settings_benchmark
+    python manage.py benchmark --settings=descuentoGas.settings_benchmark
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'benchmark.sqlite3',
+        # En archivo y no en memoria, para que los tests con hilos esperen los bloqueos
+        'TEST': {'NAME': BASE_DIR / 'benchmark_test.sqlite3'},
+    }
+}
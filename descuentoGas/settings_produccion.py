@@ -0,0 +1,98 @@
+"""
+Configuración de producción. Parte de settings.py y toma del entorno todo lo
+que depende del servidor:
+
+    DJANGO_SETTINGS_MODULE=descuentoGas.settings_produccion
+
+Variables obligatorias: DJANGO_SECRET_KEY, DJANGO_ALLOWED_HOSTS, DB_PASSWORD,
+DJANGO_CACHE_BACKEND.
+Opcionales: DB_NAME, DB_USER, DB_HOST, DB_PORT, DB_CONN_MAX_AGE,
+DJANGO_CACHE_LOCATION, DJANGO_STATIC_ROOT, DJANGO_COOKIES_SEGURAS,
+DJANGO_DETRAS_DE_PROXY.
+Al iniciar, wsgi.py/asgi.py ejecutan `check --deploy` (ver checks.py).
+"""
+
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES, TEMPLATES
+
+
+def _requerida(nombre):
+    valor = os.environ.get(nombre)
+    if not valor:
+        raise ImproperlyConfigured(f'Falta la variable de entorno {nombre}')
+    return valor
+
+
+def _booleana(nombre, defecto):
+    valor = os.environ.get(nombre)
+    if valor is None:
+        return defecto
+    return valor.strip().lower() in ('1', 'true', 'si', 'sí', 'yes')
+
+
+DEBUG = False
+
+SECRET_KEY = _requerida('DJANGO_SECRET_KEY')
+
+ALLOWED_HOSTS = [host.strip() for host in _requerida('DJANGO_ALLOWED_HOSTS').split(',') if host.strip()]
+
+# Conexiones persistentes: se reutilizan entre peticiones durante DB_CONN_MAX_AGE
+# segundos y se verifican antes de usarlas, en vez de abrir una por petición
+DATABASES['default'].update({
+    'PASSWORD': _requerida('DB_PASSWORD'),
+    'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+    'CONN_HEALTH_CHECKS': True,
+})
+
+# Plantillas compiladas una vez por proceso
+TEMPLATES[0]['APP_DIRS'] = False
+TEMPLATES[0]['OPTIONS']['loaders'] = [
+    ('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]),
+]
+
+# Caché compartido entre procesos, obligatorio: la revocación de roles, la
+# invalidación de búsquedas por RUT y los límites de peticiones pasan por él.
+# Por ejemplo:
+# DJANGO_CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# DJANGO_CACHE_LOCATION=redis://127.0.0.1:6379/1
+CACHES = {
+    'default': {
+        'BACKEND': _requerida('DJANGO_CACHE_BACKEND'),
+        'LOCATION': os.environ.get('DJANGO_CACHE_LOCATION', ''),
+    },
+}
+
+# Archivos estáticos con el hash del contenido en el nombre (collectstatic),
+# para servirlos con caché de largo plazo desde el servidor web
+STATIC_ROOT = os.environ.get('DJANGO_STATIC_ROOT', str(BASE_DIR / 'staticfiles'))
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.ManifestStaticFilesStorage',
+    },
+}
+
+SESSION_COOKIE_SECURE = _booleana('DJANGO_COOKIES_SEGURAS', True)
+CSRF_COOKIE_SECURE = SESSION_COOKIE_SECURE
+if _booleana('DJANGO_DETRAS_DE_PROXY', False):
+    SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
+    # El proxy debe enviar la IP real: proxy_set_header X-Real-IP $remote_addr;
+    LIMITES_CABECERA_IP = 'HTTP_X_REAL_IP'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'consola': {'class': 'logging.StreamHandler'},
+    },
+    'root': {'handlers': ['consola'], 'level': 'WARNING'},
+}
@@ -14,3 +14,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'descuentoGas.settings')
 
 application = get_wsgi_application()
+
+# En producción se verifica la configuración antes de atender peticiones
+from django.conf import settings  # noqa: E402
+
+if not settings.DEBUG:
+    from django.core.management import call_command
+
+    call_command('check', deploy=True, databases=['default'], fail_level='ERROR')
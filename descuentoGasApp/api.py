@@ -0,0 +1,143 @@
+import hashlib
+import json
+import secrets
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+
+from .cache_rut import asolicitudes_por_rut
+from .canjes import CanjeRechazado, canjear
+from .models import TokenApi
+from .roles import aroles_de
+from .rut import formatear_rut, normalizar_rut
+
+MAX_RUTS_POR_CONSULTA = 100
+
+
+def generar_token(usuario, nombre=''):
+    """Crea un TokenApi para el usuario y retorna el token en claro"""
+    token = secrets.token_urlsafe(32)
+    TokenApi.objects.create(usuario=usuario, digest=_digest(token), nombre=nombre)
+    return token
+
+
+def _digest(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _error(mensaje, status):
+    return JsonResponse({'error': mensaje}, status=status)
+
+
+def token_vendedor_requerido(vista):
+    """
+    Autentica con la cabecera 'Authorization: Token <token>' en vez de la
+    sesión, y exige el rol Vendedor, igual que las vistas del vendedor.
+    Solo para vistas async.
+    """
+    @wraps(vista)
+    async def envoltura(request, *args, **kwargs):
+        tipo, _, token = request.headers.get('Authorization', '').partition(' ')
+        if tipo != 'Token' or not token:
+            return _error('Se requiere un token.', 401)
+        registro = await TokenApi.objects.select_related('usuario').filter(digest=_digest(token.strip())).afirst()
+        if registro is None or not registro.usuario.is_active:
+            return _error('Token inválido.', 401)
+        if 'Vendedor' not in await aroles_de(registro.usuario):
+            return _error('El usuario no tiene rol Vendedor.', 403)
+        request.user = registro.usuario
+        return await vista(request, *args, **kwargs)
+    return envoltura
+
+
+def elegibilidad(solicitud, rut=None):
+    """Campos mínimos para decidir si se aplica el descuento"""
+    if solicitud is None:
+        return {'rut': rut, 'estado': None, 'vigente_hasta': None}
+    estado = solicitud.estado_efectivo
+    vigente_hasta = solicitud.vigente_hasta if estado == 'Aceptada' else None
+    return {
+        'rut': formatear_rut(solicitud.rut_cuerpo, solicitud.rut_dv),
+        'estado': estado,
+        'vigente_hasta': timezone.localtime(vigente_hasta).isoformat() if vigente_hasta else None,
+    }
+
+
+async def _buscar(ruts_cuerpo):
+    """Mapa rut_cuerpo -> Solicitud, desde el caché o con una sola consulta"""
+    # Si hay duplicados heredados, vale la más antigua (la que conserva eliminar_duplicados)
+    return {
+        cuerpo: solicitudes[0]
+        for cuerpo, solicitudes in (await asolicitudes_por_rut(*ruts_cuerpo)).items()
+        if solicitudes
+    }
+
+
+@require_GET
+@token_vendedor_requerido
+async def consultar_rut(request, rut):
+    try:
+        cuerpo, dv = normalizar_rut(rut)
+    except ValueError as e:
+        return _error(f'{e}.', 400)
+    solicitud = (await _buscar([cuerpo])).get(cuerpo)
+    return JsonResponse(elegibilidad(solicitud, formatear_rut(cuerpo, dv)))
+
+
+@csrf_exempt
+@require_POST
+@token_vendedor_requerido
+async def consultar_ruts(request):
+    """Recibe {"ruts": [...]} y responde {"resultados": [...]} en el mismo orden"""
+    try:
+        ruts = json.loads(request.body)['ruts']
+    except (ValueError, KeyError, TypeError):
+        return _error('Se esperaba un objeto JSON con la lista "ruts".', 400)
+    if not isinstance(ruts, list) or not all(isinstance(rut, str) for rut in ruts):
+        return _error('"ruts" debe ser una lista de textos.', 400)
+    if len(ruts) > MAX_RUTS_POR_CONSULTA:
+        return _error(f'Máximo {MAX_RUTS_POR_CONSULTA} RUT por consulta.', 400)
+
+    validos, invalidos = {}, {}
+    for rut in ruts:
+        try:
+            validos[rut] = normalizar_rut(rut)
+        except ValueError as e:
+            invalidos[rut] = f'{e}.'
+    encontradas = await _buscar({cuerpo for cuerpo, _ in validos.values()}) if validos else {}
+
+    resultados = []
+    for rut in ruts:
+        if rut in invalidos:
+            resultados.append({'rut': rut, 'error': invalidos[rut]})
+            continue
+        cuerpo, dv = validos[rut]
+        resultados.append(elegibilidad(encontradas.get(cuerpo), formatear_rut(cuerpo, dv)))
+    return JsonResponse({'resultados': resultados})
+
+
+@csrf_exempt
+@require_POST
+@token_vendedor_requerido
+async def canjear_rut(request, rut):
+    """Registra un canje; responde 409 si la solicitud no está aceptada o no le queda cupo"""
+    try:
+        cuerpo, dv = normalizar_rut(rut)
+    except ValueError as e:
+        return _error(f'{e}.', 400)
+    solicitud = (await _buscar([cuerpo])).get(cuerpo)
+    if solicitud is None:
+        return _error('No existe una solicitud con ese RUT.', 404)
+    try:
+        canje = await sync_to_async(canjear)(solicitud, request.user)
+    except CanjeRechazado as e:
+        return _error(str(e), 409)
+    return JsonResponse({
+        'rut': formatear_rut(cuerpo, dv),
+        'periodo': canje.periodo.strftime('%Y-%m'),
+        'fecha': timezone.localtime(canje.created_at).isoformat(),
+    }, status=201)
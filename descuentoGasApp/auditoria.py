@@ -0,0 +1,57 @@
+from django.utils import timezone
+
+from .models import SolicitudEvento
+
+TAMANO_BUFFER = 1000
+
+
+class RegistroEventos:
+    """
+    Acumula eventos en memoria y los inserta con bulk_create al vaciarse, ya
+    sea al llenarse el buffer o al salir del bloque with. Se usa dentro de la
+    transacción que hace el cambio, así el evento se guarda junto con él.
+    """
+
+    def __init__(self, usuario=None, tamano=TAMANO_BUFFER):
+        self.usuario = usuario if usuario is None or usuario.is_authenticated else None
+        self.tamano = tamano
+        self.pendientes = []
+
+    def agregar(self, solicitud_id, tipo, anterior='', nuevo='', fecha=None):
+        self.pendientes.append(SolicitudEvento(
+            solicitud_id=solicitud_id,
+            tipo=tipo,
+            estado_anterior=anterior,
+            estado_nuevo=nuevo,
+            usuario=self.usuario,
+            created_at=fecha or timezone.now(),
+        ))
+        if len(self.pendientes) >= self.tamano:
+            self.vaciar()
+
+    def vaciar(self):
+        if self.pendientes:
+            SolicitudEvento.objects.bulk_create(self.pendientes)
+            self.pendientes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        if tipo is None:
+            self.vaciar()
+
+
+def registrar_evento(solicitud_id, tipo, anterior='', nuevo='', usuario=None):
+    """Registra un único evento"""
+    with RegistroEventos(usuario) as registro:
+        registro.agregar(solicitud_id, tipo, anterior, nuevo)
+
+
+def linea_de_tiempo(solicitud_id):
+    """Eventos de una solicitud en orden cronológico (índice solicitud + created_at)"""
+    return (
+        SolicitudEvento.objects.filter(solicitud_id=solicitud_id)
+        .select_related('usuario')
+        .order_by('created_at', 'id')
+    )
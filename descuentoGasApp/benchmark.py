@@ -0,0 +1,428 @@
+import html
+import json
+import math
+import platform
+import random
+import re
+import subprocess
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime, timedelta
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.db import OperationalError, connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import busqueda, estadisticas
+from .api import generar_token
+from .canjes import CanjeRechazado, canjear, periodo_de
+from .models import Canje, Comuna, CupoCanje, Solicitud
+from .rut import calcular_dv, formatear_rut
+
+TAMANO_LOTE = 5000
+
+# Rango de RUT de los datos generados; los escenarios de ingreso usan RUT sobre él
+RUT_MINIMO = 1_000_000
+RUT_MAXIMO = 29_999_999
+RUT_INGRESO = 30_000_000
+
+ENLACE_SIGUIENTE = re.compile(r'href="\?([^"]*cursor=[^"]*)"[^>]*>Siguiente')
+
+NOMBRES = ['Juan', 'María', 'Pedro', 'Camila', 'José', 'Valentina', 'Luis', 'Francisca', 'Carlos', 'Javiera']
+APELLIDOS = ['González', 'Muñoz', 'Rojas', 'Díaz', 'Pérez', 'Soto', 'Contreras', 'Silva', 'Martínez', 'Sepúlveda']
+# Proporción aproximada de estados en los datos generados
+PESOS_ESTADO = {'Pendiente': 50, 'Aceptada': 30, 'Rechazada': 10, 'Expirada': 10}
+# Las solicitudes generadas se reparten en estos días hacia atrás, para que los
+# filtros por fecha, el orden del listado y las estadísticas por mes sean realistas
+DIAS_HISTORIA = 730
+# Días máximos entre el ingreso de una solicitud y su aceptación
+DIAS_REVISION = 30
+
+
+def generar_solicitudes(cantidad, semilla=None, tamano_lote=TAMANO_LOTE, al_avanzar=None):
+    """
+    Inserta cantidad solicitudes con RUT válidos y distintos, repartidas entre
+    todas las comunas oficiales y en los últimos DIAS_HISTORIA días, en lotes
+    con bulk_create. Mantiene el índice de búsqueda al día y recalcula las
+    estadísticas al terminar. al_avanzar(insertadas) se llama después de
+    cada lote.
+    """
+    azar = random.Random(semilla)
+    comunas = list(Comuna.objects.filter(region__isnull=False).values_list('id', flat=True))
+    if not comunas:
+        raise ValueError('No hay comunas cargadas; ejecute las migraciones primero.')
+    existentes = set(Solicitud.objects.values_list('rut_cuerpo', flat=True))
+    if cantidad > RUT_MAXIMO - RUT_MINIMO + 1 - len(existentes):
+        raise ValueError('No quedan suficientes RUT disponibles en el rango de generación.')
+
+    estados, pesos = zip(*PESOS_ESTADO.items())
+    ahora = timezone.now()
+    insertadas = 0
+    while insertadas < cantidad:
+        lote, fechas = [], []
+        while len(lote) < min(tamano_lote, cantidad - insertadas):
+            cuerpo = azar.randint(RUT_MINIMO, RUT_MAXIMO)
+            if cuerpo in existentes:
+                continue
+            existentes.add(cuerpo)
+            estado = azar.choices(estados, pesos)[0]
+            aceptacion = None
+            if estado in ('Aceptada', 'Expirada'):
+                aceptacion = ahora - timedelta(days=azar.randint(0, 2 * settings.SOLICITUD_VIGENCIA_DIAS))
+                fechas.append(aceptacion - timedelta(seconds=azar.randint(0, DIAS_REVISION * 86400)))
+            else:
+                fechas.append(ahora - timedelta(seconds=azar.randint(0, DIAS_HISTORIA * 86400)))
+            dv = calcular_dv(cuerpo)
+            lote.append(Solicitud(
+                rut=formatear_rut(cuerpo, dv),
+                rut_cuerpo=cuerpo,
+                rut_dv=dv,
+                nombre=azar.choice(NOMBRES),
+                apellido_paterno=azar.choice(APELLIDOS),
+                apellido_materno=azar.choice(APELLIDOS),
+                direccion=f'Calle {azar.randint(1, 500)} #{azar.randint(1, 9999)}',
+                telefono=f'9{azar.randint(10_000_000, 99_999_999)}',
+                comuna_id=azar.choice(comunas),
+                estado=estado,
+                fecha_aceptacion=aceptacion,
+            ))
+        with transaction.atomic():
+            creadas = Solicitud.objects.bulk_create(lote)
+            busqueda.indexar(creadas)
+            # fecha_solicitud es auto_now_add: bulk_create la fija en ahora, se corrige después
+            for solicitud, fecha in zip(creadas, fechas):
+                solicitud.fecha_solicitud = fecha
+            Solicitud.objects.bulk_update(creadas, ['fecha_solicitud'], batch_size=1000)
+        insertadas += len(creadas)
+        if al_avanzar:
+            al_avanzar(insertadas)
+    # Con fechas repartidas hay miles de combinaciones de mes, comuna y estado:
+    # recalcular el resumen una vez es mucho más rápido que ajustarlo por lote
+    estadisticas.reconstruir()
+    return insertadas
+
+
+def percentil(valores, p):
+    """Percentil por rango más cercano de una lista ordenada"""
+    if not valores:
+        return None
+    return valores[max(0, math.ceil(p / 100 * len(valores)) - 1)]
+
+
+class Benchmark:
+    """
+    Mide las vistas de mayor tráfico con el cliente de pruebas de Django, a
+    través de todo el stack de middlewares. Todo lo que escriben los
+    escenarios se revierte al terminar.
+    """
+
+    def __init__(self, iteraciones=50, calentamiento=3, semilla=None):
+        self.iteraciones = iteraciones
+        self.calentamiento = calentamiento
+        self.azar = random.Random(semilla)
+
+    def escenarios(self):
+        return {
+            'inicio': self.inicio,
+            'dashboard_vendedor': self.dashboard_vendedor,
+            'ingresar_formulario': self.ingresar_formulario,
+            'ingresar_solicitud': self.ingresar_solicitud,
+            'ingreso_rechazado': self.ingreso_rechazado,
+            'buscar_vendedor': self.buscar_vendedor,
+            'buscar_vendedor_repetido': self.buscar_vendedor_repetido,
+            'api_rut': self.api_rut,
+            'api_lote': self.api_lote,
+            'listado_admin': self.listado_admin,
+            'listado_admin_filtrado': self.listado_admin_filtrado,
+            'listado_admin_paginas': self.listado_admin_paginas,
+            'busqueda_admin': self.busqueda_admin,
+            'detalle_admin': self.detalle_admin,
+            'detalle_admin_304': self.detalle_admin_304,
+            'api_canje': self.api_canje,
+        }
+
+    def ejecutar(self, nombres=None):
+        nombres = nombres or list(self.escenarios())
+        resultados = {}
+        # Los límites se mantienen activos, pero sin que rechacen a los escenarios
+        limites = {regla: (10 ** 9, ventana) for regla, (_, ventana) in settings.LIMITES_PETICIONES.items()}
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], LIMITES_PETICIONES=limites):
+            with transaction.atomic():
+                self._preparar()
+                for nombre in nombres:
+                    resultados[nombre] = self._medir(self.escenarios()[nombre])
+                transaction.set_rollback(True)
+        return {
+            'fecha': timezone.now().isoformat(),
+            'commit': _commit_actual(),
+            'motor': connection.vendor,
+            'filas': self.filas,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'iteraciones': self.iteraciones,
+            'escenarios': resultados,
+        }
+
+    def _preparar(self):
+        self.filas = Solicitud.objects.count()
+        admin_grupo, _ = Group.objects.get_or_create(name='Administrador')
+        vendedor_grupo, _ = Group.objects.get_or_create(name='Vendedor')
+        admin = User.objects.create_user('benchmark-admin@mail.cl', 'benchmark-admin@mail.cl')
+        admin.groups.add(admin_grupo)
+        vendedor = User.objects.create_user('benchmark-vendedor@mail.cl', 'benchmark-vendedor@mail.cl')
+        vendedor.groups.add(vendedor_grupo)
+
+        self.anonimo = Client()
+        self.admin = Client()
+        self.admin.force_login(admin)
+        self.vendedor = Client()
+        self.vendedor.force_login(vendedor)
+        self.token = generar_token(vendedor, 'benchmark')
+
+        # Muestras tomadas con self.azar y no con ORDER BY RAND(), que no usa la
+        # semilla: así dos corridas con la misma --semilla piden las mismas filas
+        muestra = self.iteraciones + self.calentamiento + 1
+        todos = list(Solicitud.objects.order_by('id').values_list('id', flat=True))
+        elegidos = self.azar.sample(todos, min(muestra * 10, len(todos)))
+        ruts = dict(Solicitud.objects.filter(id__in=elegidos).values_list('id', 'rut'))
+        self.ruts = [ruts[id_] for id_ in elegidos] or ['11111111-1']
+        self.ids = elegidos[:muestra]
+        self.etag_detalle = None
+        # Una solicitud aceptada distinta por canje, para que todos respondan 201
+        self.aceptadas = list(
+            Solicitud.objects.filtrar(estado='Aceptada').order_by('id').values_list('rut', flat=True)[:muestra]
+        )
+        comunas = list(Comuna.objects.filter(region__isnull=False).order_by('id').values_list('id', flat=True))
+        self.comuna = Comuna.objects.select_related('region').get(id=self.azar.choice(comunas))
+        self.siguiente_rut = RUT_INGRESO
+
+    def _medir(self, escenario):
+        for _ in range(self.calentamiento):
+            escenario()
+
+        tiempos = []
+        consultas = []
+        for _ in range(self.iteraciones):
+            with CaptureQueriesContext(connection) as capturadas:
+                inicio = time.perf_counter()
+                escenario()
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            consultas.append(len(capturadas))
+
+        # La memoria se mide en una pasada aparte: tracemalloc distorsiona los tiempos
+        tracemalloc.start()
+        escenario()
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        tiempos.sort()
+        return {
+            'p50_ms': round(percentil(tiempos, 50), 3),
+            'p95_ms': round(percentil(tiempos, 95), 3),
+            'p99_ms': round(percentil(tiempos, 99), 3),
+            'media_ms': round(sum(tiempos) / len(tiempos), 3),
+            'max_ms': round(tiempos[-1], 3),
+            'consultas_media': round(sum(consultas) / len(consultas), 2),
+            'consultas_max': max(consultas),
+            'memoria_pico_kb': round(pico / 1024, 1),
+        }
+
+    def _verificar(self, respuesta, esperado=200):
+        if respuesta.status_code != esperado:
+            raise RuntimeError(f'{respuesta.request["PATH_INFO"]} respondió {respuesta.status_code}')
+        return respuesta
+
+    def inicio(self):
+        self._verificar(self.anonimo.get(reverse('index')))
+
+    def dashboard_vendedor(self):
+        self._verificar(self.vendedor.get(reverse('dashboard_vendedor')))
+
+    def ingresar_formulario(self):
+        self._verificar(self.anonimo.get(reverse('ingresar_solicitud')))
+
+    def _datos_ingreso(self):
+        cuerpo = self.siguiente_rut
+        self.siguiente_rut += 1
+        return {
+            'rut': formatear_rut(cuerpo, calcular_dv(cuerpo)),
+            'nombre': 'Benchmark',
+            'apellido_paterno': 'Prueba',
+            'apellido_materno': 'Carga',
+            'direccion': 'Calle 1',
+            'telefono': '912345678',
+            'region': self.comuna.region.nombre,
+            'comuna': self.comuna.nombre,
+        }
+
+    def ingresar_solicitud(self):
+        self._verificar(self.anonimo.post(reverse('ingresar_solicitud'), self._datos_ingreso()), esperado=302)
+
+    def ingreso_rechazado(self):
+        """Costo de un 429: límite por IP sin cupo"""
+        with override_settings(LIMITES_PETICIONES={'ingreso_ip': (0, 3600)}):
+            self._verificar(self.anonimo.post(reverse('ingresar_solicitud'), self._datos_ingreso()), esperado=429)
+
+    def buscar_vendedor(self):
+        self._verificar(self.vendedor.post(reverse('buscar_solicitud_vendedor'), {'rut': self.azar.choice(self.ruts)}))
+
+    def buscar_vendedor_repetido(self):
+        self._verificar(self.vendedor.post(reverse('buscar_solicitud_vendedor'), {'rut': self.ruts[0]}))
+
+    def api_rut(self):
+        self._verificar(self.vendedor.get(
+            reverse('api_consultar_rut', args=[self.azar.choice(self.ruts)]),
+            HTTP_AUTHORIZATION=f'Token {self.token}',
+        ))
+
+    def api_lote(self):
+        self._verificar(self.vendedor.post(
+            reverse('api_consultar_ruts'),
+            json.dumps({'ruts': self.azar.sample(self.ruts, min(50, len(self.ruts)))}),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=f'Token {self.token}',
+        ))
+
+    def listado_admin(self):
+        self._verificar(self.admin.get(reverse('administrar_solicitudes')))
+
+    def listado_admin_filtrado(self):
+        self._verificar(self.admin.get(reverse('administrar_solicitudes'), {
+            'estado': 'Aceptada', 'region': self.comuna.region.nombre,
+        }))
+
+    def listado_admin_paginas(self):
+        """Recorre cinco páginas seguidas con el cursor"""
+        url = reverse('administrar_solicitudes')
+        respuesta = self._verificar(self.admin.get(url))
+        for _ in range(4):
+            # El contexto de la plantilla no está disponible fuera de las pruebas: se lee el enlace
+            siguiente = ENLACE_SIGUIENTE.search(respuesta.content.decode())
+            if not siguiente:
+                break
+            respuesta = self._verificar(self.admin.get(f'{url}?{html.unescape(siguiente.group(1))}'))
+
+    def busqueda_admin(self):
+        """Nombre completo y prefijo de apellido, como los escribiría un administrador"""
+        consulta = f'{self.azar.choice(NOMBRES)} {self.azar.choice(APELLIDOS)[:4]}'
+        self._verificar(self.admin.get(reverse('buscar_solicitudes'), {'q': consulta}))
+
+    def detalle_admin(self):
+        if not self.ids:
+            raise RuntimeError('No hay solicitudes; genere datos con generar_solicitudes.')
+        self._verificar(self.admin.get(reverse('detalle_solicitud', args=[self.azar.choice(self.ids)])))
+
+    def detalle_admin_304(self):
+        """Revisita de un detalle sin cambios, con el ETag de la primera visita"""
+        if not self.ids:
+            raise RuntimeError('No hay solicitudes; genere datos con generar_solicitudes.')
+        url = reverse('detalle_solicitud', args=[self.ids[0]])
+        if self.etag_detalle is None:
+            self.etag_detalle = self._verificar(self.admin.get(url))['ETag']
+        self._verificar(self.admin.get(url, HTTP_IF_NONE_MATCH=self.etag_detalle), esperado=304)
+
+    def api_canje(self):
+        if not self.aceptadas:
+            raise RuntimeError('No quedan solicitudes aceptadas para canjear; genere más datos.')
+        self._verificar(self.vendedor.post(
+            reverse('api_canjear_rut', args=[self.aceptadas.pop()]),
+            HTTP_AUTHORIZATION=f'Token {self.token}',
+        ), esperado=201)
+
+
+# Periodo ficticio de los canjes concurrentes, para borrarlos sin tocar datos reales
+FECHA_CANJES_CONCURRENTES = datetime(2100, 1, 15, 12)
+
+
+def medir_canjes_concurrentes(hilos=8, intentos=2000, solicitudes=20):
+    """
+    Lanza intentos canjes desde hilos simultáneos, cada uno con su conexión,
+    sobre unas pocas solicitudes aceptadas, para medir canjes por segundo con
+    contención real sobre las mismas filas de cupo. El cupo se fija para que
+    la mitad de los intentos se rechace. A diferencia de Benchmark, escribe
+    y confirma: los canjes quedan en un periodo ficticio que se borra al final.
+    """
+    ahora = timezone.make_aware(FECHA_CANJES_CONCURRENTES)
+    periodo = periodo_de(ahora)
+    elegidas = list(Solicitud.objects.filtrar(estado='Aceptada').only('id', 'estado', 'fecha_aceptacion')[:solicitudes])
+    if not elegidas:
+        raise ValueError('No hay solicitudes aceptadas; ejecute generar_solicitudes primero.')
+    cupo = max(1, intentos // len(elegidas) // 2)
+
+    tiempos = []
+    conteo = {'aceptados': 0, 'rechazados': 0, 'errores': 0}
+    lock = threading.Lock()
+
+    def trabajar(numero):
+        propios = []
+        resultados = {'aceptados': 0, 'rechazados': 0, 'errores': 0}
+        try:
+            for i in range(numero, intentos, hilos):
+                inicio = time.perf_counter()
+                try:
+                    canjear(elegidas[i % len(elegidas)], ahora=ahora)
+                    resultados['aceptados'] += 1
+                except CanjeRechazado:
+                    resultados['rechazados'] += 1
+                except OperationalError:
+                    # SQLite responde "database is locked" si la espera supera su timeout
+                    resultados['errores'] += 1
+                propios.append((time.perf_counter() - inicio) * 1000)
+        finally:
+            connection.close()
+        with lock:
+            tiempos.extend(propios)
+            for clave, valor in resultados.items():
+                conteo[clave] += valor
+
+    try:
+        with override_settings(CANJES_POR_MES=cupo):
+            inicio = time.perf_counter()
+            trabajadores = [threading.Thread(target=trabajar, args=(n,)) for n in range(hilos)]
+            for trabajador in trabajadores:
+                trabajador.start()
+            for trabajador in trabajadores:
+                trabajador.join()
+            duracion = time.perf_counter() - inicio
+
+        canjes = Counter(Canje.objects.filter(periodo=periodo).values_list('solicitud_id', flat=True))
+        cupos = dict(CupoCanje.objects.filter(periodo=periodo).values_list('solicitud_id', 'usados'))
+    finally:
+        Canje.objects.filter(periodo=periodo).delete()
+        CupoCanje.objects.filter(periodo=periodo).delete()
+
+    tiempos.sort()
+    return {
+        'hilos': hilos,
+        'intentos': intentos,
+        'solicitudes': len(elegidas),
+        'cupo': cupo,
+        **conteo,
+        'duracion_s': round(duracion, 3),
+        # Solo intentos con respuesta: un error de la base de datos no es un canje atendido
+        'canjes_por_segundo': round((conteo['aceptados'] + conteo['rechazados']) / duracion, 1),
+        'p50_ms': round(percentil(tiempos, 50), 3),
+        'p95_ms': round(percentil(tiempos, 95), 3),
+        'p99_ms': round(percentil(tiempos, 99), 3),
+        # Ambos deben ser 0: ninguna solicitud sobre su cupo y el contador igual al registro
+        'sobre_cupo': sum(1 for n in canjes.values() if n > cupo),
+        'descuadres': sum(1 for solicitud_id, n in canjes.items() if cupos.get(solicitud_id) != n),
+    }
+
+
+def _commit_actual():
+    try:
+        salida = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=5,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return salida.stdout.strip() or None
@@ -0,0 +1,149 @@
+import re
+import unicodedata
+from functools import reduce
+from operator import add, or_
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Max, Q, Sum, Value, When
+
+from .models import Solicitud, TerminoBusqueda
+from .paginacion import recorrer_por_id
+
+# Peso de cada campo en el puntaje; un término presente en varios campos vale el mayor
+PESOS = {'nombre': 3, 'apellido_paterno': 3, 'apellido_materno': 3, 'telefono': 2, 'direccion': 1}
+
+LARGO_MINIMO = 2
+LARGO_MAXIMO = TerminoBusqueda._meta.get_field('termino').max_length
+MAX_TERMINOS_CONSULTA = 5
+TAMANO_LOTE = 2000
+
+
+def normalizar(texto):
+    """Términos alfanuméricos de un texto, en minúsculas y sin tildes"""
+    sin_tildes = unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode()
+    return [termino[:LARGO_MAXIMO] for termino in re.findall(r'[a-z0-9]+', sin_tildes.lower())]
+
+
+def terminos_consulta(texto):
+    """Términos útiles de una consulta, sin repetir y en su orden original"""
+    terminos = dict.fromkeys(t for t in normalizar(texto) if len(t) >= LARGO_MINIMO)
+    return list(terminos)[:MAX_TERMINOS_CONSULTA]
+
+
+def terminos_de(solicitud):
+    """Mapa término -> peso de una solicitud"""
+    terminos = {}
+    for campo, peso in PESOS.items():
+        for termino in normalizar(getattr(solicitud, campo) or ''):
+            terminos[termino] = max(peso, terminos.get(termino, 0))
+    return terminos
+
+
+def indexar(solicitudes):
+    """
+    Inserta los términos de solicitudes recién creadas. Las que se guardan con
+    save() se indexan solas (ver signals.py); los bulk_create deben llamarla
+    dentro de la transacción que las crea, así el índice nunca queda atrás.
+    """
+    sin_id = [s for s in solicitudes if s.pk is None]
+    if sin_id:
+        # MySQL no retorna los id generados por bulk_create
+        ids = dict(Solicitud.objects.filter(rut__in=[s.rut for s in sin_id]).values_list('rut', 'id'))
+        for solicitud in sin_id:
+            solicitud.pk = ids[solicitud.rut]
+    TerminoBusqueda.objects.bulk_create([
+        TerminoBusqueda(solicitud_id=solicitud.pk, termino=termino, peso=peso)
+        for solicitud in solicitudes
+        for termino, peso in terminos_de(solicitud).items()
+    ], batch_size=TAMANO_LOTE)
+
+
+def reindexar(solicitud):
+    """Reemplaza los términos de una solicitud guardada por los de sus campos actuales"""
+    with transaction.atomic():
+        TerminoBusqueda.objects.filter(solicitud_id=solicitud.pk).delete()
+        indexar([solicitud])
+
+
+def reconstruir():
+    """Regenera el índice completo desde las solicitudes. Retorna la cantidad de términos."""
+    total = 0
+    with transaction.atomic():
+        TerminoBusqueda.objects.all().delete()
+        lote = []
+        for solicitud in recorrer_por_id(Solicitud.objects.only('id', *PESOS), TAMANO_LOTE):
+            lote.extend(
+                TerminoBusqueda(solicitud_id=solicitud.id, termino=termino, peso=peso)
+                for termino, peso in terminos_de(solicitud).items()
+            )
+            if len(lote) >= TAMANO_LOTE:
+                TerminoBusqueda.objects.bulk_create(lote)
+                total += len(lote)
+                lote = []
+        TerminoBusqueda.objects.bulk_create(lote)
+        total += len(lote)
+    return total
+
+
+def _prefijo(termino):
+    # Rango en vez de LIKE 'x%': los términos son [a-z0-9] de largo acotado, así
+    # que todos los que empiezan con termino caen entre termino y termino + 'zz…'.
+    # Cualquier motor lo resuelve con el índice, sin depender de la collation.
+    return Q(termino__gte=termino, termino__lte=termino + 'z' * (LARGO_MAXIMO - len(termino)))
+
+
+def codificar_cursor(puntaje, pk):
+    return f'{puntaje}.{pk}'
+
+
+def decodificar_cursor(cursor):
+    """Retorna la tupla (puntaje, id) de un cursor, o None si es inválido"""
+    try:
+        puntaje, pk = cursor.split('.')
+        return int(puntaje), int(pk)
+    except (AttributeError, ValueError):
+        return None
+
+
+def buscar(texto, cursor, tamano):
+    """
+    Solicitudes que tienen, para cada término de la consulta, algún término
+    indexado que empieza con él. Se ordenan por puntaje (suma de pesos,
+    doble si el término coincide completo) y luego por id descendente.
+    Retorna (solicitudes, cursor_siguiente); cada solicitud trae .puntaje.
+    """
+    terminos = terminos_consulta(texto)
+    if not terminos:
+        return [], None
+    prefijos = [_prefijo(termino) for termino in terminos]
+
+    coincidencias = (
+        TerminoBusqueda.objects.filter(reduce(or_, prefijos))
+        .values('solicitud_id')
+        .annotate(
+            encontrados=reduce(add, [Max(Case(When(p, then=Value(1)), default=Value(0))) for p in prefijos]),
+            puntaje=Sum(Case(
+                When(termino__in=terminos, then=F('peso') * 2), default=F('peso'), output_field=IntegerField()
+            )),
+        )
+        .filter(encontrados=len(terminos))
+    )
+    posicion = decodificar_cursor(cursor)
+    if posicion:
+        puntaje, pk = posicion
+        coincidencias = coincidencias.filter(Q(puntaje__lt=puntaje) | Q(puntaje=puntaje, solicitud_id__lt=pk))
+    filas = list(coincidencias.order_by('-puntaje', '-solicitud_id').values_list('solicitud_id', 'puntaje')[:tamano + 1])
+
+    siguiente = None
+    if len(filas) > tamano:
+        filas = filas[:tamano]
+        siguiente = codificar_cursor(filas[-1][1], filas[-1][0])
+
+    solicitudes = Solicitud.objects.select_related('comuna').in_bulk([pk for pk, _ in filas])
+    resultado = []
+    for pk, puntaje in filas:
+        # Puede faltar si se eliminó entre ambas consultas
+        if pk in solicitudes:
+            solicitudes[pk].puntaje = puntaje
+            resultado.append(solicitudes[pk])
+    return resultado, siguiente
@@ -0,0 +1,113 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, quote_etag
+from django.utils.http import http_date
+
+from .limites import Contadores
+from .roles import roles_de
+
+PREFIJO = 'pagina:'
+
+# Aciertos y fallos del caché, y respuestas 304 o renderizadas, por vista, dentro del proceso
+contadores = Contadores()
+
+
+def _cache():
+    return caches[settings.CACHE_PAGINAS]
+
+
+def _hay_mensajes(request):
+    # len() carga los mensajes pendientes sin marcarlos como leídos
+    return bool(len(get_messages(request)))
+
+
+def por_rol(request):
+    """Variante para páginas que solo cambian según si hay sesión y los roles"""
+    usuario = request.user
+    if not usuario.is_authenticated:
+        return 'anonimo'
+    return ','.join(sorted(roles_de(usuario))) or 'sin-rol'
+
+
+def por_usuario(request):
+    """Variante para páginas que muestran los datos del usuario: cambia si estos cambian"""
+    usuario = request.user
+    return '\x1f'.join([
+        str(usuario.pk), usuario.get_username(), usuario.first_name,
+        usuario.last_name, usuario.email, por_rol(request),
+    ])
+
+
+def cachear_pagina(variante):
+    """
+    Guarda el HTML de la vista en el caché CACHE_PAGINAS durante
+    CACHE_PAGINAS_TTL segundos, con una entrada por ruta y por
+    variante(request). Solo para vistas sync, sin {% csrf_token %} y que no
+    leen request.GET. Una petición con mensajes pendientes se renderiza
+    normalmente, y esa respuesta no se guarda.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or _hay_mensajes(request):
+                return vista(request, *args, **kwargs)
+            huella = hashlib.sha1(f'{request.path}\x1e{variante(request)}'.encode()).hexdigest()
+            clave = f'{PREFIJO}{huella}'
+            guardada = _cache().get(clave)
+            if guardada is not None:
+                contadores.sumar(vista.__name__, 'acierto')
+                contenido, tipo = guardada
+                return HttpResponse(contenido, content_type=tipo)
+
+            contadores.sumar(vista.__name__, 'fallo')
+            respuesta = vista(request, *args, **kwargs)
+            if respuesta.status_code == 200 and not respuesta.streaming and not respuesta.cookies:
+                _cache().set(clave, (respuesta.content, respuesta['Content-Type']), settings.CACHE_PAGINAS_TTL)
+            return respuesta
+        return envoltura
+    return decorador
+
+
+def condicional(version):
+    """
+    GET condicional: version(request, *args, **kwargs) retorna (etag,
+    fecha de última modificación) con una consulta barata, o None para
+    renderizar sin más. Si el navegador ya tiene esa versión se responde 304
+    sin ejecutar la vista. Obliga a revalidar en cada visita (no-cache) y
+    no guarda la página en cachés compartidos (private). Solo para vistas sync.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            # Una página con mensajes no debe volver a mostrarse desde el navegador
+            if request.method not in ('GET', 'HEAD') or _hay_mensajes(request):
+                return vista(request, *args, **kwargs)
+            actual = version(request, *args, **kwargs)
+            if actual is None:
+                return vista(request, *args, **kwargs)
+
+            etag, modificada = actual
+            cabeceras = HttpResponse()
+            cabeceras['ETag'] = quote_etag(etag)
+            cabeceras['Last-Modified'] = http_date(modificada.timestamp())
+            patch_cache_control(cabeceras, private=True, no_cache=True)
+            respuesta = get_conditional_response(
+                request, etag=cabeceras['ETag'], last_modified=int(modificada.timestamp()), response=cabeceras
+            )
+            if respuesta is not cabeceras:
+                contadores.sumar(vista.__name__, 'no_modificada')
+                return respuesta
+
+            contadores.sumar(vista.__name__, 'renderizada')
+            respuesta = vista(request, *args, **kwargs)
+            if respuesta.status_code == 200:
+                for cabecera in ('ETag', 'Last-Modified', 'Cache-Control'):
+                    respuesta[cabecera] = cabeceras[cabecera]
+            return respuesta
+        return envoltura
+    return decorador
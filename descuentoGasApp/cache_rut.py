@@ -0,0 +1,79 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .models import Solicitud
+
+PREFIJO = 'rut:'
+CLAVE_ACIERTOS = 'rut:aciertos'
+CLAVE_FALLOS = 'rut:fallos'
+
+
+def _cache():
+    return caches[settings.CACHE_RUT]
+
+
+def _clave(rut_cuerpo):
+    return f'{PREFIJO}{rut_cuerpo}'
+
+
+async def _sumar(clave, n):
+    if not n:
+        return
+    cache = _cache()
+    try:
+        await cache.aincr(clave, n)
+    except ValueError:
+        if not await cache.aadd(clave, n, None):
+            await cache.aincr(clave, n)
+
+
+async def asolicitudes_por_rut(*ruts_cuerpo):
+    """
+    Lectura a través del caché: retorna un dict rut_cuerpo -> lista de
+    solicitudes (con comuna), ordenadas de la más antigua a la más reciente.
+    Los RUT que no están en caché se consultan juntos en una sola query.
+    Es async porque solo la usan vistas async.
+    """
+    cache = _cache()
+    guardadas = await cache.aget_many([_clave(c) for c in ruts_cuerpo])
+    resultado = {c: guardadas[_clave(c)] for c in ruts_cuerpo if _clave(c) in guardadas}
+    faltantes = [c for c in ruts_cuerpo if c not in resultado]
+    await _sumar(CLAVE_ACIERTOS, len(resultado))
+    await _sumar(CLAVE_FALLOS, len(faltantes))
+    if not faltantes:
+        return resultado
+
+    for c in faltantes:
+        resultado[c] = []
+    solicitudes = (
+        Solicitud.objects.select_related('comuna')
+        .filter(rut_cuerpo__in=faltantes)
+        .order_by('fecha_solicitud', 'id')
+    )
+    async for solicitud in solicitudes:
+        resultado[solicitud.rut_cuerpo].append(solicitud)
+
+    encontradas = {_clave(c): resultado[c] for c in faltantes if resultado[c]}
+    await cache.aset_many(encontradas, settings.CACHE_RUT_TTL)
+    await cache.aset_many({_clave(c): [] for c in faltantes if not resultado[c]}, settings.CACHE_RUT_TTL_NEGATIVO)
+    return resultado
+
+
+def invalidar(*ruts_cuerpo):
+    """
+    Elimina del caché los RUT indicados una vez confirmada la transacción
+    en curso, para que una lectura concurrente no vuelva a guardar datos viejos.
+    """
+    claves = [_clave(c) for c in set(ruts_cuerpo) if c is not None]
+    if claves:
+        transaction.on_commit(lambda: _cache().delete_many(claves))
+
+
+def contadores():
+    cache = _cache()
+    valores = cache.get_many([CLAVE_ACIERTOS, CLAVE_FALLOS])
+    return {
+        'aciertos': valores.get(CLAVE_ACIERTOS, 0),
+        'fallos': valores.get(CLAVE_FALLOS, 0),
+    }
@@ -0,0 +1,52 @@
+from collections import Counter
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import estadisticas
+from .auditoria import RegistroEventos
+from .cache_rut import invalidar as invalidar_rut
+from .models import Solicitud, estado_efectivo_expr
+
+TAMANO_LOTE = 1000
+
+
+def cambiar_estado_masivo(queryset, nuevo_estado, tamano_lote=TAMANO_LOTE, ahora=None, usuario=None):
+    """
+    Aplica nuevo_estado a todas las solicitudes del queryset con un UPDATE por
+    lote de tamano_lote ids, recorridos por id para no volver a leer las filas
+    ya actualizadas. fecha_aceptacion se asigna en el mismo UPDATE, igual que
+    en cambiar_estado, y cada fila queda en el historial a nombre de usuario.
+    Retorna un Counter estado efectivo anterior -> cantidad.
+    """
+    ahora = ahora or timezone.now()
+    fecha_aceptacion = ahora if nuevo_estado == 'Aceptada' else None
+    seleccion = (
+        queryset.annotate(efectivo=estado_efectivo_expr(ahora))
+        .order_by('id')
+        .values_list('id', 'estado', 'efectivo', 'comuna_id', 'fecha_solicitud', 'rut_cuerpo')
+    )
+
+    resumen = Counter()
+    ultimo_id = 0
+    while True:
+        with transaction.atomic():
+            filas = list(seleccion.select_for_update().filter(id__gt=ultimo_id)[:tamano_lote])
+            if not filas:
+                break
+            ids = [fila[0] for fila in filas]
+            Solicitud.objects.filter(id__in=ids).update(
+                estado=nuevo_estado, fecha_aceptacion=fecha_aceptacion, fecha_modificacion=timezone.now()
+            )
+
+            deltas = estadisticas.contar([(estado, c, f) for _, estado, _, c, f, _ in filas], signo=-1)
+            deltas.update(estadisticas.contar([(nuevo_estado, c, f) for _, _, _, c, f, _ in filas]))
+            estadisticas.aplicar(deltas)
+
+            with RegistroEventos(usuario) as registro:
+                for id_, estado, _, _, _, _ in filas:
+                    registro.agregar(id_, 'estado', estado, nuevo_estado, ahora)
+            invalidar_rut(*(fila[5] for fila in filas))
+        resumen.update(fila[2] for fila in filas)
+        ultimo_id = ids[-1]
+    return resumen
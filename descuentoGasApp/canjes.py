@@ -0,0 +1,99 @@
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, F, Q
+from django.utils import timezone
+from django.utils.formats import date_format
+
+from .models import Canje, CupoCanje, Solicitud, limite_vigencia
+
+
+class CanjeRechazado(Exception):
+    """La solicitud no puede canjear el descuento"""
+
+
+def periodo_de(fecha):
+    """Primer día del mes de la fecha, en la zona horaria local"""
+    return timezone.localtime(fecha).date().replace(day=1)
+
+
+def _canjeable(solicitud_id):
+    """La solicitud, si está aceptada y vigente (mismo criterio que estado_efectivo)"""
+    return Solicitud.objects.filter(
+        Q(fecha_aceptacion__isnull=True) | Q(fecha_aceptacion__gt=limite_vigencia()),
+        id=solicitud_id, estado='Aceptada',
+    )
+
+
+def _tomar_cupo(solicitud_id, periodo, cupo):
+    """
+    Suma un canje al periodo solo si queda cupo y la solicitud sigue aceptada
+    y vigente, con un único UPDATE condicional: dos vendedores concurrentes
+    nunca leen el mismo saldo, y un rechazo o una expiración recientes se ven
+    aunque la instancia venga del caché por RUT. El UPDATE es la primera
+    sentencia de la transacción, así toma el bloqueo de escritura antes de
+    leer nada (en SQLite, leer primero hace fallar con "database is locked").
+    """
+    disponible = CupoCanje.objects.filter(
+        Exists(_canjeable(solicitud_id)), solicitud_id=solicitud_id, periodo=periodo, usados__lt=cupo,
+    )
+    if disponible.update(usados=F('usados') + 1):
+        return True
+    if cupo < 1 or not _canjeable(solicitud_id).exists():
+        return False
+    try:
+        with transaction.atomic():
+            CupoCanje.objects.create(solicitud_id=solicitud_id, periodo=periodo, usados=0)
+    except IntegrityError:
+        # La fila ya existía (sin cupo) o la creó otro canje entre el UPDATE y el INSERT
+        pass
+    return bool(disponible.update(usados=F('usados') + 1))
+
+
+def canjear(solicitud, vendedor=None, ahora=None):
+    """
+    Registra un canje del descuento de una solicitud aceptada y vigente,
+    dentro de CANJES_POR_MES. Retorna el Canje o lanza CanjeRechazado.
+    """
+    ahora = ahora or timezone.now()
+    periodo = periodo_de(ahora)
+    with transaction.atomic():
+        if not _tomar_cupo(solicitud.id, periodo, settings.CANJES_POR_MES):
+            # Se lee el estado solo para explicar el rechazo
+            actual = Solicitud.objects.only('estado', 'fecha_aceptacion').filter(id=solicitud.id).first()
+            if actual is None:
+                raise CanjeRechazado('La solicitud ya no existe.')
+            if actual.estado_efectivo != 'Aceptada':
+                raise CanjeRechazado(f'La solicitud está {actual.estado_efectivo.lower()}; solo se canjean solicitudes aceptadas.')
+            raise CanjeRechazado(
+                f'La solicitud no tiene canjes disponibles en {date_format(periodo, "F Y")} '
+                f'(cupo: {settings.CANJES_POR_MES}).'
+            )
+        return Canje.objects.create(
+            solicitud_id=solicitud.id,
+            vendedor=vendedor if vendedor is None or vendedor.is_authenticated else None,
+            periodo=periodo,
+            created_at=ahora,
+        )
+
+
+def usados_en(solicitud_ids, ahora=None):
+    """Mapa solicitud_id -> canjes usados en el periodo actual"""
+    return dict(
+        CupoCanje.objects.filter(solicitud_id__in=solicitud_ids, periodo=periodo_de(ahora or timezone.now()))
+        .values_list('solicitud_id', 'usados')
+    )
+
+
+async def ausados_en(solicitud_ids, ahora=None):
+    """Versión async de usados_en"""
+    filas = CupoCanje.objects.filter(solicitud_id__in=solicitud_ids, periodo=periodo_de(ahora or timezone.now()))
+    return {solicitud_id: usados async for solicitud_id, usados in filas.values_list('solicitud_id', 'usados')}
+
+
+def historial(solicitud_id):
+    """Canjes de una solicitud, del más reciente al más antiguo"""
+    return (
+        Canje.objects.filter(solicitud_id=solicitud_id)
+        .select_related('vendedor')
+        .order_by('-created_at', '-id')
+    )
@@ -0,0 +1,69 @@
+import os
+
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+from django.db import connection
+
+
+@register(Tags.database, deploy=True)
+def verificar_base_de_datos(app_configs, **kwargs):
+    """Configuración de la base de datos para producción"""
+    errores = []
+    base = settings.DATABASES['default']
+    if not base.get('PASSWORD') and base['ENGINE'].endswith('mysql'):
+        errores.append(Error(
+            'La base de datos no tiene contraseña.',
+            hint='Defina la variable de entorno DB_PASSWORD.',
+            id='descuentoGasApp.E001',
+        ))
+    if not base.get('CONN_MAX_AGE'):
+        errores.append(Warning(
+            'CONN_MAX_AGE es 0: se abre una conexión nueva por petición.',
+            hint='Use settings_produccion o defina DB_CONN_MAX_AGE.',
+            id='descuentoGasApp.W001',
+        ))
+    # Solo se conecta si se pidió explícitamente (check --database default)
+    if 'default' in (kwargs.get('databases') or ()):
+        try:
+            connection.ensure_connection()
+        except Exception as e:
+            errores.append(Error(
+                f'No se pudo conectar a la base de datos: {e}',
+                id='descuentoGasApp.E002',
+            ))
+    return errores
+
+
+@register(Tags.caches, deploy=True)
+def verificar_cache(app_configs, **kwargs):
+    """Roles, búsquedas por RUT y límites de peticiones necesitan un caché compartido entre procesos"""
+    alias = settings.CACHE_RUT
+    backends = {
+        settings.CACHES['default']['BACKEND'],
+        settings.CACHES[alias]['BACKEND'],
+        settings.CACHES[settings.LIMITES_CACHE]['BACKEND'],
+    }
+    if any(backend.endswith('LocMemCache') for backend in backends):
+        return [Error(
+            'El caché es local a cada proceso: un rol revocado sigue activo en los demás procesos, '
+            'la invalidación de búsquedas por RUT no les llega y cada proceso cuenta sus propios límites.',
+            hint='Defina DJANGO_CACHE_BACKEND y DJANGO_CACHE_LOCATION (por ejemplo Redis).',
+            id='descuentoGasApp.E004',
+        )]
+    return []
+
+
+@register(Tags.staticfiles, deploy=True)
+def verificar_estaticos(app_configs, **kwargs):
+    """Con ManifestStaticFilesStorage, sin collectstatic ninguna página se puede renderizar"""
+    almacen = settings.STORAGES.get('staticfiles', {}).get('BACKEND', '')
+    if not almacen.endswith('ManifestStaticFilesStorage'):
+        return []
+    manifiesto = os.path.join(settings.STATIC_ROOT or '', 'staticfiles.json')
+    if not os.path.exists(manifiesto):
+        return [Error(
+            f'No existe {manifiesto}.',
+            hint='Ejecute python manage.py collectstatic antes de iniciar el servidor.',
+            id='descuentoGasApp.E003',
+        )]
+    return []
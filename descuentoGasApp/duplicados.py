@@ -0,0 +1,54 @@
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+
+from . import estadisticas
+from .auditoria import RegistroEventos
+from .cache_rut import invalidar as invalidar_rut
+from .models import Solicitud
+
+TAMANO_LOTE = 1000
+
+
+def solicitudes_duplicadas():
+    """
+    Solicitudes que tienen otra más antigua con el mismo RUT canónico.
+    Se conserva siempre la primera por (fecha_solicitud, id).
+    """
+    anterior = Solicitud.objects.filter(rut_cuerpo=OuterRef('rut_cuerpo')).filter(
+        Q(fecha_solicitud__lt=OuterRef('fecha_solicitud')) |
+        Q(fecha_solicitud=OuterRef('fecha_solicitud'), id__lt=OuterRef('id'))
+    )
+    return Solicitud.objects.filter(rut_cuerpo__isnull=False).filter(Exists(anterior))
+
+
+def resumen_duplicados():
+    """Retorna (solicitudes a eliminar, RUTs afectados) sin modificar datos"""
+    duplicadas = solicitudes_duplicadas()
+    return duplicadas.count(), duplicadas.values('rut_cuerpo').distinct().count()
+
+
+def eliminar_duplicados(tamano_lote=TAMANO_LOTE, usuario=None):
+    """
+    Elimina los duplicados en lotes acotados: cada lote es un SELECT de ids y
+    un único DELETE ... WHERE id IN (...), en su propia transacción, sin importar
+    cuántos RUTs estén repetidos. Retorna la cantidad de solicitudes eliminadas.
+    """
+    total = 0
+    while True:
+        with transaction.atomic():
+            ids = list(solicitudes_duplicadas().values_list('id', flat=True)[:tamano_lote])
+            if not ids:
+                break
+            lote = Solicitud.objects.filter(id__in=ids)
+            filas = list(lote.values_list('id', 'estado', 'comuna_id', 'fecha_solicitud', 'rut_cuerpo'))
+            # delete() también cuenta las filas borradas en cascada (términos de búsqueda, cupos)
+            _, por_modelo = lote.delete()
+            eliminadas = por_modelo.get(Solicitud._meta.label, 0)
+            estadisticas.aplicar(estadisticas.contar([fila[1:4] for fila in filas], signo=-1))
+
+            with RegistroEventos(usuario) as registro:
+                for id_, estado, _, _, _ in filas:
+                    registro.agregar(id_, 'eliminacion', estado)
+            invalidar_rut(*(fila[4] for fila in filas))
+            total += eliminadas
+    return total
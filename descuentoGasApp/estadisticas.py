@@ -0,0 +1,104 @@
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import ResumenSolicitudes, Solicitud, limite_vigencia
+from .paginacion import recorrer_por_id
+
+TAMANO_BLOQUE = 5000
+
+
+def mes_de(fecha):
+    """Primer día del mes de la fecha, en la zona horaria local"""
+    return timezone.localtime(fecha).date().replace(day=1)
+
+
+def contar(filas, signo=1):
+    """
+    Agrupa filas (estado, comuna_id, fecha_solicitud) en un Counter con
+    clave (mes, comuna_id, estado), multiplicado por signo.
+    """
+    deltas = Counter()
+    for estado, comuna_id, fecha_solicitud in filas:
+        deltas[(mes_de(fecha_solicitud), comuna_id, estado)] += signo
+    return deltas
+
+
+def filas_de(queryset):
+    return queryset.values_list('estado', 'comuna_id', 'fecha_solicitud')
+
+
+def aplicar(deltas):
+    """
+    Suma los deltas al resumen con UPDATE cantidad = cantidad + n, creando
+    la fila si aún no existe. Debe llamarse en la misma transacción que la
+    escritura sobre Solicitud.
+    """
+    for (mes, comuna_id, estado), n in deltas.items():
+        if not n:
+            continue
+        filtro = ResumenSolicitudes.objects.filter(mes=mes, comuna_id=comuna_id, estado=estado)
+        if filtro.update(cantidad=F('cantidad') + n):
+            continue
+        try:
+            with transaction.atomic():
+                ResumenSolicitudes.objects.create(mes=mes, comuna_id=comuna_id, estado=estado, cantidad=n)
+        except IntegrityError:
+            # Otra transacción creó la fila entre el UPDATE y el INSERT
+            filtro.update(cantidad=F('cantidad') + n)
+
+
+def registrar_alta(solicitud):
+    aplicar(contar([(solicitud.estado, solicitud.comuna_id, solicitud.fecha_solicitud)]))
+
+
+def registrar_baja(solicitud):
+    aplicar(contar([(solicitud.estado, solicitud.comuna_id, solicitud.fecha_solicitud)], signo=-1))
+
+
+def registrar_cambio_estado(solicitud, estado_anterior):
+    if estado_anterior == solicitud.estado:
+        return
+    deltas = contar([(estado_anterior, solicitud.comuna_id, solicitud.fecha_solicitud)], signo=-1)
+    deltas.update(contar([(solicitud.estado, solicitud.comuna_id, solicitud.fecha_solicitud)]))
+    aplicar(deltas)
+
+
+def reconstruir():
+    """Recalcula el resumen completo desde Solicitud, para corregir desviaciones"""
+    filas = recorrer_por_id(Solicitud.objects.values_list('id', 'estado', 'comuna_id', 'fecha_solicitud'), TAMANO_BLOQUE)
+    deltas = contar(fila[1:] for fila in filas)
+    with transaction.atomic():
+        ResumenSolicitudes.objects.all().delete()
+        ResumenSolicitudes.objects.bulk_create([
+            ResumenSolicitudes(mes=mes, comuna_id=comuna_id, estado=estado, cantidad=n)
+            for (mes, comuna_id, estado), n in deltas.items()
+        ], batch_size=1000)
+    return len(deltas)
+
+
+def totales(*campos):
+    """Suma del resumen agrupada por los campos indicados"""
+    return (
+        ResumenSolicitudes.objects.values(*campos)
+        .annotate(total=Sum('cantidad'))
+        .filter(total__gt=0)
+    )
+
+
+def totales_por_estado(ahora=None):
+    """
+    Mapa estado -> total según el estado efectivo. El resumen guarda el
+    estado almacenado, así que las aceptadas vencidas que expirar_solicitudes
+    aún no compacta se pasan de Aceptada a Expirada con un COUNT sobre el
+    índice (estado, fecha_aceptacion). Los totales por región, comuna y mes
+    no cambian con esa corrección.
+    """
+    por_estado = {item['estado']: item['total'] for item in totales('estado')}
+    vencidas = Solicitud.objects.filter(estado='Aceptada', fecha_aceptacion__lte=limite_vigencia(ahora)).count()
+    if vencidas:
+        por_estado['Aceptada'] = por_estado.get('Aceptada', 0) - vencidas
+        por_estado['Expirada'] = por_estado.get('Expirada', 0) + vencidas
+    return por_estado
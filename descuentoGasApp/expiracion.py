@@ -0,0 +1,46 @@
+from django.db import transaction
+from django.utils import timezone
+
+from . import estadisticas
+from .auditoria import RegistroEventos
+from .cache_rut import invalidar as invalidar_rut
+from .models import Solicitud, limite_vigencia
+
+TAMANO_LOTE = 1000
+
+
+def solicitudes_vencidas(ahora=None):
+    """Solicitudes aceptadas cuya vigencia ya terminó (usa el índice estado + fecha_aceptacion)"""
+    return Solicitud.objects.filter(estado='Aceptada', fecha_aceptacion__lte=limite_vigencia(ahora))
+
+
+def expirar_solicitudes(tamano_lote=TAMANO_LOTE, ahora=None):
+    """
+    Persiste como 'Expirada' las solicitudes vencidas, en lotes de tamano_lote
+    filas para no bloquear la tabla completa. Las vistas ya muestran el estado
+    efectivo, así que basta con ejecutarlo de vez en cuando. Retorna la
+    cantidad expirada.
+    """
+    total = 0
+    while True:
+        ids = list(solicitudes_vencidas(ahora).values_list('id', flat=True)[:tamano_lote])
+        if not ids:
+            break
+        with transaction.atomic():
+            # Se repite el filtro completo por si la solicitud cambió entre ambas consultas
+            # (por ejemplo, se volvió a aceptar y su vigencia empezó de nuevo)
+            lote = solicitudes_vencidas(ahora).select_for_update().filter(id__in=ids)
+            filas = list(lote.values_list('id', 'comuna_id', 'fecha_solicitud', 'rut_cuerpo'))
+            Solicitud.objects.filter(id__in=[fila[0] for fila in filas]).update(
+                estado='Expirada', fecha_modificacion=timezone.now()
+            )
+            deltas = estadisticas.contar([('Aceptada', c, f) for _, c, f, _ in filas], signo=-1)
+            deltas.update(estadisticas.contar([('Expirada', c, f) for _, c, f, _ in filas]))
+            estadisticas.aplicar(deltas)
+
+            with RegistroEventos() as registro:
+                for id_, _, _, _ in filas:
+                    registro.agregar(id_, 'expiracion', 'Aceptada', 'Expirada')
+            invalidar_rut(*(fila[3] for fila in filas))
+        total += len(filas)
+    return total
@@ -0,0 +1,89 @@
+import csv
+import json
+
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+
+from .models import estado_efectivo_expr
+from .paginacion import recorrer_por_id
+
+CAMPOS = [
+    'id', 'rut', 'nombre', 'apellido_paterno', 'apellido_materno', 'direccion',
+    'telefono', 'comuna', 'region', 'estado', 'fecha_solicitud', 'fecha_aceptacion',
+]
+
+# Columnas que no corresponden directamente a un campo de Solicitud
+COLUMNAS = {
+    'comuna': 'comuna__nombre',
+    'region': 'comuna__region__nombre',
+}
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+TAMANO_BLOQUE = 2000
+
+
+class _Eco:
+    """Pseudo-archivo para csv.writer: retorna la línea en vez de guardarla"""
+
+    def write(self, valor):
+        return valor
+
+
+def _serializar(valor):
+    if valor is None:
+        return ''
+    if hasattr(valor, 'isoformat'):
+        return timezone.localtime(valor).isoformat()
+    return valor
+
+
+def _consulta(queryset):
+    # values_list por lotes de id: no se crean instancias ni se lee la tabla completa de una vez
+    columnas = [estado_efectivo_expr() if campo == 'estado' else COLUMNAS.get(campo, campo) for campo in CAMPOS]
+    return queryset.values_list(*columnas)
+
+
+def _formato(formato):
+    """Retorna (líneas de encabezado, función fila -> línea) del formato"""
+    if formato == 'ndjson':
+        return [], lambda fila: json.dumps(
+            {campo: _serializar(v) or None for campo, v in zip(CAMPOS, fila)}, ensure_ascii=False
+        ) + '\n'
+    writer = csv.writer(_Eco())
+    return [writer.writerow(CAMPOS)], lambda fila: writer.writerow([_serializar(v) for v in fila])
+
+
+def exportar(queryset, formato):
+    """Genera el archivo línea por línea (CSV con encabezado, o un objeto JSON por línea)"""
+    encabezado, linea = _formato(formato)
+    yield from encabezado
+    for fila in recorrer_por_id(_consulta(queryset), TAMANO_BLOQUE):
+        yield linea(fila)
+
+
+def _en_bloques(lineas, tamano=TAMANO_BLOQUE):
+    bloque = []
+    for linea in lineas:
+        bloque.append(linea)
+        if len(bloque) >= tamano:
+            yield ''.join(bloque)
+            bloque = []
+    if bloque:
+        yield ''.join(bloque)
+
+
+async def aexportar(queryset, formato):
+    """
+    Versión async de exportar, para StreamingHttpResponse bajo ASGI: con un
+    iterador sync, Django lo consumiría completo en memoria antes de enviarlo.
+    Cada bloque de TAMANO_BLOQUE líneas se genera en el hilo sync de la
+    petición, que conserva la conexión entre bloques.
+    """
+    bloques = _en_bloques(exportar(queryset, formato))
+    siguiente = sync_to_async(lambda: next(bloques, None))
+    while (bloque := await siguiente()) is not None:
+        yield bloque
@@ -1,11 +1,41 @@
 from django import forms
 from django.contrib.auth.models import User, Group
 from django.contrib.auth.forms import PasswordChangeForm
-from .models import Solicitud
-from .regiones_comunas import get_all_regiones, get_comunas_by_region, REGIONES_COMUNAS
+from .busqueda import LARGO_MINIMO, terminos_consulta
+from .models import Comuna, Solicitud
+from .rut import normalizar_rut, formatear_rut
+from .regiones_comunas import get_all_regiones, get_comunas_by_region, canonizar_comuna, REGIONES_COMUNAS
 import re
 
 
+def normalizar_telefono(telefono):
+    """Valida un teléfono móvil chileno y lo retorna sin código de país"""
+    # Limpiar espacios y guiones
+    telefono_clean = telefono.replace(' ', '').replace('-', '')
+    
+    # Validar formato chileno: 9XXXXXXXX o +569XXXXXXXX
+    if not re.match(r'^(\+?56)?9\d{8}$', telefono_clean):
+        raise forms.ValidationError(
+            'Número de teléfono inválido. Use formato: 9XXXXXXXX o +569XXXXXXXX'
+        )
+    
+    # Normalizar al formato sin código de país para guardar
+    if telefono_clean.startswith('+56'):
+        telefono_clean = telefono_clean[3:]
+    elif telefono_clean.startswith('56'):
+        telefono_clean = telefono_clean[2:]
+    
+    return telefono_clean
+
+
+def validar_comuna(comuna):
+    """Retorna el nombre oficial de la comuna o lanza ValidationError"""
+    canonica = canonizar_comuna(comuna)
+    if not canonica:
+        raise forms.ValidationError(f'"{comuna}" no es una comuna de Chile.')
+    return canonica
+
+
 class SolicitudForm(forms.ModelForm):
     # Campo adicional para región (no se guarda en BD)
     region = forms.ChoiceField(
@@ -17,6 +47,16 @@ class SolicitudForm(forms.ModelForm):
         }),
         label='Región'
     )
+    # Texto libre con autocompletado; clean_comuna lo convierte en una Comuna
+    comuna = forms.CharField(
+        max_length=100,
+        widget=forms.TextInput(attrs={
+            'class': 'form-control',
+            'id': 'id_comuna_input',
+            'placeholder': 'Escriba para buscar...'
+        }),
+        label='Comuna'
+    )
     
     class Meta:
         model = Solicitud
@@ -36,49 +76,157 @@ class SolicitudForm(forms.ModelForm):
                 'pattern': '^(\+?56)?9\d{8}$',
                 'title': 'Formato: 9XXXXXXXX o +569XXXXXXXX'
             }),
-            'comuna': forms.TextInput(attrs={
-                'class': 'form-control',
-                'id': 'id_comuna_input',
-                'placeholder': 'Escriba para buscar...'
-            }),
         }
 
     def clean_rut(self):
         rut = self.cleaned_data.get('rut', '')
         if rut:
-            rut_clean = rut.replace(' ', '')
-            if len(rut_clean) < 7 or len(rut_clean) > 12:
-                raise forms.ValidationError('RUT debe tener entre 7 y 12 caracteres (incluyendo guión y dígito verificador).')
-            if not re.match(r'^[0-9\.\-kK]+$', rut_clean):
-                raise forms.ValidationError('Formato de RUT inválido. Use solo números, puntos, guión y K.')
-            return rut_clean
+            try:
+                cuerpo, dv = normalizar_rut(rut)
+            except ValueError as e:
+                raise forms.ValidationError(f'{e}. Use formato: 12.345.678-5 o 12345678-5.')
+            if Solicitud.objects.filter(rut_cuerpo=cuerpo).exists():
+                raise forms.ValidationError('Ya existe una solicitud con ese RUT.')
+            return formatear_rut(cuerpo, dv)
         return rut
     
     def clean_telefono(self):
         telefono = self.cleaned_data.get('telefono', '')
         if telefono:
-            # Limpiar espacios y guiones
-            telefono_clean = telefono.replace(' ', '').replace('-', '')
-            
-            # Validar formato chileno: 9XXXXXXXX o +569XXXXXXXX
-            if not re.match(r'^(\+?56)?9\d{8}$', telefono_clean):
-                raise forms.ValidationError(
-                    'Número de teléfono inválido. Use formato: 9XXXXXXXX o +569XXXXXXXX'
-                )
-            
-            # Normalizar al formato sin código de país para guardar
-            if telefono_clean.startswith('+56'):
-                telefono_clean = telefono_clean[3:]
-            elif telefono_clean.startswith('56'):
-                telefono_clean = telefono_clean[2:]
-            
-            return telefono_clean
+            return normalizar_telefono(telefono)
         return telefono
 
+    def clean_comuna(self):
+        comuna = validar_comuna(self.cleaned_data.get('comuna', ''))
+        try:
+            return Comuna.objects.select_related('region').get(nombre=comuna)
+        except Comuna.DoesNotExist:
+            raise forms.ValidationError(f'La comuna {comuna} no está registrada.')
+
+    def clean(self):
+        cleaned_data = super().clean()
+        region = cleaned_data.get('region')
+        comuna = cleaned_data.get('comuna')
+
+        if region and comuna and comuna.region.nombre != region:
+            self.add_error('comuna', f'La comuna {comuna} no pertenece a la {region}.')
+
+        return cleaned_data
+
 
 class BuscarSolicitudForm(forms.Form):
     rut = forms.CharField(max_length=12, label="RUT", widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': '12.345.678-5'}))
 
+    def clean_rut(self):
+        try:
+            cuerpo, dv = normalizar_rut(self.cleaned_data.get('rut', ''))
+        except ValueError as e:
+            raise forms.ValidationError(f'{e}.')
+        return formatear_rut(cuerpo, dv)
+
+
+class BusquedaSolicitudesForm(forms.Form):
+    q = forms.CharField(
+        max_length=200,
+        label='Buscar',
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Nombre, apellido, dirección o teléfono'})
+    )
+
+    def clean_q(self):
+        q = self.cleaned_data.get('q', '')
+        if not terminos_consulta(q):
+            raise forms.ValidationError(f'Ingrese al menos una palabra de {LARGO_MINIMO} caracteres o más.')
+        return q
+
+
+class FiltroSolicitudesForm(forms.Form):
+    estado = forms.ChoiceField(
+        choices=[('', 'Todos los estados')] + Solicitud.ESTADOS,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    region = forms.ChoiceField(
+        choices=[('', 'Todas las regiones')] + [(r, r) for r in get_all_regiones()],
+        required=False,
+        label='Región',
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    comuna = forms.CharField(
+        max_length=100,
+        required=False,
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Comuna'})
+    )
+    fecha_desde = forms.DateField(
+        required=False,
+        label='Desde',
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
+    )
+    fecha_hasta = forms.DateField(
+        required=False,
+        label='Hasta',
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
+    )
+
+    def clean_comuna(self):
+        comuna = self.cleaned_data.get('comuna', '')
+        return canonizar_comuna(comuna) or comuna
+
+    def clean(self):
+        cleaned_data = super().clean()
+        desde = cleaned_data.get('fecha_desde')
+        hasta = cleaned_data.get('fecha_hasta')
+
+        if desde and hasta and desde > hasta:
+            raise forms.ValidationError('La fecha inicial no puede ser posterior a la fecha final.')
+
+        return cleaned_data
+
+
+class ListaIdsField(forms.Field):
+    """Lista de ids enviada como varios valores con el mismo nombre"""
+    widget = forms.MultipleHiddenInput
+
+    def to_python(self, value):
+        try:
+            return [int(v) for v in value or []]
+        except (TypeError, ValueError):
+            raise forms.ValidationError('Selección inválida.')
+
+
+class CambioEstadoMasivoForm(forms.Form):
+    estado = forms.ChoiceField(
+        choices=[('', 'Nuevo estado')] + Solicitud.ESTADOS,
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    ids = ListaIdsField(required=False)
+    todas = forms.BooleanField(required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not cleaned_data.get('ids') and not cleaned_data.get('todas'):
+            raise forms.ValidationError('Seleccione al menos una solicitud.')
+        return cleaned_data
+
+
+class ImportarSolicitudesForm(forms.Form):
+    archivo = forms.FileField(
+        label='Archivo',
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.xlsx'})
+    )
+    lote = forms.IntegerField(
+        label='Filas por lote',
+        required=False,
+        min_value=1,
+        max_value=5000,
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'placeholder': '500'})
+    )
+
+    def clean_archivo(self):
+        archivo = self.cleaned_data.get('archivo')
+        if archivo and not archivo.name.lower().endswith(('.csv', '.xlsx')):
+            raise forms.ValidationError('Formato no soportado. Use un archivo .csv o .xlsx.')
+        return archivo
+
 
 class CrearUsuarioForm(forms.ModelForm):
     password = forms.CharField(
@@ -0,0 +1,202 @@
+import codecs
+import csv
+import io
+from zipfile import BadZipFile
+
+from django import forms
+from django.db import IntegrityError, transaction
+
+from .forms import normalizar_telefono, validar_comuna
+from . import estadisticas
+from .busqueda import indexar as indexar_busqueda
+from .cache_rut import invalidar as invalidar_rut
+from .models import Comuna, Solicitud
+from .rut import normalizar_rut, formatear_rut
+
+COLUMNAS = ['rut', 'nombre', 'apellido_paterno', 'apellido_materno', 'direccion', 'telefono', 'comuna']
+
+TAMANO_LOTE = 500
+
+
+class ArchivoInvalido(Exception):
+    """El archivo no se puede leer o no tiene las columnas esperadas"""
+
+
+def leer_filas(archivo, nombre):
+    """
+    Genera (número de fila, dict) desde un archivo CSV o XLSX sin cargarlo
+    completo en memoria. La primera fila debe contener los nombres de COLUMNAS.
+    """
+    if nombre.lower().endswith('.xlsx'):
+        filas = _filas_xlsx(archivo)
+    elif nombre.lower().endswith('.csv'):
+        filas = _filas_csv(archivo)
+    else:
+        raise ArchivoInvalido('Formato no soportado. Use un archivo .csv o .xlsx.')
+
+    encabezado = [str(c or '').strip().lower() for c in next(filas, [])]
+    faltantes = [c for c in COLUMNAS if c not in encabezado]
+    if faltantes:
+        raise ArchivoInvalido(f'Faltan columnas: {", ".join(faltantes)}')
+
+    for numero, valores in enumerate(filas, start=2):
+        if not any(valores):
+            continue
+        yield numero, dict(zip(encabezado, ('' if v is None else str(v).strip() for v in valores)))
+
+
+def _codificacion(archivo):
+    """
+    UTF-8 si todo el archivo lo es; si no, cp1252 (lo que guarda Excel en
+    Windows) o latin-1. Se decide antes de leer la primera fila, así un error
+    de codificación nunca aparece después de insertar los primeros lotes.
+    """
+    for codificacion in ('utf-8-sig', 'cp1252'):
+        decodificador = codecs.getincrementaldecoder(codificacion)()
+        archivo.seek(0)
+        try:
+            for bloque in iter(lambda: archivo.read(64 * 1024), b''):
+                decodificador.decode(bloque)
+            decodificador.decode(b'', final=True)
+        except UnicodeDecodeError:
+            continue
+        finally:
+            archivo.seek(0)
+        return codificacion
+    return 'latin-1'
+
+
+def _filas_csv(archivo):
+    texto = io.TextIOWrapper(archivo, encoding=_codificacion(archivo), newline='')
+    try:
+        dialecto = csv.Sniffer().sniff(texto.read(4096), delimiters=',;')
+    except csv.Error:
+        dialecto = csv.excel
+    texto.seek(0)
+    yield from csv.reader(texto, dialecto)
+
+
+def _filas_xlsx(archivo):
+    try:
+        from openpyxl import load_workbook
+        from openpyxl.utils.exceptions import InvalidFileException
+    except ImportError:
+        raise ArchivoInvalido('La importación de XLSX requiere el paquete openpyxl.')
+    try:
+        libro = load_workbook(archivo, read_only=True, data_only=True)
+    except (BadZipFile, InvalidFileException, KeyError):
+        raise ArchivoInvalido('El archivo no es un XLSX válido o está dañado.')
+    try:
+        yield from libro.active.iter_rows(values_only=True)
+    finally:
+        libro.close()
+
+
+def validar_fila(datos, comunas):
+    """
+    Aplica las reglas de SolicitudForm a una fila, sin consultar la base de datos.
+    comunas es el mapa nombre -> id de Comuna. Retorna una Solicitud sin
+    guardar o lanza ValidationError.
+    """
+    for campo in COLUMNAS:
+        if not datos.get(campo):
+            raise forms.ValidationError(f'El campo {campo} es obligatorio.')
+        modelo = Comuna._meta.get_field('nombre') if campo == 'comuna' else Solicitud._meta.get_field(campo)
+        max_length = modelo.max_length
+        if len(datos[campo]) > max_length:
+            raise forms.ValidationError(f'El campo {campo} supera los {max_length} caracteres.')
+
+    try:
+        cuerpo, dv = normalizar_rut(datos['rut'])
+    except ValueError as e:
+        raise forms.ValidationError(f'{e}.')
+
+    return Solicitud(
+        rut=formatear_rut(cuerpo, dv),
+        rut_cuerpo=cuerpo,
+        rut_dv=dv,
+        nombre=datos['nombre'],
+        apellido_paterno=datos['apellido_paterno'],
+        apellido_materno=datos['apellido_materno'],
+        direccion=datos['direccion'],
+        telefono=normalizar_telefono(datos['telefono']),
+        comuna_id=comunas[validar_comuna(datos['comuna'])],
+    )
+
+
+def importar_solicitudes(filas, tamano_lote=TAMANO_LOTE, al_error=None):
+    """
+    Valida e inserta las filas en lotes con bulk_create. Los RUT ya registrados
+    se detectan con una sola consulta por lote. Cada fila rechazada se informa a
+    al_error(fila, rut, mensaje) en vez de abortar la importación.
+    Retorna la tupla (creadas, rechazadas).
+    """
+    creadas = rechazadas = 0
+    comunas = dict(Comuna.objects.filter(region__isnull=False).values_list('nombre', 'id'))
+
+    def rechazar(numero, rut, mensaje):
+        nonlocal rechazadas
+        rechazadas += 1
+        if al_error:
+            al_error(numero, rut, mensaje)
+
+    lote = []
+    for numero, datos in filas:
+        try:
+            lote.append((numero, validar_fila(datos, comunas)))
+        except forms.ValidationError as e:
+            rechazar(numero, datos.get('rut', ''), ' '.join(e.messages))
+            continue
+        if len(lote) >= tamano_lote:
+            creadas += insertar_lote(lote, rechazar)
+            lote = []
+    if lote:
+        creadas += insertar_lote(lote, rechazar)
+
+    return creadas, rechazadas
+
+
+def insertar_lote(lote, rechazar):
+    """
+    Inserta una lista de (referencia, Solicitud) con un solo bulk_create,
+    manteniendo estadísticas, índice de búsqueda y caché (bulk_create no
+    emite post_save, así que el índice se llena aquí). Los RUT que ya
+    existen, o que gana otra escritura concurrente, se informan a
+    rechazar(referencia, rut, mensaje). Retorna la cantidad insertada.
+    """
+    existentes = set(
+        Solicitud.objects.filter(rut_cuerpo__in=[s.rut_cuerpo for _, s in lote])
+        .values_list('rut_cuerpo', flat=True)
+    )
+    nuevas = []
+    for numero, solicitud in lote:
+        if solicitud.rut_cuerpo in existentes:
+            rechazar(numero, solicitud.rut, 'Ya existe una solicitud con ese RUT.')
+            continue
+        existentes.add(solicitud.rut_cuerpo)
+        nuevas.append((numero, solicitud))
+
+    try:
+        with transaction.atomic():
+            creadas = Solicitud.objects.bulk_create([s for _, s in nuevas])
+            estadisticas.aplicar(estadisticas.contar(
+                (s.estado, s.comuna_id, s.fecha_solicitud) for s in creadas
+            ))
+            indexar_busqueda(creadas)
+            invalidar_rut(*(s.rut_cuerpo for s in creadas))
+        return len(creadas)
+    except IntegrityError:
+        pass
+
+    # Otra escritura concurrente ganó algún RUT: se reintenta fila por fila
+    creadas = 0
+    for numero, solicitud in nuevas:
+        try:
+            with transaction.atomic():
+                solicitud.save()
+                estadisticas.registrar_alta(solicitud)
+                invalidar_rut(solicitud.rut_cuerpo)
+            creadas += 1
+        except IntegrityError:
+            rechazar(numero, solicitud.rut, 'Ya existe una solicitud con ese RUT.')
+    return creadas
@@ -0,0 +1,207 @@
+import base64
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from .importacion import insertar_lote
+from .models import Solicitud
+from .rut import separar_rut
+
+TAMANO_LOTE = 500
+# Segundos tras los cuales un lote reclamado y no resuelto se vuelve a procesar
+VENCIMIENTO_RECLAMO = 300
+
+CAMPOS = ['rut', 'rut_cuerpo', 'rut_dv', 'nombre', 'apellido_paterno', 'apellido_materno', 'direccion', 'telefono', 'comuna_id']
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS ingreso (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    comprobante TEXT NOT NULL UNIQUE,
+    rut_cuerpo INTEGER NOT NULL,
+    datos TEXT NOT NULL,
+    estado TEXT NOT NULL DEFAULT 'pendiente',
+    mensaje TEXT NOT NULL DEFAULT '',
+    recibido REAL NOT NULL,
+    actualizado REAL NOT NULL
+);
+-- Un RUT no puede estar dos veces en cola
+CREATE UNIQUE INDEX IF NOT EXISTS ingreso_rut_en_cola ON ingreso (rut_cuerpo) WHERE estado IN ('pendiente', 'procesando');
+CREATE INDEX IF NOT EXISTS ingreso_estado ON ingreso (estado, id);
+"""
+
+ESTADOS = {
+    'pendiente': 'En proceso',
+    'procesando': 'En proceso',
+    'ingresada': 'Ingresada',
+    'rechazada': 'Rechazada',
+}
+
+
+class RutEnCola(Exception):
+    """Ya hay una solicitud con ese RUT esperando en el diario"""
+
+
+_local = threading.local()
+
+
+def _conexion():
+    """
+    Una conexión por hilo al diario, en modo WAL y con synchronous=FULL: una
+    solicitud recibida sobrevive a una caída del proceso o del servidor.
+    """
+    conexion = getattr(_local, 'conexion', None)
+    if conexion is None:
+        conexion = sqlite3.connect(settings.INGRESO_DIARIO, timeout=30, isolation_level=None)
+        conexion.execute('PRAGMA journal_mode=WAL')
+        conexion.execute('PRAGMA synchronous=FULL')
+        conexion.executescript(ESQUEMA)
+        _local.conexion = conexion
+    return conexion
+
+
+@contextmanager
+def _transaccion(modo=''):
+    """Transacción explícita: la conexión está en autocommit y cada commit hace fsync"""
+    conexion = _conexion()
+    conexion.execute(f'BEGIN {modo}')
+    try:
+        yield conexion
+    except BaseException:
+        conexion.execute('ROLLBACK')
+        raise
+    conexion.execute('COMMIT')
+
+
+def _nuevo_comprobante():
+    return base64.b32encode(secrets.token_bytes(5)).decode()
+
+
+def datos_de(solicitud):
+    """Campos de una Solicitud sin guardar que se anotan en el diario"""
+    solicitud.rut_cuerpo, solicitud.rut_dv = separar_rut(solicitud.rut)
+    return {campo: getattr(solicitud, campo) for campo in CAMPOS}
+
+
+def encolar(datos):
+    """Anota una solicitud validada en el diario y retorna su número de comprobante"""
+    ahora = time.time()
+    conexion = _conexion()
+    for _ in range(3):
+        comprobante = _nuevo_comprobante()
+        try:
+            conexion.execute(
+                'INSERT INTO ingreso (comprobante, rut_cuerpo, datos, recibido, actualizado) VALUES (?, ?, ?, ?, ?)',
+                (comprobante, datos['rut_cuerpo'], json.dumps(datos), ahora, ahora),
+            )
+            return comprobante
+        except sqlite3.IntegrityError as e:
+            if 'comprobante' not in str(e):
+                raise RutEnCola(datos['rut'])
+    raise RuntimeError('No se pudo generar un comprobante único.')
+
+
+def consultar(comprobante):
+    """Estado de un comprobante, o None si no existe"""
+    if not os.path.exists(settings.INGRESO_DIARIO):
+        return None
+    fila = _conexion().execute(
+        'SELECT estado, mensaje, recibido FROM ingreso WHERE comprobante = ?', (comprobante.strip().upper(),)
+    ).fetchone()
+    if fila is None:
+        return None
+    estado, mensaje, recibido = fila
+    return {'estado': estado, 'descripcion': ESTADOS[estado], 'mensaje': mensaje, 'recibido': recibido}
+
+
+def _reclamar(tamano, vencimiento):
+    """
+    Marca como 'procesando' hasta tamano entradas pendientes, más las que un
+    trabajador anterior dejó a medias, en una transacción exclusiva: varios
+    trabajadores nunca toman la misma entrada. Retorna (id, datos, reintento).
+    """
+    ahora = time.time()
+    with _transaccion('IMMEDIATE') as conexion:
+        filas = conexion.execute(
+            "SELECT id, datos, estado FROM ingreso"
+            " WHERE estado = 'pendiente' OR (estado = 'procesando' AND actualizado < ?)"
+            " ORDER BY id LIMIT ?",
+            (ahora - vencimiento, tamano),
+        ).fetchall()
+        conexion.executemany(
+            "UPDATE ingreso SET estado = 'procesando', actualizado = ? WHERE id = ?",
+            [(ahora, id_) for id_, _, _ in filas],
+        )
+    return [(id_, json.loads(datos), estado == 'procesando') for id_, datos, estado in filas]
+
+
+def _resolver(resultados):
+    ahora = time.time()
+    with _transaccion() as conexion:
+        conexion.executemany(
+            'UPDATE ingreso SET estado = ?, mensaje = ?, actualizado = ? WHERE id = ?',
+            [(estado, mensaje, ahora, id_) for id_, (estado, mensaje) in resultados.items()],
+        )
+
+
+def _insertadas_antes(entradas):
+    """
+    En un reintento, el RUT "ya existente" puede ser la propia entrada,
+    insertada por un trabajador que se cayó antes de anotarla, o la de otro
+    postulante. Retorna los rut_cuerpo cuya fila coincide campo a campo con
+    la entrada del diario.
+    """
+    if not entradas:
+        return set()
+    existentes = {
+        fila['rut_cuerpo']: fila
+        for fila in Solicitud.objects.filter(rut_cuerpo__in=[e['rut_cuerpo'] for e in entradas]).values(*CAMPOS)
+    }
+    return {e['rut_cuerpo'] for e in entradas if existentes.get(e['rut_cuerpo']) == e}
+
+
+def drenar(tamano=TAMANO_LOTE, vencimiento=VENCIMIENTO_RECLAMO):
+    """
+    Pasa un lote del diario a Solicitud con un bulk_create y anota el
+    resultado de cada comprobante. Retorna la tupla (ingresadas, rechazadas).
+    """
+    reclamadas = _reclamar(tamano, vencimiento)
+    if not reclamadas:
+        return 0, 0
+
+    rechazos = {}
+    insertar_lote(
+        [(id_, Solicitud(**datos)) for id_, datos, _ in reclamadas],
+        lambda id_, rut, mensaje: rechazos.__setitem__(id_, mensaje),
+    )
+
+    propias = _insertadas_antes([datos for id_, datos, reintento in reclamadas if reintento and id_ in rechazos])
+    resultados = {}
+    for id_, datos, _ in reclamadas:
+        if id_ in rechazos and datos['rut_cuerpo'] not in propias:
+            resultados[id_] = ('rechazada', rechazos[id_])
+        else:
+            resultados[id_] = ('ingresada', '')
+    _resolver(resultados)
+    rechazadas = sum(1 for estado, _ in resultados.values() if estado == 'rechazada')
+    return len(resultados) - rechazadas, rechazadas
+
+
+def pendientes():
+    return _conexion().execute(
+        "SELECT COUNT(*) FROM ingreso WHERE estado IN ('pendiente', 'procesando')"
+    ).fetchone()[0]
+
+
+def purgar(dias):
+    """Elimina comprobantes resueltos hace más de dias días. Retorna la cantidad."""
+    limite = time.time() - dias * 86400
+    cursor = _conexion().execute(
+        "DELETE FROM ingreso WHERE estado IN ('ingresada', 'rechazada') AND actualizado < ?", (limite,)
+    )
+    return cursor.rowcount
@@ -0,0 +1,179 @@
+import hashlib
+import math
+import threading
+import time
+from collections import Counter
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+from .rut import normalizar_rut
+
+PREFIJO = 'limite:'
+
+
+def _cache():
+    return caches[settings.LIMITES_CACHE]
+
+
+class Contadores:
+    """Peticiones permitidas y rechazadas por regla, dentro del proceso"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._conteo = Counter()
+
+    def sumar(self, regla, resultado):
+        with self._lock:
+            self._conteo[(regla, resultado)] += 1
+
+    def valores(self):
+        with self._lock:
+            return sorted(self._conteo.items())
+
+
+contadores = Contadores()
+
+
+def _claves(regla, identificador, ventana):
+    huella = hashlib.sha1(identificador.encode()).hexdigest()[:20]
+    return f'{PREFIJO}{regla}:{huella}:{ventana}', f'{PREFIJO}{regla}:{huella}:{ventana - 1}'
+
+
+def _estimar(capacidad, periodo, ahora, actual, anterior):
+    """
+    Ventana deslizante: lo usado en la ventana anterior cuenta en proporción
+    a cuánto de ella sigue dentro del último periodo. Retorna 0 si queda cupo,
+    o los segundos hasta que se libere.
+    """
+    fraccion = (ahora % periodo) / periodo
+    if anterior * (1 - fraccion) + actual < capacidad:
+        return 0
+    if actual >= capacidad:
+        return math.ceil(periodo - ahora % periodo)
+    # Momento en que lo que queda de la ventana anterior deja espacio para una más
+    return max(1, math.ceil((1 - (capacidad - actual) / anterior - fraccion) * periodo))
+
+
+def _preparar(regla, identificador, ahora):
+    limite = settings.LIMITES_PETICIONES.get(regla)
+    if not limite or not identificador:
+        return None
+    capacidad, periodo = limite
+    ahora = time.time() if ahora is None else ahora
+    return capacidad, periodo, ahora, *_claves(regla, identificador, int(ahora // periodo))
+
+
+def consumir(regla, identificador, ahora=None):
+    """
+    Descuenta una petición de la regla para el identificador. Retorna 0 si se
+    permite o los segundos que faltan para reintentar. Un rechazo solo lee el
+    caché; una petición permitida suma con incr, que es atómico.
+    """
+    datos = _preparar(regla, identificador, ahora)
+    if datos is None:
+        return 0
+    capacidad, periodo, ahora, actual, anterior = datos
+    cache = _cache()
+    usados = cache.get_many([actual, anterior])
+    espera = _estimar(capacidad, periodo, ahora, usados.get(actual, 0), usados.get(anterior, 0))
+    if not espera:
+        if cache.add(actual, 1, 2 * periodo):
+            nuevo = 1
+        else:
+            try:
+                nuevo = cache.incr(actual)
+            except ValueError:
+                # La clave venció entre el add y el incr
+                cache.add(actual, 1, 2 * periodo)
+                nuevo = 1
+        # Otra petición pudo sumar entre la lectura y el incr
+        espera = _estimar(capacidad, periodo, ahora, nuevo - 1, usados.get(anterior, 0))
+    contadores.sumar(regla, 'rechazada' if espera else 'permitida')
+    return espera
+
+
+async def aconsumir(regla, identificador, ahora=None):
+    """Versión async de consumir"""
+    datos = _preparar(regla, identificador, ahora)
+    if datos is None:
+        return 0
+    capacidad, periodo, ahora, actual, anterior = datos
+    cache = _cache()
+    usados = await cache.aget_many([actual, anterior])
+    espera = _estimar(capacidad, periodo, ahora, usados.get(actual, 0), usados.get(anterior, 0))
+    if not espera:
+        if await cache.aadd(actual, 1, 2 * periodo):
+            nuevo = 1
+        else:
+            try:
+                nuevo = await cache.aincr(actual)
+            except ValueError:
+                await cache.aadd(actual, 1, 2 * periodo)
+                nuevo = 1
+        espera = _estimar(capacidad, periodo, ahora, nuevo - 1, usados.get(anterior, 0))
+    contadores.sumar(regla, 'rechazada' if espera else 'permitida')
+    return espera
+
+
+def ip_cliente(request):
+    if settings.LIMITES_CABECERA_IP:
+        return request.META.get(settings.LIMITES_CABECERA_IP) or request.META.get('REMOTE_ADDR')
+    return request.META.get('REMOTE_ADDR')
+
+
+def rut_enviado(request):
+    try:
+        cuerpo, _ = normalizar_rut(request.POST.get('rut', ''))
+    except ValueError:
+        return None
+    return str(cuerpo)
+
+
+def email_enviado(request):
+    return request.POST.get('email', '').strip().lower() or None
+
+
+def _rechazo(espera):
+    respuesta = HttpResponse(
+        f'Demasiados intentos. Intente nuevamente en {espera} segundos.',
+        status=429,
+        content_type='text/plain; charset=utf-8',
+    )
+    respuesta['Retry-After'] = str(espera)
+    # Sin una línea de log por rechazo (un bot la inundaría); se cuentan en las métricas
+    respuesta._has_been_logged = True
+    return respuesta
+
+
+def limitar(**reglas):
+    """
+    Aplica reglas de LIMITES_PETICIONES a los POST de la vista, en orden.
+    Cada regla recibe una función request -> identificador (None la omite).
+    La primera regla excedida responde 429 antes de validar el formulario o
+    consultar la base de datos. Sirve para vistas sync y async.
+    """
+    def decorador(vista):
+        if iscoroutinefunction(vista):
+            @wraps(vista)
+            async def envoltura(request, *args, **kwargs):
+                if request.method == 'POST':
+                    for regla, identificar in reglas.items():
+                        espera = await aconsumir(regla, identificar(request))
+                        if espera:
+                            return _rechazo(espera)
+                return await vista(request, *args, **kwargs)
+        else:
+            @wraps(vista)
+            def envoltura(request, *args, **kwargs):
+                if request.method == 'POST':
+                    for regla, identificar in reglas.items():
+                        espera = consumir(regla, identificar(request))
+                        if espera:
+                            return _rechazo(espera)
+                return vista(request, *args, **kwargs)
+        return envoltura
+    return decorador
@@ -0,0 +1,79 @@
+import json
+
+from django.core.management.base import BaseCommand
+from descuentoGasApp.benchmark import Benchmark, medir_canjes_concurrentes
+
+
+class Command(BaseCommand):
+    help = 'Mide latencia, consultas y memoria de las vistas principales y guarda el resultado en JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--escenario',
+            action='append',
+            choices=list(Benchmark().escenarios()),
+            help='Escenario a ejecutar; se puede repetir (por defecto todos)'
+        )
+        parser.add_argument(
+            '--iteraciones',
+            type=int,
+            default=50,
+            help='Mediciones por escenario (por defecto 50)'
+        )
+        parser.add_argument(
+            '--calentamiento',
+            type=int,
+            default=3,
+            help='Ejecuciones previas no medidas por escenario (por defecto 3)'
+        )
+        parser.add_argument(
+            '--concurrencia',
+            type=int,
+            default=0,
+            help='Hilos para medir canjes concurrentes (por defecto 0, no se miden)'
+        )
+        parser.add_argument(
+            '--canjes',
+            type=int,
+            default=2000,
+            help='Intentos de canje en la medición concurrente (por defecto 2000)'
+        )
+        parser.add_argument('--semilla', type=int, default=None, help='Semilla para elegir los RUT consultados')
+        parser.add_argument(
+            '--salida',
+            default='benchmark.json',
+            help='Archivo JSON de resultados (por defecto benchmark.json)'
+        )
+
+    def handle(self, *args, **options):
+        benchmark = Benchmark(
+            iteraciones=options['iteraciones'],
+            calentamiento=options['calentamiento'],
+            semilla=options['semilla'],
+        )
+        resultado = benchmark.ejecutar(options['escenario'])
+
+        self.stdout.write(f'{resultado["filas"]} solicitudes en {resultado["motor"]}, commit {resultado["commit"]}')
+        self.stdout.write(f'{"escenario":<26}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"consultas":>11}{"memoria KB":>12}')
+        for nombre, datos in resultado['escenarios'].items():
+            self.stdout.write(
+                f'{nombre:<26}{datos["p50_ms"]:>10}{datos["p95_ms"]:>10}{datos["p99_ms"]:>10}'
+                f'{datos["consultas_media"]:>11}{datos["memoria_pico_kb"]:>12}'
+            )
+
+        if options['concurrencia']:
+            canjes = medir_canjes_concurrentes(options['concurrencia'], options['canjes'])
+            resultado['canjes_concurrentes'] = canjes
+            self.stdout.write(
+                f'canjes concurrentes: {canjes["canjes_por_segundo"]} por segundo con {canjes["hilos"]} hilos, '
+                f'p95 {canjes["p95_ms"]} ms, {canjes["aceptados"]} aceptados, {canjes["rechazados"]} rechazados, '
+                f'{canjes["errores"]} errores'
+            )
+            if canjes['sobre_cupo'] or canjes['descuadres']:
+                self.stdout.write(self.style.ERROR(
+                    f'{canjes["sobre_cupo"]} solicitudes sobre su cupo y {canjes["descuadres"]} contadores descuadrados'
+                ))
+
+        with open(options['salida'], 'w', encoding='utf-8') as salida:
+            json.dump(resultado, salida, ensure_ascii=False, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Resultados guardados en {options["salida"]}'))
@@ -0,0 +1,37 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from descuentoGasApp.api import generar_token
+
+
+class Command(BaseCommand):
+    help = 'Crea un token de la API JSON para un vendedor, o revoca sus tokens'
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help='Email (usuario) del vendedor')
+        parser.add_argument(
+            '--nombre',
+            default='',
+            help='Nombre del dispositivo o punto de venta que usará el token'
+        )
+        parser.add_argument(
+            '--revocar',
+            action='store_true',
+            help='Elimina todos los tokens del usuario en vez de crear uno'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            usuario = User.objects.get(username=options['email'])
+        except User.DoesNotExist:
+            raise CommandError(f'No existe el usuario {options["email"]}')
+
+        if options['revocar']:
+            eliminados, _ = usuario.tokens_api.all().delete()
+            self.stdout.write(self.style.SUCCESS(f'Se revocaron {eliminados} tokens'))
+            return
+
+        if not usuario.groups.filter(name='Vendedor').exists():
+            self.stdout.write(self.style.WARNING('El usuario no pertenece al grupo Vendedor; la API rechazará el token'))
+        token = generar_token(usuario, options['nombre'])
+        self.stdout.write(self.style.SUCCESS('Token creado. Guárdelo ahora, no se volverá a mostrar:'))
+        self.stdout.write(token)
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from descuentoGasApp.duplicados import TAMANO_LOTE, eliminar_duplicados, resumen_duplicados
+
+
+class Command(BaseCommand):
+    help = 'Elimina solicitudes con RUT duplicado, conservando la más antigua'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo informa cuántas solicitudes se eliminarían'
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=TAMANO_LOTE,
+            help=f'Cantidad de solicitudes eliminadas por transacción (por defecto {TAMANO_LOTE})'
+        )
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            cantidad, ruts = resumen_duplicados()
+            self.stdout.write(f'Solicitudes duplicadas: {cantidad}')
+            self.stdout.write(f'RUTs afectados: {ruts}')
+            self.stdout.write(self.style.WARNING('Modo dry-run: no se eliminó ninguna solicitud'))
+            return
+
+        total = eliminar_duplicados(tamano_lote=options['lote'])
+        if total > 0:
+            self.stdout.write(self.style.SUCCESS(f'Se eliminaron {total} solicitudes duplicadas'))
+        else:
+            self.stdout.write(self.style.WARNING('No se encontraron solicitudes duplicadas'))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from descuentoGasApp.expiracion import TAMANO_LOTE, expirar_solicitudes
+
+
+class Command(BaseCommand):
+    help = 'Marca como Expirada las solicitudes aceptadas cuya vigencia terminó'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=TAMANO_LOTE,
+            help=f'Solicitudes actualizadas por UPDATE (por defecto {TAMANO_LOTE})'
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=int,
+            help='Segundos entre ejecuciones; si se indica, el comando queda corriendo como worker'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            inicio = time.monotonic()
+            expiradas = expirar_solicitudes(tamano_lote=options['lote'])
+            duracion = time.monotonic() - inicio
+            self.stdout.write(f'Solicitudes expiradas: {expiradas} ({duracion:.3f} s)')
+
+            if not options['intervalo']:
+                break
+            time.sleep(options['intervalo'])
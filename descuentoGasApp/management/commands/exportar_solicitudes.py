@@ -0,0 +1,40 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from descuentoGasApp.exportacion import FORMATOS, exportar
+from descuentoGasApp.models import Solicitud
+
+
+class Command(BaseCommand):
+    help = 'Exporta solicitudes filtradas en formato CSV o NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--formato', choices=list(FORMATOS), default='csv')
+        parser.add_argument('--estado', choices=[e for e, _ in Solicitud.ESTADOS])
+        parser.add_argument('--region')
+        parser.add_argument('--comuna')
+        parser.add_argument('--desde', type=datetime.date.fromisoformat, help='Fecha inicial (AAAA-MM-DD)')
+        parser.add_argument('--hasta', type=datetime.date.fromisoformat, help='Fecha final (AAAA-MM-DD)')
+        parser.add_argument('--salida', help='Archivo de destino (por defecto, la salida estándar)')
+
+    def handle(self, *args, **options):
+        solicitudes = Solicitud.objects.filtrar(
+            estado=options['estado'],
+            region=options['region'],
+            comuna=options['comuna'],
+            fecha_desde=options['desde'],
+            fecha_hasta=options['hasta'],
+        )
+        lineas = exportar(solicitudes, options['formato'])
+
+        if not options['salida']:
+            for linea in lineas:
+                self.stdout.write(linea, ending='')
+            return
+
+        try:
+            with open(options['salida'], 'w', newline='', encoding='utf-8') as destino:
+                destino.writelines(lineas)
+        except OSError as e:
+            raise CommandError(str(e))
+        self.stderr.write(self.style.SUCCESS(f'Exportación guardada en {options["salida"]}'))
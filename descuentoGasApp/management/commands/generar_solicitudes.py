@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from descuentoGasApp.benchmark import TAMANO_LOTE, generar_solicitudes
+
+
+class Command(BaseCommand):
+    help = 'Genera solicitudes de prueba con RUT válidos en todas las comunas (para benchmarks)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('cantidad', type=int, help='Cantidad de solicitudes a generar')
+        parser.add_argument(
+            '--semilla',
+            type=int,
+            default=None,
+            help='Semilla del generador, para obtener siempre los mismos datos'
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=TAMANO_LOTE,
+            help=f'Solicitudes insertadas por transacción (por defecto {TAMANO_LOTE})'
+        )
+
+    def handle(self, *args, **options):
+        def avance(insertadas):
+            self.stdout.write(f'{insertadas}/{options["cantidad"]} solicitudes insertadas')
+
+        try:
+            total = generar_solicitudes(
+                options['cantidad'], semilla=options['semilla'], tamano_lote=options['lote'], al_avanzar=avance
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f'Se generaron {total} solicitudes'))
@@ -0,0 +1,43 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+from descuentoGasApp.importacion import TAMANO_LOTE, ArchivoInvalido, importar_solicitudes, leer_filas
+
+
+class Command(BaseCommand):
+    help = 'Importa solicitudes desde un archivo CSV o XLSX enviado por una municipalidad'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta del archivo .csv o .xlsx')
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=TAMANO_LOTE,
+            help=f'Filas insertadas por bulk_create (por defecto {TAMANO_LOTE})'
+        )
+        parser.add_argument(
+            '--errores',
+            help='Archivo CSV donde escribir las filas rechazadas (por defecto, la salida de errores)'
+        )
+
+    def handle(self, *args, **options):
+        destino = open(options['errores'], 'w', newline='', encoding='utf-8') if options['errores'] else self.stderr
+        reporte = csv.writer(destino)
+        reporte.writerow(['fila', 'rut', 'error'])
+
+        try:
+            with open(options['archivo'], 'rb') as archivo:
+                creadas, rechazadas = importar_solicitudes(
+                    leer_filas(archivo, options['archivo']),
+                    tamano_lote=options['lote'],
+                    al_error=lambda fila, rut, mensaje: reporte.writerow([fila, rut, mensaje]),
+                )
+        except (OSError, ArchivoInvalido) as e:
+            raise CommandError(str(e))
+        finally:
+            if destino is not self.stderr:
+                destino.close()
+
+        self.stdout.write(self.style.SUCCESS(f'Solicitudes importadas: {creadas}'))
+        if rechazadas:
+            self.stdout.write(self.style.WARNING(f'Filas rechazadas: {rechazadas}'))
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+from descuentoGasApp import estadisticas
+from descuentoGasApp.cache_rut import invalidar as invalidar_rut
+from descuentoGasApp.models import Comuna, Solicitud
+from descuentoGasApp.regiones_comunas import canonizar_comuna
+
+
+class Command(BaseCommand):
+    help = 'Reasigna las solicitudes de comunas sin región a la comuna oficial según regiones_comunas.py'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo informa los cambios, sin modificar datos'
+        )
+
+    def handle(self, *args, **options):
+        # Las comunas sin región son nombres heredados que no calzaron al migrar
+        oficiales = dict(Comuna.objects.filter(region__isnull=False).values_list('nombre', 'id'))
+        heredadas = Comuna.objects.filter(region__isnull=True).annotate(cantidad=Count('solicitudes')).order_by('nombre')
+        corregidas = 0
+        desconocidas = []
+
+        for comuna in heredadas:
+            canonica = canonizar_comuna(comuna.nombre)
+            if canonica not in oficiales:
+                desconocidas.append(comuna)
+                continue
+            self.stdout.write(f'{comuna.nombre!r} -> {canonica!r} ({comuna.cantidad} solicitudes)')
+            if not options['dry_run']:
+                # Un UPDATE por variante, no por solicitud
+                with transaction.atomic():
+                    afectadas = Solicitud.objects.filter(comuna=comuna)
+                    deltas = estadisticas.contar(estadisticas.filas_de(afectadas), signo=-1)
+                    deltas.update(estadisticas.contar(
+                        (estado, oficiales[canonica], fecha) for estado, _, fecha in estadisticas.filas_de(afectadas)
+                    ))
+                    invalidar_rut(*afectadas.values_list('rut_cuerpo', flat=True))
+                    afectadas.update(comuna_id=oficiales[canonica], fecha_modificacion=timezone.now())
+                    estadisticas.aplicar(deltas)
+                    comuna.delete()
+            corregidas += comuna.cantidad
+
+        for comuna in desconocidas:
+            self.stdout.write(self.style.WARNING(
+                f'Comuna desconocida: {comuna.nombre!r} ({comuna.cantidad} solicitudes)'
+            ))
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'Modo dry-run: se corregirían {corregidas} solicitudes'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Solicitudes corregidas: {corregidas}'))
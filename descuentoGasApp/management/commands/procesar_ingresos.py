@@ -0,0 +1,61 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from descuentoGasApp.ingreso_diferido import TAMANO_LOTE, drenar, pendientes, purgar
+
+# En modo continuo la retención se vuelve a aplicar una vez al día
+INTERVALO_PURGA = 24 * 3600
+
+
+class Command(BaseCommand):
+    help = 'Pasa las solicitudes del diario de ingreso diferido a la base de datos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=TAMANO_LOTE,
+            help=f'Solicitudes por bulk_create (por defecto {TAMANO_LOTE})'
+        )
+        parser.add_argument(
+            '--continuo',
+            action='store_true',
+            help='Sigue esperando solicitudes nuevas en vez de terminar al vaciar el diario'
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=1.0,
+            help='Segundos de espera con el diario vacío en modo continuo (por defecto 1)'
+        )
+
+    def purgar(self):
+        eliminados = purgar(settings.INGRESO_DIARIO_RETENCION_DIAS)
+        if eliminados:
+            self.stdout.write(f'{eliminados} comprobantes antiguos eliminados')
+        return time.monotonic()
+
+    def handle(self, *args, **options):
+        ultima_purga = self.purgar()
+
+        total_ingresadas = total_rechazadas = 0
+        try:
+            while True:
+                if time.monotonic() - ultima_purga >= INTERVALO_PURGA:
+                    ultima_purga = self.purgar()
+                ingresadas, rechazadas = drenar(options['lote'])
+                total_ingresadas += ingresadas
+                total_rechazadas += rechazadas
+                if ingresadas or rechazadas:
+                    self.stdout.write(f'Lote: {ingresadas} ingresadas, {rechazadas} rechazadas')
+                    continue
+                if not options['continuo']:
+                    break
+                time.sleep(options['intervalo'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Total: {total_ingresadas} ingresadas, {total_rechazadas} rechazadas, {pendientes()} en cola'
+        ))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from descuentoGasApp.estadisticas import reconstruir
+
+
+class Command(BaseCommand):
+    help = 'Recalcula el resumen de estadísticas de solicitudes desde cero'
+
+    def handle(self, *args, **options):
+        filas = reconstruir()
+        self.stdout.write(self.style.SUCCESS(f'Resumen reconstruido: {filas} combinaciones de mes, comuna y estado'))
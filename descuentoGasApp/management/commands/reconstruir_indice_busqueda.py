@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from descuentoGasApp.busqueda import reconstruir
+
+
+class Command(BaseCommand):
+    help = 'Regenera el índice de búsqueda por nombre, dirección y teléfono'
+
+    def handle(self, *args, **options):
+        terminos = reconstruir()
+        self.stdout.write(self.style.SUCCESS(f'Índice reconstruido: {terminos} términos'))
@@ -0,0 +1,151 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+logger = logging.getLogger(__name__)
+
+# Límites superiores (inclusive) de las cubetas de cada histograma
+LIMITES_DURACION = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+LIMITES_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class Histograma:
+    def __init__(self, limites):
+        self.limites = limites
+        self.cubetas = [0] * len(limites)
+        self.suma = 0
+        self.cantidad = 0
+
+    def observar(self, valor):
+        indice = bisect_left(self.limites, valor)
+        if indice < len(self.limites):
+            self.cubetas[indice] += 1
+        self.suma += valor
+        self.cantidad += 1
+
+    def lineas(self, nombre, etiquetas):
+        acumulado = 0
+        for limite, cantidad in zip(self.limites, self.cubetas):
+            acumulado += cantidad
+            yield f'{nombre}_bucket{{{etiquetas},le="{limite}"}} {acumulado}'
+        yield f'{nombre}_bucket{{{etiquetas},le="+Inf"}} {self.cantidad}'
+        yield f'{nombre}_sum{{{etiquetas}}} {self.suma:g}'
+        yield f'{nombre}_count{{{etiquetas}}} {self.cantidad}'
+
+
+class MetricasVista:
+    def __init__(self):
+        self.duracion = Histograma(LIMITES_DURACION)
+        self.consultas = Histograma(LIMITES_CONSULTAS)
+        self.tiempo_consultas = 0.0
+        self.n_mas_1 = 0
+
+
+class Registro:
+    """Métricas agregadas por vista dentro del proceso"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._vistas = {}
+
+    def registrar(self, vista, duracion, consultas, tiempo_consultas, n_mas_1):
+        with self._lock:
+            metricas = self._vistas.setdefault(vista, MetricasVista())
+            metricas.duracion.observar(duracion)
+            metricas.consultas.observar(consultas)
+            metricas.tiempo_consultas += tiempo_consultas
+            metricas.n_mas_1 += n_mas_1
+
+    def reiniciar(self):
+        with self._lock:
+            self._vistas = {}
+
+    def exponer(self):
+        """Texto en el formato de exposición de Prometheus"""
+        with self._lock:
+            vistas = sorted(self._vistas.items())
+            lineas = [
+                '# HELP descuentogas_vista_duracion_segundos Duración de las peticiones muestreadas por vista.',
+                '# TYPE descuentogas_vista_duracion_segundos histogram',
+            ]
+            for vista, metricas in vistas:
+                lineas.extend(metricas.duracion.lineas('descuentogas_vista_duracion_segundos', f'vista="{vista}"'))
+            lineas += [
+                '# HELP descuentogas_vista_consultas Consultas SQL por petición muestreada.',
+                '# TYPE descuentogas_vista_consultas histogram',
+            ]
+            for vista, metricas in vistas:
+                lineas.extend(metricas.consultas.lineas('descuentogas_vista_consultas', f'vista="{vista}"'))
+            lineas += [
+                '# HELP descuentogas_vista_consultas_segundos_total Tiempo total en consultas SQL por vista.',
+                '# TYPE descuentogas_vista_consultas_segundos_total counter',
+            ]
+            lineas += [
+                f'descuentogas_vista_consultas_segundos_total{{vista="{vista}"}} {metricas.tiempo_consultas:g}'
+                for vista, metricas in vistas
+            ]
+            lineas += [
+                '# HELP descuentogas_vista_n_mas_1_total Peticiones que repitieron una misma consulta sobre el umbral.',
+                '# TYPE descuentogas_vista_n_mas_1_total counter',
+            ]
+            lineas += [
+                f'descuentogas_vista_n_mas_1_total{{vista="{vista}"}} {metricas.n_mas_1}'
+                for vista, metricas in vistas
+            ]
+        return '\n'.join(lineas) + '\n'
+
+
+registro = Registro()
+
+
+class Medicion:
+    """
+    Cuenta las consultas, su duración y cuántas veces se repite cada SQL (sin
+    parámetros), sin depender de DEBUG. Se puede usar directamente con
+    connection.execute_wrapper o activar con medir().
+    """
+
+    def __init__(self):
+        self.consultas = 0
+        self.tiempo = 0.0
+        self.repeticiones = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.tiempo += time.perf_counter() - inicio
+            self.consultas += 1
+            self.repeticiones[sql] += 1
+
+    def n_mas_1(self, umbral):
+        """Consultas idénticas salvo parámetros ejecutadas umbral veces o más"""
+        return [(sql, veces) for sql, veces in self.repeticiones.items() if veces >= umbral]
+
+
+# Medición activa en la petición actual. Una ContextVar, y no
+# connection.execute_wrapper, porque en vistas async las consultas se
+# ejecutan en otro hilo, con otra conexión, que hereda el contexto.
+_medicion_actual = ContextVar('medicion_actual', default=None)
+
+
+@contextmanager
+def medir(medicion):
+    token = _medicion_actual.set(medicion)
+    try:
+        yield medicion
+    finally:
+        _medicion_actual.reset(token)
+
+
+def envoltura_consultas(execute, sql, params, many, context):
+    """execute_wrapper instalado en cada conexión (ver signals.py)"""
+    medicion = _medicion_actual.get()
+    if medicion is None:
+        return execute(sql, params, many, context)
+    return medicion(execute, sql, params, many, context)
@@ -0,0 +1,106 @@
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+
+from .metricas import Medicion, logger, medir, registro
+from .roles import acargar_roles, cargar_roles
+
+
+class _SyncYAsync:
+    """Middleware que funciona tanto en WSGI como en ASGI sin cambiar de hilo"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self._es_async = iscoroutinefunction(get_response)
+        if self._es_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self._es_async:
+            return self.__acall__(request)
+        return self.sincrono(request)
+
+
+class RolesMiddleware(_SyncYAsync):
+    """
+    Carga los grupos del usuario una sola vez por petición (desde la sesión
+    cuando es posible) y los deja en request.user.roles. request.auser() hace
+    lo mismo para las vistas async. Debe ir después de AuthenticationMiddleware.
+    """
+
+    def sincrono(self, request):
+        self._preparar(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        self._preparar(request)
+        return await self.get_response(request)
+
+    def _preparar(self, request):
+        usuario = request.user
+        request.user = SimpleLazyObject(lambda: self._con_roles(request, usuario))
+
+        auser = request.auser
+
+        async def auser_con_roles():
+            usuario = await auser()
+            if getattr(usuario, 'roles', None) is None:
+                if usuario.is_authenticated:
+                    await acargar_roles(request, usuario)
+                else:
+                    usuario.roles = frozenset()
+            return usuario
+
+        request.auser = auser_con_roles
+
+    @staticmethod
+    def _con_roles(request, usuario):
+        if usuario.is_authenticated:
+            cargar_roles(request, usuario)
+        else:
+            usuario.roles = frozenset()
+        return usuario
+
+
+class MetricasMiddleware(_SyncYAsync):
+    """
+    Mide duración, cantidad de consultas y tiempo en SQL de una fracción
+    METRICAS_MUESTREO de las peticiones y las agrega por vista. Marca como
+    N+1 las peticiones que repiten una consulta METRICAS_UMBRAL_N_MAS_1 veces.
+    Debe ir al comienzo de MIDDLEWARE para incluir a los demás middlewares.
+    """
+
+    def sincrono(self, request):
+        if random.random() >= settings.METRICAS_MUESTREO:
+            return self.get_response(request)
+
+        medicion = Medicion()
+        inicio = time.perf_counter()
+        with medir(medicion):
+            response = self.get_response(request)
+        self._registrar(request, medicion, time.perf_counter() - inicio)
+        return response
+
+    async def __acall__(self, request):
+        if random.random() >= settings.METRICAS_MUESTREO:
+            return await self.get_response(request)
+
+        medicion = Medicion()
+        inicio = time.perf_counter()
+        with medir(medicion):
+            response = await self.get_response(request)
+        self._registrar(request, medicion, time.perf_counter() - inicio)
+        return response
+
+    @staticmethod
+    def _registrar(request, medicion, duracion):
+        vista = getattr(request.resolver_match, 'view_name', None) or 'sin_ruta'
+        repetidas = medicion.n_mas_1(settings.METRICAS_UMBRAL_N_MAS_1)
+        for sql, veces in repetidas:
+            logger.warning('Posible N+1 en %s: %d ejecuciones de %s', vista, veces, sql[:200])
+        registro.registrar(vista, duracion, medicion.consultas, medicion.tiempo, 1 if repetidas else 0)
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('descuentoGasApp', '0002_alter_solicitud_estado'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='solicitud',
+            index=models.Index(fields=['-fecha_solicitud', '-id'], name='solicitud_fecha_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='solicitud',
+            index=models.Index(fields=['estado', '-fecha_solicitud', '-id'], name='solicitud_estado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='solicitud',
+            index=models.Index(fields=['comuna', '-fecha_solicitud', '-id'], name='solicitud_comuna_fecha_idx'),
+        ),
+    ]
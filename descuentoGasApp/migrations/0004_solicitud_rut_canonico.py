@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('descuentoGasApp', '0003_solicitud_indices_listado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='solicitud',
+            name='rut_cuerpo',
+            field=models.PositiveIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='solicitud',
+            name='rut_dv',
+            field=models.CharField(blank=True, editable=False, max_length=1),
+        ),
+    ]
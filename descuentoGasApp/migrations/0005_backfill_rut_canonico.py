@@ -0,0 +1,31 @@
+from django.db import migrations
+
+from descuentoGasApp.paginacion import recorrer_por_id
+from descuentoGasApp.rut import separar_rut
+
+
+def backfill_rut_canonico(apps, schema_editor):
+    Solicitud = apps.get_model('descuentoGasApp', 'Solicitud')
+    pendientes = []
+    for solicitud in recorrer_por_id(Solicitud.objects.filter(rut_cuerpo__isnull=True).only('id', 'rut'), 2000):
+        try:
+            solicitud.rut_cuerpo, solicitud.rut_dv = separar_rut(solicitud.rut)
+        except ValueError:
+            continue
+        pendientes.append(solicitud)
+        if len(pendientes) >= 2000:
+            Solicitud.objects.bulk_update(pendientes, ['rut_cuerpo', 'rut_dv'])
+            pendientes = []
+    if pendientes:
+        Solicitud.objects.bulk_update(pendientes, ['rut_cuerpo', 'rut_dv'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('descuentoGasApp', '0004_solicitud_rut_canonico'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rut_canonico, migrations.RunPython.noop),
+    ]
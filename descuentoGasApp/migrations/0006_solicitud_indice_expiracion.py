@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('descuentoGasApp', '0005_backfill_rut_canonico'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='solicitud',
+            index=models.Index(fields=['estado', 'fecha_aceptacion'], name='solicitud_estado_acept_idx'),
+        ),
+    ]
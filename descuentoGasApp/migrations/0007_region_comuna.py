@@ -0,0 +1,43 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('descuentoGasApp', '0006_solicitud_indice_expiracion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Region',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Comuna',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100, unique=True)),
+                ('region', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='comunas', to='descuentoGasApp.region')),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='solicitud',
+            name='solicitud_comuna_fecha_idx',
+        ),
+        # Permite revertir: la columna de texto se vuelve a crear vacía y 0008 la rellena antes
+        # de volver a exigir NOT NULL
+        migrations.AlterField(
+            model_name='solicitud',
+            name='comuna',
+            field=models.CharField(max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='solicitud',
+            name='comuna_ref',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='descuentoGasApp.comuna'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+from django.db import migrations
+
+from descuentoGasApp.regiones_comunas import REGIONES_COMUNAS, canonizar_comuna
+
+
+def poblar_regiones_comunas(apps, schema_editor):
+    Region = apps.get_model('descuentoGasApp', 'Region')
+    Comuna = apps.get_model('descuentoGasApp', 'Comuna')
+    for nombre_region, comunas in REGIONES_COMUNAS.items():
+        region, _ = Region.objects.get_or_create(nombre=nombre_region)
+        for nombre in comunas:
+            Comuna.objects.update_or_create(nombre=nombre, defaults={'region': region})
+
+
+def asignar_comunas(apps, schema_editor):
+    """
+    Un UPDATE por cada nombre distinto de comuna. Los nombres que no están en
+    regiones_comunas.py se conservan como comunas sin región.
+    """
+    Comuna = apps.get_model('descuentoGasApp', 'Comuna')
+    Solicitud = apps.get_model('descuentoGasApp', 'Solicitud')
+    for nombre in Solicitud.objects.values_list('comuna', flat=True).distinct():
+        canonica = canonizar_comuna(nombre)
+        comuna, _ = Comuna.objects.get_or_create(nombre=canonica or nombre)
+        Solicitud.objects.filter(comuna=nombre).update(comuna_ref=comuna)
+
+
+def restaurar_nombres(apps, schema_editor):
+    Comuna = apps.get_model('descuentoGasApp', 'Comuna')
+    Solicitud = apps.get_model('descuentoGasApp', 'Solicitud')
+    for comuna in Comuna.objects.all():
+        Solicitud.objects.filter(comuna_ref=comuna).update(comuna=comuna.nombre)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('descuentoGasApp', '0007_region_comuna'),
+    ]
+
+    operations = [
+        migrations.RunPython(poblar_regiones_comunas, migrations.RunPython.noop),
+        migrations.RunPython(asignar_comunas, restaurar_nombres),
+    ]
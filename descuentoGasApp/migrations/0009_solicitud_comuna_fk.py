@@ -0,0 +1,30 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('descuentoGasApp', '0008_poblar_region_comuna'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='solicitud',
+            name='comuna',
+        ),
+        migrations.RenameField(
+            model_name='solicitud',
+            old_name='comuna_ref',
+            new_name='comuna',
+        ),
+        migrations.AlterField(
+            model_name='solicitud',
+            name='comuna',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='solicitudes', to='descuentoGasApp.comuna'),
+        ),
+        migrations.AddIndex(
+            model_name='solicitud',
+            index=models.Index(fields=['comuna', '-fecha_solicitud', '-id'], name='solicitud_comuna_fecha_idx'),
+        ),
+    ]
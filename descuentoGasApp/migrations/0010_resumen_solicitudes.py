@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('descuentoGasApp', '0009_solicitud_comuna_fk'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenSolicitudes',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField()),
+                ('estado', models.CharField(choices=[('Pendiente', 'Pendiente'), ('Aceptada', 'Aceptada'), ('Rechazada', 'Rechazada'), ('Expirada', 'Expirada')], max_length=20)),
+                ('cantidad', models.IntegerField(default=0)),
+                ('comuna', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='descuentoGasApp.comuna')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('mes', 'comuna', 'estado'), name='resumen_mes_comuna_estado_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+from collections import Counter
+
+from django.db import migrations
+from django.utils import timezone
+
+from descuentoGasApp.paginacion import recorrer_por_id
+
+
+def poblar_resumen(apps, schema_editor):
+    Solicitud = apps.get_model('descuentoGasApp', 'Solicitud')
+    ResumenSolicitudes = apps.get_model('descuentoGasApp', 'ResumenSolicitudes')
+    conteo = Counter()
+    filas = Solicitud.objects.values_list('id', 'estado', 'comuna_id', 'fecha_solicitud')
+    for _, estado, comuna_id, fecha_solicitud in recorrer_por_id(filas, 5000):
+        mes = timezone.localtime(fecha_solicitud).date().replace(day=1)
+        conteo[(mes, comuna_id, estado)] += 1
+    ResumenSolicitudes.objects.bulk_create([
+        ResumenSolicitudes(mes=mes, comuna_id=comuna_id, estado=estado, cantidad=n)
+        for (mes, comuna_id, estado), n in conteo.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('descuentoGasApp', '0010_resumen_solicitudes'),
+    ]
+
+    operations = [
+        migrations.RunPython(poblar_resumen, migrations.RunPython.noop),
+    ]
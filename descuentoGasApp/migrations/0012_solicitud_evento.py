@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:12
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('descuentoGasApp', '0011_poblar_resumen_solicitudes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SolicitudEvento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('estado', 'Cambio de estado'), ('expiracion', 'Expiración'), ('eliminacion', 'Eliminación')], max_length=12)),
+                ('estado_anterior', models.CharField(blank=True, max_length=20)),
+                ('estado_nuevo', models.CharField(blank=True, max_length=20)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('solicitud', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='eventos', to='descuentoGasApp.solicitud')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['solicitud', 'created_at'], name='evento_solicitud_fecha_idx')],
+            },
+        ),
+    ]
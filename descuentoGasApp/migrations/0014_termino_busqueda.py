@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('descuentoGasApp', '0013_token_api'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TerminoBusqueda',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('termino', models.CharField(max_length=50)),
+                ('peso', models.PositiveSmallIntegerField()),
+                ('solicitud', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terminos', to='descuentoGasApp.solicitud')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['termino', 'solicitud', 'peso'], name='termino_busqueda_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations
+
+from descuentoGasApp.busqueda import PESOS, TAMANO_LOTE, terminos_de
+from descuentoGasApp.paginacion import recorrer_por_id
+
+
+def poblar_terminos(apps, schema_editor):
+    Solicitud = apps.get_model('descuentoGasApp', 'Solicitud')
+    TerminoBusqueda = apps.get_model('descuentoGasApp', 'TerminoBusqueda')
+    lote = []
+    for solicitud in recorrer_por_id(Solicitud.objects.only('id', *PESOS), TAMANO_LOTE):
+        lote.extend(
+            TerminoBusqueda(solicitud_id=solicitud.id, termino=termino, peso=peso)
+            for termino, peso in terminos_de(solicitud).items()
+        )
+        if len(lote) >= TAMANO_LOTE:
+            TerminoBusqueda.objects.bulk_create(lote)
+            lote = []
+    TerminoBusqueda.objects.bulk_create(lote)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('descuentoGasApp', '0014_termino_busqueda'),
+    ]
+
+    operations = [
+        migrations.RunPython(poblar_terminos, migrations.RunPython.noop),
+    ]
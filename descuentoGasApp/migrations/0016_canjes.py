@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:27
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('descuentoGasApp', '0015_poblar_terminos_busqueda'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Canje',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('periodo', models.DateField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('solicitud', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='canjes', to='descuentoGasApp.solicitud')),
+                ('vendedor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['solicitud', 'created_at'], name='canje_solicitud_fecha_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='CupoCanje',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('periodo', models.DateField()),
+                ('usados', models.PositiveIntegerField(default=0)),
+                ('solicitud', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='descuentoGasApp.solicitud')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('solicitud', 'periodo'), name='cupo_solicitud_periodo_uniq')],
+            },
+        ),
+    ]
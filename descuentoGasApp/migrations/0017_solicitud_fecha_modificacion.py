@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('descuentoGasApp', '0016_canjes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='solicitud',
+            name='fecha_modificacion',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,50 @@
+from django.db import migrations
+from django.db.models import Count
+
+from descuentoGasApp.paginacion import recorrer_por_id
+from descuentoGasApp.rut import formatear_rut
+
+TAMANO_LOTE = 2000
+
+
+def canonizar_rut(apps, schema_editor):
+    """
+    Reescribe rut en el formato canónico (12345678-5), para que la restricción
+    unique de rut también rechace el mismo RUT escrito con puntos o espacios.
+    Si hay duplicados por RUT canónico no se puede: hay que purgarlos antes.
+    """
+    Solicitud = apps.get_model('descuentoGasApp', 'Solicitud')
+    duplicados = (
+        Solicitud.objects.filter(rut_cuerpo__isnull=False)
+        .values('rut_cuerpo').annotate(n=Count('id')).filter(n__gt=1).count()
+    )
+    if duplicados:
+        raise RuntimeError(
+            f'Hay {duplicados} RUT con solicitudes duplicadas. Ejecute '
+            'python manage.py eliminar_duplicados y vuelva a migrar.'
+        )
+
+    pendientes = []
+    filas = Solicitud.objects.filter(rut_cuerpo__isnull=False).only('id', 'rut', 'rut_cuerpo', 'rut_dv')
+    for solicitud in recorrer_por_id(filas, TAMANO_LOTE):
+        canonico = formatear_rut(solicitud.rut_cuerpo, solicitud.rut_dv)
+        if solicitud.rut == canonico:
+            continue
+        solicitud.rut = canonico
+        pendientes.append(solicitud)
+        if len(pendientes) >= TAMANO_LOTE:
+            Solicitud.objects.bulk_update(pendientes, ['rut'])
+            pendientes = []
+    if pendientes:
+        Solicitud.objects.bulk_update(pendientes, ['rut'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('descuentoGasApp', '0017_solicitud_fecha_modificacion'),
+    ]
+
+    operations = [
+        migrations.RunPython(canonizar_rut, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,71 @@
 
 # Create your models here.
 
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
 from django.db import models
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+
+from .rut import formatear_rut, separar_rut
+
+
+def limite_vigencia(ahora=None):
+    """Las solicitudes aceptadas en o antes de esta fecha ya no están vigentes"""
+    return (ahora or timezone.now()) - timedelta(days=settings.SOLICITUD_VIGENCIA_DIAS)
+
+
+def estado_efectivo_expr(ahora=None):
+    """Expresión SQL del estado considerando la vigencia, aunque aún no se haya expirado en BD"""
+    return Case(
+        When(estado='Aceptada', fecha_aceptacion__lte=limite_vigencia(ahora), then=Value('Expirada')),
+        default=F('estado'),
+        output_field=models.CharField(),
+    )
+
+
+class Region(models.Model):
+    nombre = models.CharField(max_length=100, unique=True)
+
+    def __str__(self):
+        return self.nombre
+
+
+class Comuna(models.Model):
+    nombre = models.CharField(max_length=100, unique=True)
+    # Nulo solo para nombres heredados que no están en regiones_comunas.py
+    region = models.ForeignKey(Region, on_delete=models.PROTECT, null=True, blank=True, related_name='comunas')
+
+    def __str__(self):
+        return self.nombre
+
+
+class SolicitudQuerySet(models.QuerySet):
+    def filtrar(self, estado=None, region=None, comuna=None, fecha_desde=None, fecha_hasta=None):
+        """
+        Aplica los filtros del listado. Las fechas se convierten en rangos de
+        fecha_solicitud para que el motor pueda usar los índices compuestos.
+        """
+        qs = self
+        if estado == 'Aceptada':
+            qs = qs.filter(estado='Aceptada', fecha_aceptacion__gt=limite_vigencia())
+        elif estado == 'Expirada':
+            qs = qs.filter(Q(estado='Expirada') | Q(estado='Aceptada', fecha_aceptacion__lte=limite_vigencia()))
+        elif estado:
+            qs = qs.filter(estado=estado)
+        if region:
+            qs = qs.filter(comuna__region__nombre=region)
+        if comuna:
+            qs = qs.filter(comuna__nombre=comuna)
+        if fecha_desde:
+            inicio = timezone.make_aware(datetime.combine(fecha_desde, time.min))
+            qs = qs.filter(fecha_solicitud__gte=inicio)
+        if fecha_hasta:
+            fin = timezone.make_aware(datetime.combine(fecha_hasta + timedelta(days=1), time.min))
+            qs = qs.filter(fecha_solicitud__lt=fin)
+        return qs
+
 
 class Solicitud(models.Model):
     ESTADOS = [
@@ -12,15 +76,177 @@ class Solicitud(models.Model):
     ]
     
     rut = models.CharField(max_length=12, unique=True)
+    # Clave canónica del RUT (cuerpo numérico + dígito verificador) para búsquedas exactas
+    rut_cuerpo = models.PositiveIntegerField(null=True, blank=True, db_index=True, editable=False)
+    rut_dv = models.CharField(max_length=1, blank=True, editable=False)
     nombre = models.CharField(max_length=100)
     apellido_paterno = models.CharField(max_length=100)
     apellido_materno = models.CharField(max_length=100)
     direccion = models.CharField(max_length=255)
     telefono = models.CharField(max_length=20)
-    comuna = models.CharField(max_length=100)
+    comuna = models.ForeignKey(Comuna, on_delete=models.PROTECT, related_name='solicitudes')
     fecha_solicitud = models.DateTimeField(auto_now_add=True)
     fecha_aceptacion = models.DateTimeField(null=True, blank=True)
     estado = models.CharField(max_length=20, choices=ESTADOS, default='Pendiente')
+    # Los UPDATE masivos (QuerySet.update) deben asignarla explícitamente
+    fecha_modificacion = models.DateTimeField(auto_now=True)
+
+    objects = SolicitudQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Listado del administrador: paginación por (fecha_solicitud, id) y filtros
+            models.Index(fields=['-fecha_solicitud', '-id'], name='solicitud_fecha_id_idx'),
+            models.Index(fields=['estado', '-fecha_solicitud', '-id'], name='solicitud_estado_fecha_idx'),
+            models.Index(fields=['comuna', '-fecha_solicitud', '-id'], name='solicitud_comuna_fecha_idx'),
+            # Expiración por lotes de solicitudes aceptadas
+            models.Index(fields=['estado', 'fecha_aceptacion'], name='solicitud_estado_acept_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        try:
+            self.rut_cuerpo, self.rut_dv = separar_rut(self.rut)
+            # Texto canónico: así rut unique=True también rechaza el mismo RUT escrito en otro formato
+            self.rut = formatear_rut(self.rut_cuerpo, self.rut_dv)
+        except ValueError:
+            self.rut_cuerpo, self.rut_dv = None, ''
+        update_fields = kwargs.get('update_fields')
+        # save(update_fields=[]) no guarda nada, y así debe seguir
+        if update_fields:
+            update_fields = set(update_fields) | {'fecha_modificacion'}
+            if 'rut' in update_fields:
+                update_fields |= {'rut_cuerpo', 'rut_dv'}
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+
+    @property
+    def estado_efectivo(self):
+        """Estado visible: una solicitud aceptada fuera de vigencia se muestra como Expirada"""
+        if self.estado == 'Aceptada' and self.fecha_aceptacion and self.fecha_aceptacion <= limite_vigencia():
+            return 'Expirada'
+        return self.estado
+
+    @property
+    def vigente_hasta(self):
+        """Fin de la vigencia de una solicitud aceptada"""
+        if self.estado == 'Aceptada' and self.fecha_aceptacion:
+            return self.fecha_aceptacion + timedelta(days=settings.SOLICITUD_VIGENCIA_DIAS)
+        return None
 
     def __str__(self):
         return f"{self.nombre} {self.apellido_paterno} {self.apellido_materno} - {self.rut}"
+
+
+class ResumenSolicitudes(models.Model):
+    """
+    Cantidad de solicitudes por mes de ingreso, comuna y estado registrado.
+    Se mantiene de forma incremental (ver estadisticas.py) para que el panel
+    no tenga que recorrer la tabla de solicitudes.
+    """
+    mes = models.DateField()
+    comuna = models.ForeignKey(Comuna, on_delete=models.CASCADE, related_name='+')
+    estado = models.CharField(max_length=20, choices=Solicitud.ESTADOS)
+    cantidad = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['mes', 'comuna', 'estado'], name='resumen_mes_comuna_estado_uniq'),
+        ]
+
+
+class SolicitudEvento(models.Model):
+    """
+    Historial de solo inserción de cambios sobre una solicitud. No usa clave
+    foránea real hacia Solicitud para que los eventos sobrevivan a su eliminación.
+    """
+    TIPOS = [
+        ('estado', 'Cambio de estado'),
+        ('expiracion', 'Expiración'),
+        ('eliminacion', 'Eliminación'),
+    ]
+
+    solicitud = models.ForeignKey(
+        Solicitud, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='eventos'
+    )
+    tipo = models.CharField(max_length=12, choices=TIPOS)
+    estado_anterior = models.CharField(max_length=20, blank=True)
+    estado_nuevo = models.CharField(max_length=20, blank=True)
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['solicitud', 'created_at'], name='evento_solicitud_fecha_idx'),
+        ]
+
+
+class TokenApi(models.Model):
+    """
+    Token de acceso a la API JSON para vendedores. Solo se guarda el hash
+    SHA-256; el token en claro se muestra una vez al crearlo.
+    """
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='tokens_api')
+    digest = models.CharField(max_length=64, unique=True, editable=False)
+    nombre = models.CharField(max_length=50, blank=True)
+    creado = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.usuario} - {self.nombre}"
+
+
+class TerminoBusqueda(models.Model):
+    """
+    Índice de búsqueda por nombre, apellidos, dirección y teléfono: un término
+    normalizado (minúsculas, sin tildes) por fila. Solicitud.save() lo mantiene
+    mediante post_save (signals.py), también desde el admin; bulk_create y
+    QuerySet.update no emiten la señal y deben llamar a busqueda.indexar o
+    busqueda.reindexar.
+    """
+    solicitud = models.ForeignKey(Solicitud, on_delete=models.CASCADE, related_name='terminos')
+    termino = models.CharField(max_length=50)
+    peso = models.PositiveSmallIntegerField()
+
+    class Meta:
+        indexes = [
+            # Cubre la búsqueda por prefijo: rango sobre termino, sin leer la tabla
+            models.Index(fields=['termino', 'solicitud', 'peso'], name='termino_busqueda_idx'),
+        ]
+
+
+class Canje(models.Model):
+    """
+    Registro de solo inserción de cada descuento usado. Igual que
+    SolicitudEvento, no usa clave foránea real para sobrevivir a la
+    eliminación de la solicitud.
+    """
+    solicitud = models.ForeignKey(
+        Solicitud, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='canjes'
+    )
+    vendedor = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    periodo = models.DateField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['solicitud', 'created_at'], name='canje_solicitud_fecha_idx'),
+        ]
+
+
+class CupoCanje(models.Model):
+    """
+    Canjes usados por una solicitud en un periodo (mes). El cupo se toma con
+    un UPDATE condicional sobre esta fila (ver canjes.py).
+    """
+    # El índice único (solicitud, periodo) ya sirve para la clave foránea
+    solicitud = models.ForeignKey(Solicitud, on_delete=models.CASCADE, db_index=False, related_name='+')
+    periodo = models.DateField()
+    usados = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['solicitud', 'periodo'], name='cupo_solicitud_periodo_uniq'),
+        ]
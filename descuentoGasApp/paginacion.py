@@ -0,0 +1,89 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+
+# Marca de los cursores que retroceden hacia filas más recientes
+ATRAS = '<'
+
+
+def codificar_cursor(fecha, pk, atras=False):
+    """
+    Codifica la posición (fecha_solicitud, id) de una fila límite: la última
+    de una página para avanzar, o la primera con atras=True para retroceder
+    """
+    valor = f"{fecha.isoformat()}|{pk}" + (f"|{ATRAS}" if atras else '')
+    return base64.urlsafe_b64encode(valor.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """Retorna la tupla (fecha, id, atras) de un cursor, o None si es inválido"""
+    if not cursor:
+        return None
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        valor = base64.urlsafe_b64decode(cursor + relleno).decode()
+        fecha, pk, *marca = valor.split('|')
+        if marca not in ([], [ATRAS]):
+            return None
+        return datetime.fromisoformat(fecha), int(pk), bool(marca)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def recorrer_por_id(queryset, tamano):
+    """
+    Recorre queryset en lotes de tamano filas con WHERE id > último ORDER BY id.
+    A diferencia de iterator(), no depende de cursores del lado del servidor:
+    mysqlclient entrega el resultado completo al cliente, así que cada lote se
+    pide con su propia consulta. Las filas son instancias o tuplas de
+    values_list con id como primera columna.
+    """
+    ultimo = 0
+    while True:
+        lote = list(queryset.filter(id__gt=ultimo).order_by('id')[:tamano])
+        yield from lote
+        if len(lote) < tamano:
+            return
+        ultimo = lote[-1][0] if isinstance(lote[-1], tuple) else lote[-1].id
+
+
+def paginar_por_cursor(queryset, cursor, tamano):
+    """
+    Paginación por keyset sobre (fecha_solicitud, id), de la más reciente a la más antigua.
+    A diferencia de OFFSET, el costo de cada página no crece con la posición.
+    Retorna (filas, cursor_siguiente, cursor_anterior); cursor_siguiente es None
+    en la última página y cursor_anterior en la primera. Un cursor inválido
+    muestra la primera página.
+    """
+    posicion = decodificar_cursor(cursor)
+    if posicion and posicion[2]:
+        fecha, pk, _ = posicion
+        # Hacia atrás: las tamano filas más antiguas entre las posteriores a la posición
+        filas = list(
+            queryset.filter(Q(fecha_solicitud__gt=fecha) | Q(fecha_solicitud=fecha, id__gt=pk))
+            .order_by('fecha_solicitud', 'id')[:tamano + 1]
+        )
+        if not filas:
+            return paginar_por_cursor(queryset, None, tamano)
+        hay_anterior = len(filas) > tamano
+        filas = filas[:tamano][::-1]
+        hay_siguiente = True
+    else:
+        if posicion:
+            fecha, pk, _ = posicion
+            queryset = queryset.filter(
+                Q(fecha_solicitud__lt=fecha) | Q(fecha_solicitud=fecha, id__lt=pk)
+            )
+        filas = list(queryset.order_by('-fecha_solicitud', '-id')[:tamano + 1])
+        hay_siguiente = len(filas) > tamano
+        filas = filas[:tamano]
+        hay_anterior = posicion is not None and bool(filas)
+
+    siguiente = anterior = None
+    if hay_siguiente:
+        siguiente = codificar_cursor(filas[-1].fecha_solicitud, filas[-1].id)
+    if hay_anterior:
+        anterior = codificar_cursor(filas[0].fecha_solicitud, filas[0].id, atras=True)
+    return filas, siguiente, anterior
@@ -1,3 +1,8 @@
+import functools
+import hashlib
+import json
+import unicodedata
+
 REGIONES_COMUNAS = {
     'Región de Arica y Parinacota': [
         'Arica', 'Camarones', 'General Lagos', 'Putre'
@@ -89,9 +94,45 @@ REGIONES_COMUNAS = {
     ]
 }
 
+
+def normalizar_nombre(texto):
+    """Minúsculas, sin tildes ni espacios repetidos: 'Ñuñoa' -> 'nunoa'"""
+    sin_tildes = unicodedata.normalize('NFKD', texto)
+    sin_tildes = ''.join(c for c in sin_tildes if not unicodedata.combining(c))
+    return ' '.join(sin_tildes.casefold().split())
+
+
+class IndiceComunas:
+    """Índices derivados de REGIONES_COMUNAS, construidos una vez por proceso"""
+
+    def __init__(self, regiones_comunas):
+        self.regiones = tuple(regiones_comunas)
+        self.region_de_comuna = {}
+        self.comuna_normalizada = {}
+
+        for region, comunas in regiones_comunas.items():
+            for comuna in comunas:
+                self.region_de_comuna[comuna] = region
+                self.comuna_normalizada[normalizar_nombre(comuna)] = comuna
+
+        self.comunas = tuple(sorted(self.region_de_comuna))
+
+        datos = {
+            'regiones': {region: list(comunas) for region, comunas in regiones_comunas.items()},
+            'comunas': list(self.comunas),
+        }
+        self.json = json.dumps(datos, ensure_ascii=False, separators=(',', ':')).encode()
+        self.huella = hashlib.sha256(self.json).hexdigest()[:12]
+
+
+@functools.cache
+def get_indice():
+    return IndiceComunas(REGIONES_COMUNAS)
+
+
 def get_all_regiones():
     """Retorna lista de todas las regiones"""
-    return list(REGIONES_COMUNAS.keys())
+    return list(get_indice().regiones)
 
 def get_comunas_by_region(region):
     """Retorna lista de comunas de una región específica"""
@@ -99,7 +140,12 @@ def get_comunas_by_region(region):
 
 def get_all_comunas():
     """Retorna lista de todas las comunas de Chile"""
-    comunas = []
-    for region_comunas in REGIONES_COMUNAS.values():
-        comunas.extend(region_comunas)
-    return sorted(comunas)
+    return list(get_indice().comunas)
+
+def get_region_de_comuna(comuna):
+    """Retorna la región de una comuna, o None si no existe"""
+    return get_indice().region_de_comuna.get(comuna)
+
+def canonizar_comuna(nombre):
+    """Nombre oficial de la comuna escrita sin importar tildes ni mayúsculas, o None"""
+    return get_indice().comuna_normalizada.get(normalizar_nombre(nombre or ''))
@@ -0,0 +1,84 @@
+import time
+
+from django.core.cache import cache
+
+ROLES = ('Administrador', 'Vendedor')
+
+CLAVE_SESION = 'roles'
+# Versión global de los roles, en el caché 'default'. Con varios procesos ese
+# caché debe ser compartido (Redis, Memcached): con LocMemCache, invalidar_roles
+# solo llega al proceso que la llama y un rol revocado sigue activo en los
+# demás hasta que termine la sesión. check --deploy lo rechaza (E004).
+CLAVE_VERSION = 'roles:version'
+
+
+def _version_actual():
+    # Si el caché se vació, una versión nueva obliga a recargar todas las sesiones
+    cache.add(CLAVE_VERSION, time.time_ns(), None)
+    return cache.get(CLAVE_VERSION)
+
+
+async def _aversion_actual():
+    await cache.aadd(CLAVE_VERSION, time.time_ns(), None)
+    return await cache.aget(CLAVE_VERSION)
+
+
+def invalidar_roles():
+    """Obliga a todas las sesiones a recargar sus roles en la próxima petición"""
+    cache.set(CLAVE_VERSION, time.time_ns(), None)
+
+
+def _consultar_roles(user):
+    return frozenset(user.groups.filter(name__in=ROLES).values_list('name', flat=True))
+
+
+async def _aconsultar_roles(user):
+    consulta = user.groups.filter(name__in=ROLES).values_list('name', flat=True)
+    return frozenset([nombre async for nombre in consulta])
+
+
+def cargar_roles(request, user):
+    """
+    Asigna user.roles desde la sesión, o desde la base de datos si la sesión
+    no los tiene o quedaron obsoletos, y los guarda en la sesión.
+    """
+    version = _version_actual()
+    guardado = request.session.get(CLAVE_SESION)
+    if guardado and guardado['usuario'] == user.pk and guardado['version'] == version:
+        roles = frozenset(guardado['roles'])
+    else:
+        roles = _consultar_roles(user)
+        request.session[CLAVE_SESION] = {'usuario': user.pk, 'version': version, 'roles': sorted(roles)}
+    user.roles = roles
+    return roles
+
+
+async def acargar_roles(request, user):
+    """Versión async de cargar_roles, para vistas async"""
+    version = await _aversion_actual()
+    guardado = await request.session.aget(CLAVE_SESION)
+    if guardado and guardado['usuario'] == user.pk and guardado['version'] == version:
+        roles = frozenset(guardado['roles'])
+    else:
+        roles = await _aconsultar_roles(user)
+        await request.session.aset(CLAVE_SESION, {'usuario': user.pk, 'version': version, 'roles': sorted(roles)})
+    user.roles = roles
+    return roles
+
+
+def roles_de(user):
+    """Roles del usuario; usa los cargados por RolesMiddleware si existen"""
+    roles = getattr(user, 'roles', None)
+    if roles is None:
+        roles = _consultar_roles(user) if user.is_authenticated else frozenset()
+        user.roles = roles
+    return roles
+
+
+async def aroles_de(user):
+    """Versión async de roles_de"""
+    roles = getattr(user, 'roles', None)
+    if roles is None:
+        roles = await _aconsultar_roles(user) if user.is_authenticated else frozenset()
+        user.roles = roles
+    return roles
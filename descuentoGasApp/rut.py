@@ -0,0 +1,47 @@
+import re
+
+RUT_RE = re.compile(r'^(\d{1,9})([0-9K])$')
+
+
+def limpiar_rut(rut):
+    """Quita puntos, guiones y espacios, y deja la K en mayúscula"""
+    return rut.replace('.', '').replace('-', '').replace(' ', '').upper()
+
+
+def calcular_dv(cuerpo):
+    """Calcula el dígito verificador de un RUT mediante módulo 11"""
+    suma = 0
+    factor = 2
+    for digito in reversed(str(cuerpo)):
+        suma += int(digito) * factor
+        factor = 2 if factor == 7 else factor + 1
+    resto = 11 - (suma % 11)
+    if resto == 11:
+        return '0'
+    if resto == 10:
+        return 'K'
+    return str(resto)
+
+
+def separar_rut(rut):
+    """
+    Retorna la tupla (cuerpo, dv) de un RUT escrito en cualquier formato,
+    sin verificar el dígito. Lanza ValueError si el formato no corresponde.
+    """
+    match = RUT_RE.match(limpiar_rut(rut or ''))
+    if not match:
+        raise ValueError('Formato de RUT inválido')
+    return int(match.group(1)), match.group(2)
+
+
+def normalizar_rut(rut):
+    """Igual que separar_rut, pero además valida el dígito verificador"""
+    cuerpo, dv = separar_rut(rut)
+    if calcular_dv(cuerpo) != dv:
+        raise ValueError('Dígito verificador inválido')
+    return cuerpo, dv
+
+
+def formatear_rut(cuerpo, dv):
+    """Representación canónica almacenada: 12345678-5"""
+    return f"{cuerpo}-{dv}"
@@ -0,0 +1,42 @@
+from django.contrib.auth.models import Group, User
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .busqueda import PESOS, indexar, reindexar
+from .metricas import envoltura_consultas
+from .models import Solicitud
+from .roles import invalidar_roles
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def grupos_modificados(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidar_roles()
+
+
+@receiver(post_delete, sender=Group)
+def grupo_eliminado(sender, **kwargs):
+    invalidar_roles()
+
+
+@receiver(post_save, sender=Group)
+def grupo_guardado(sender, created, **kwargs):
+    # Los roles se guardan por nombre de grupo: un cambio de nombre los altera
+    if not created:
+        invalidar_roles()
+
+
+@receiver(post_save, sender=Solicitud)
+def solicitud_guardada(sender, instance, created, update_fields, **kwargs):
+    if created:
+        indexar([instance])
+    # Un save(update_fields=...) que no toca campos indexados, como el cambio de estado, no reindexa
+    elif update_fields is None or not update_fields.isdisjoint(PESOS):
+        reindexar(instance)
+
+
+@receiver(connection_created)
+def instrumentar_conexion(sender, connection, **kwargs):
+    if envoltura_consultas not in connection.execute_wrappers:
+        connection.execute_wrappers.append(envoltura_consultas)
@@ -1,3 +1,1319 @@
-from django.test import TestCase
+import base64
+import csv
+import io
+import os
+import tempfile
+import threading
+from collections import Counter
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib import messages
+from django.contrib.auth.models import Group, User
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.db.models import Count, F, QuerySet
+from django.db.models.functions import TruncMonth
+from django.http import HttpResponse
+from django.test import AsyncClient, Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from openpyxl import Workbook
+
+from . import benchmark, estadisticas, expiracion, exportacion, ingreso_diferido, limites, views
+from .api import generar_token
+from .auditoria import linea_de_tiempo
+from .busqueda import buscar
+from .cache_rut import asolicitudes_por_rut
+from .cambio_estado import cambiar_estado_masivo
+from .canjes import CanjeRechazado, canjear
+from .checks import verificar_cache
+from .duplicados import eliminar_duplicados
+from .forms import SolicitudForm
+from .importacion import importar_solicitudes
+from .metricas import registro as registro_metricas
+from .paginacion import codificar_cursor, paginar_por_cursor
+from .regiones_comunas import IndiceComunas, get_region_de_comuna
+from .models import Canje, Comuna, CupoCanje, Region, ResumenSolicitudes, Solicitud, SolicitudEvento, TerminoBusqueda, estado_efectivo_expr
+from .views import _guardar_solicitud
+
+
+def crear_solicitud(rut, **campos):
+    datos = {
+        'rut': rut,
+        'nombre': 'Ana',
+        'apellido_paterno': 'Pérez',
+        'apellido_materno': 'Soto',
+        'direccion': 'Calle 1',
+        'telefono': '912345678',
+        'comuna': Comuna.objects.filter(region__isnull=False).order_by('id').first(),
+    }
+    datos.update(campos)
+    return Solicitud.objects.create(**datos)
+
+
+def crear_duplicado_heredado(rut_texto, rut_cuerpo, rut_dv, relleno):
+    """Fila con un RUT ya registrado en otro formato, como las cargadas antes de canonizar"""
+    solicitud = crear_solicitud(relleno)
+    Solicitud.objects.filter(id=solicitud.id).update(rut=rut_texto, rut_cuerpo=rut_cuerpo, rut_dv=rut_dv)
+    solicitud.refresh_from_db()
+    return solicitud
+
+
+def crear_usuario(email, *roles):
+    usuario = User.objects.create_user(email, email, 'clave-segura-123')
+    for rol in roles:
+        usuario.groups.add(Group.objects.get_or_create(name=rol)[0])
+    return usuario
+
+
+class CanjeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.solicitud = crear_solicitud('12345678-5', estado='Aceptada', fecha_aceptacion=timezone.now())
+
+    def test_respeta_el_cupo_mensual(self):
+        with override_settings(CANJES_POR_MES=2):
+            canjear(self.solicitud)
+            canjear(self.solicitud)
+            with self.assertRaises(CanjeRechazado):
+                canjear(self.solicitud)
+        self.assertEqual(Canje.objects.filter(solicitud=self.solicitud).count(), 2)
+
+    def test_rechaza_estados_no_aceptados(self):
+        vencida = timezone.now() - timedelta(days=31)
+        for estado, fecha_aceptacion in [('Pendiente', None), ('Rechazada', None), ('Aceptada', vencida)]:
+            Solicitud.objects.filter(id=self.solicitud.id).update(estado=estado, fecha_aceptacion=fecha_aceptacion)
+            with self.subTest(estado=estado), self.assertRaises(CanjeRechazado):
+                canjear(self.solicitud)
+        self.assertFalse(Canje.objects.exists())
+
+    def test_rechaza_solicitud_rechazada_despues_de_quedar_en_cache(self):
+        cacheada = async_to_sync(asolicitudes_por_rut)(12345678)[12345678][0]
+        # Otro proceso la rechaza: el caché de este proceso no se entera
+        Solicitud.objects.filter(id=self.solicitud.id).update(estado='Rechazada', fecha_aceptacion=None)
+        self.assertEqual(cacheada.estado_efectivo, 'Aceptada')
+        with self.assertRaises(CanjeRechazado):
+            canjear(cacheada)
+
+        vendedor = crear_usuario('vendedor@mail.cl', 'Vendedor')
+        respuesta = Client().post(
+            reverse('api_canjear_rut', args=['12.345.678-5']),
+            HTTP_AUTHORIZATION=f'Token {generar_token(vendedor)}',
+        )
+        self.assertEqual(respuesta.status_code, 409)
+        self.assertFalse(Canje.objects.exists())
+
+
+class CanjeConcurrenteTests(TransactionTestCase):
+    def setUp(self):
+        # En la base SQLite en memoria los bloqueos de tabla fallan sin esperar el timeout
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('requiere una base de datos en archivo (settings_benchmark) o MySQL')
+
+    def test_canjes_simultaneos_no_superan_el_cupo(self):
+        solicitud = crear_solicitud('12345678-5', estado='Aceptada', fecha_aceptacion=timezone.now())
+        cupo, hilos, intentos = 5, 8, 40
+        errores = []
+
+        def trabajar(numero):
+            try:
+                for _ in range(numero, intentos, hilos):
+                    try:
+                        canjear(solicitud)
+                    except CanjeRechazado:
+                        pass
+                    except OperationalError as e:
+                        errores.append(e)
+            finally:
+                connection.close()
+
+        with override_settings(CANJES_POR_MES=cupo):
+            trabajadores = [threading.Thread(target=trabajar, args=(n,)) for n in range(hilos)]
+            for trabajador in trabajadores:
+                trabajador.start()
+            for trabajador in trabajadores:
+                trabajador.join()
+
+        usados = CupoCanje.objects.get(solicitud=solicitud).usados
+        self.assertEqual(usados, Canje.objects.filter(solicitud=solicitud).count())
+        self.assertEqual(errores, [])
+        self.assertEqual(usados, cupo)
+
+
+class IngresoDiferidoTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        configuracion = override_settings(INGRESO_DIARIO=os.path.join(directorio.name, 'diario.sqlite3'))
+        configuracion.enable()
+        self.addCleanup(configuracion.disable)
+        self.addCleanup(self._cerrar_diario)
+        self.comuna = Comuna.objects.filter(region__isnull=False).order_by('id').first()
+
+    def _cerrar_diario(self):
+        conexion = getattr(ingreso_diferido._local, 'conexion', None)
+        if conexion is not None:
+            conexion.close()
+            ingreso_diferido._local.conexion = None
+
+    def encolar(self, rut, nombre='Ana'):
+        solicitud = Solicitud(
+            rut=rut, nombre=nombre, apellido_paterno='Pérez', apellido_materno='Soto',
+            direccion='Calle 1', telefono='912345678', comuna=self.comuna,
+        )
+        return ingreso_diferido.encolar(ingreso_diferido.datos_de(solicitud))
+
+    def test_drena_y_rechaza_duplicados(self):
+        ingresada = self.encolar('12345678-5')
+        crear_solicitud('11111111-1')
+        duplicada = self.encolar('11111111-1')
+        with self.assertRaises(ingreso_diferido.RutEnCola):
+            self.encolar('12.345.678-5')
+
+        self.assertEqual(ingreso_diferido.drenar(), (1, 1))
+        self.assertEqual(ingreso_diferido.consultar(ingresada)['estado'], 'ingresada')
+        self.assertEqual(ingreso_diferido.consultar(duplicada)['estado'], 'rechazada')
+        self.assertTrue(Solicitud.objects.filter(rut_cuerpo=12345678).exists())
+        self.assertEqual(ingreso_diferido.pendientes(), 0)
+
+    def test_reintento_de_una_entrada_ya_insertada(self):
+        comprobante = self.encolar('12345678-5')
+        ingreso_diferido._reclamar(10, ingreso_diferido.VENCIMIENTO_RECLAMO)
+        # El trabajador anterior alcanzó a insertar la fila, pero no a anotarla
+        crear_solicitud('12345678-5', comuna=self.comuna)
+
+        self.assertEqual(ingreso_diferido.drenar(vencimiento=0), (1, 0))
+        self.assertEqual(ingreso_diferido.consultar(comprobante)['estado'], 'ingresada')
+        self.assertEqual(Solicitud.objects.filter(rut_cuerpo=12345678).count(), 1)
+
+    def test_reintento_con_el_rut_de_otro_postulante(self):
+        comprobante = self.encolar('12345678-5')
+        ingreso_diferido._reclamar(10, ingreso_diferido.VENCIMIENTO_RECLAMO)
+        crear_solicitud('12345678-5', nombre='OTRO', comuna=self.comuna)
+
+        self.assertEqual(ingreso_diferido.drenar(vencimiento=0), (0, 1))
+        self.assertEqual(ingreso_diferido.consultar(comprobante)['estado'], 'rechazada')
+
+    def test_modo_continuo_purga_una_vez_al_dia(self):
+        from .management.commands import procesar_ingresos
+        reloj = iter(range(0, 10 * 86400, 3600 * 6))
+        esperas = 0
+
+        def dormir(segundos):
+            nonlocal esperas
+            esperas += 1
+            if esperas == 8:
+                raise KeyboardInterrupt
+
+        with mock.patch.object(procesar_ingresos.time, 'monotonic', side_effect=lambda: next(reloj)), \
+                mock.patch.object(procesar_ingresos.time, 'sleep', side_effect=dormir), \
+                mock.patch.object(procesar_ingresos, 'purgar', return_value=0) as purgar:
+            call_command('procesar_ingresos', '--continuo', stdout=io.StringIO())
+
+        # Ocho vueltas de 6 horas más la purga inicial: dos días completos
+        self.assertEqual(purgar.call_count, 3)
+        purgar.assert_called_with(settings.INGRESO_DIARIO_RETENCION_DIAS)
+
+
+class EstadisticasTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        comuna = Comuna.objects.filter(region__isnull=False).order_by('id').first()
+        filas = [
+            {'rut': rut, 'nombre': 'Ana', 'apellido_paterno': 'Pérez', 'apellido_materno': 'Soto',
+             'direccion': 'Calle 1', 'telefono': '912345678', 'comuna': comuna.nombre}
+            for rut in ['12345678-5', '11111111-1', '22222222-2', '33333333-3', '44444444-4', '12.345.678-5']
+        ]
+        self.assertEqual(importar_solicitudes(enumerate(filas)), (5, 1))
+        self.ids = list(Solicitud.objects.order_by('id').values_list('id', flat=True))
+        self.admin = Client()
+        self.admin.force_login(crear_usuario('admin@mail.cl', 'Administrador'))
+
+    def agrupar(self, estado=F('estado')):
+        """GROUP BY real sobre Solicitud, con la misma clave que el resumen"""
+        filas = (
+            Solicitud.objects.annotate(mes=TruncMonth('fecha_solicitud'), estado_contado=estado)
+            .values('mes', 'comuna_id', 'estado_contado').annotate(n=Count('id')).order_by()
+        )
+        return {(f['mes'].date(), f['comuna_id'], f['estado_contado']): f['n'] for f in filas}
+
+    def resumen(self):
+        filas = ResumenSolicitudes.objects.exclude(cantidad=0).values_list('mes', 'comuna_id', 'estado', 'cantidad')
+        return {(mes, comuna_id, estado): n for mes, comuna_id, estado, n in filas}
+
+    def test_resumen_coincide_con_group_by(self):
+        self.assertEqual(self.resumen(), self.agrupar())
+        for id_ in self.ids[:3]:
+            self.admin.post(reverse('cambiar_estado', args=[id_]), {'estado': 'Aceptada'})
+        cambiar_estado_masivo(Solicitud.objects.filter(id__in=self.ids[2:4]), 'Rechazada')
+        self.admin.post(reverse('eliminar_solicitud', args=[self.ids[4]]))
+        self.assertEqual(self.resumen(), self.agrupar())
+
+        # Vencida pero aún sin compactar: la vista la cuenta como expirada
+        Solicitud.objects.filter(id=self.ids[0]).update(fecha_aceptacion=timezone.now() - timedelta(days=400))
+        efectivos = {}
+        for (_, _, estado), n in self.agrupar(estado_efectivo_expr()).items():
+            efectivos[estado] = efectivos.get(estado, 0) + n
+        self.assertEqual(estadisticas.totales_por_estado(), efectivos)
+        self.assertEqual(efectivos, {'Aceptada': 1, 'Expirada': 1, 'Rechazada': 2})
+        vista = self.admin.get(reverse('estadisticas_solicitudes'))
+        self.assertIn(('Expirada', 1), vista.context['por_estado'])
+
+        self.assertEqual(expiracion.expirar_solicitudes(), 1)
+        self.assertEqual(self.resumen(), self.agrupar())
+        self.assertEqual(estadisticas.totales_por_estado(), efectivos)
+
+
+@override_settings(LIMITES_PETICIONES={'prueba': (3, 60)})
+class LimitesTests(TestCase):
+    # Inicio de una ventana de 60 segundos
+    INICIO = 60 * 30_000_000
+
+    def setUp(self):
+        cache.clear()
+
+    def consumir(self, segundo, identificador='a'):
+        return limites.consumir('prueba', identificador, ahora=self.INICIO + segundo)
+
+    def test_rechaza_al_llegar_al_limite(self):
+        self.assertEqual([self.consumir(s) for s in (0, 1, 2)], [0, 0, 0])
+        self.assertEqual(self.consumir(3), 57)
+        self.assertEqual(self.consumir(10), 50)
+        # Un rechazo no consume cupo, y cada identificador tiene el suyo
+        self.assertEqual(self.consumir(59), 1)
+        self.assertEqual(self.consumir(10, identificador='b'), 0)
+
+    def test_ventana_anterior_pondera_segun_lo_transcurrido(self):
+        for s in (0, 1, 2):
+            self.consumir(s)
+        # Recién empezada la ventana nueva, la anterior cuenta completa: 3 de 3
+        self.assertEqual(self.consumir(60), 1)
+        # Un segundo después cuenta 3 * 59/60 = 2.95, así que cabe una más
+        self.assertEqual(self.consumir(61), 0)
+        self.assertNotEqual(self.consumir(61), 0)
+        # A mitad de ventana: 3 * 0.5 + 1 = 2.5
+        self.assertEqual(self.consumir(90), 0)
+        self.assertNotEqual(self.consumir(90), 0)
+
+    def test_retry_after_indica_cuando_se_libera(self):
+        vista = limites.limitar(prueba=lambda request: 'a')(lambda request: HttpResponse('ok'))
+        for s in (0, 1, 2):
+            self.consumir(s)
+        self.consumir(61)
+        with mock.patch.object(limites, 'time') as reloj:
+            reloj.time.return_value = self.INICIO + 61
+            respuesta = vista(RequestFactory().post('/'))
+        self.assertEqual(respuesta.status_code, 429)
+        espera = int(respuesta['Retry-After'])
+        self.assertEqual(espera, 20)
+        self.assertNotEqual(self.consumir(61 + espera - 1), 0)
+        self.assertEqual(self.consumir(61 + espera), 0)
+        # Los GET no se limitan
+        self.assertEqual(vista(RequestFactory().get('/')).status_code, 200)
+
+    def test_la_ventana_vence_entre_add_e_incr(self):
+        almacen = caches[settings.LIMITES_CACHE]
+        add = almacen.add
+        llamadas = []
+
+        def add_perdido(*args, **kwargs):
+            # El primer add falla porque la clave existe, pero vence antes del incr
+            llamadas.append(args)
+            return False if len(llamadas) == 1 else add(*args, **kwargs)
+
+        for consumir in [self.consumir, lambda s: async_to_sync(limites.aconsumir)('prueba', 'a', ahora=self.INICIO + s)]:
+            cache.clear()
+            llamadas.clear()
+            with self.subTest(consumir=consumir), mock.patch.object(almacen, 'add', add_perdido):
+                self.assertEqual(consumir(0), 0)
+                self.assertEqual(len(llamadas), 2)
+                self.assertEqual([consumir(s) for s in (1, 2, 3)], [0, 0, 57])
+
+
+class ExpiracionTests(TestCase):
+    def test_no_expira_una_solicitud_aceptada_de_nuevo_durante_el_lote(self):
+        vencida = crear_solicitud('12345678-5', estado='Aceptada', fecha_aceptacion=timezone.now() - timedelta(days=400))
+        otra = crear_solicitud('11111111-1', estado='Aceptada', fecha_aceptacion=timezone.now() - timedelta(days=400))
+        original = expiracion.solicitudes_vencidas
+        llamadas = []
+
+        def candidatas(ahora=None):
+            llamadas.append(ahora)
+            if len(llamadas) > 1:
+                return original(ahora)
+            ids = list(original(ahora).values_list('id', flat=True))
+            # Se vuelve a aceptar entre la consulta de candidatas y el bloqueo
+            Solicitud.objects.filter(id=vencida.id).update(fecha_aceptacion=timezone.now())
+            return Solicitud.objects.filter(id__in=ids)
+
+        with mock.patch.object(expiracion, 'solicitudes_vencidas', candidatas):
+            self.assertEqual(expiracion.expirar_solicitudes(), 1)
+        self.assertEqual(Solicitud.objects.get(id=vencida.id).estado, 'Aceptada')
+        self.assertEqual(Solicitud.objects.get(id=otra.id).estado, 'Expirada')
+
+
+class EliminarDuplicadosTests(TestCase):
+    def test_cuenta_solo_solicitudes_y_no_las_filas_en_cascada(self):
+        original = crear_solicitud('12345678-5', estado='Aceptada', fecha_aceptacion=timezone.now())
+        duplicadas = [
+            crear_duplicado_heredado(texto, 12345678, '5', relleno)
+            for texto, relleno in [('12.345.678-5', '11111111-1'), ('12345678-5 ', '22222222-2'), ('012345678-5', '33333333-3')]
+        ]
+        for duplicada in duplicadas:
+            CupoCanje.objects.create(solicitud=duplicada, periodo=timezone.now().date().replace(day=1), usados=1)
+        self.assertGreater(TerminoBusqueda.objects.filter(solicitud__in=duplicadas).count(), len(duplicadas))
+
+        self.assertEqual(eliminar_duplicados(tamano_lote=2), 3)
+        self.assertEqual(list(Solicitud.objects.values_list('id', flat=True)), [original.id])
+        self.assertFalse(TerminoBusqueda.objects.exclude(solicitud=original).exists())
+        self.assertEqual(eliminar_duplicados(), 0)
+
+
+class RolesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.vendedor = crear_usuario('vendedor@mail.cl', 'Vendedor')
+        self.cliente = Client()
+        self.cliente.force_login(self.vendedor)
+
+    def test_roles_se_leen_de_la_sesion(self):
+        self.assertEqual(self.cliente.get(reverse('buscar_solicitud_vendedor')).status_code, 200)
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.cliente.get(reverse('buscar_solicitud_vendedor')).status_code, 200)
+        self.assertFalse([c for c in consultas.captured_queries if 'auth_group' in c['sql']])
+
+    def test_rol_revocado_deja_de_valer_en_sesiones_abiertas(self):
+        self.assertEqual(self.cliente.get(reverse('dashboard_vendedor')).status_code, 200)
+        self.vendedor.groups.clear()
+        respuesta = self.cliente.get(reverse('dashboard_vendedor'))
+        self.assertEqual(respuesta.status_code, 302)
+        self.assertFalse(respuesta['Location'].startswith(reverse('dashboard_vendedor')))
+
+    def test_rol_agregado_vale_sin_volver_a_iniciar_sesion(self):
+        self.assertEqual(self.cliente.get(reverse('listar_usuarios')).status_code, 302)
+        self.vendedor.groups.add(Group.objects.get_or_create(name='Administrador')[0])
+        self.assertEqual(self.cliente.get(reverse('listar_usuarios')).status_code, 200)
+
+    def test_grupo_renombrado_deja_de_valer_en_sesiones_abiertas(self):
+        self.assertEqual(self.cliente.get(reverse('dashboard_vendedor')).status_code, 200)
+        grupo = Group.objects.get(name='Vendedor')
+        grupo.name = 'Vendedor antiguo'
+        grupo.save()
+        self.assertEqual(self.cliente.get(reverse('dashboard_vendedor')).status_code, 302)
+        grupo.name = 'Vendedor'
+        grupo.save()
+        self.assertEqual(self.cliente.get(reverse('dashboard_vendedor')).status_code, 200)
+
+
+class ChequeosDespliegueTests(TestCase):
+    def test_despliegue_exige_cache_compartido(self):
+        locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        with override_settings(CACHES=locmem):
+            self.assertEqual([e.id for e in verificar_cache(None)], ['descuentoGasApp.E004'])
+        redis = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://localhost:6379/1'}}
+        with override_settings(CACHES=redis):
+            self.assertEqual(verificar_cache(None), [])
+
+
+class RutCanonicoTests(TestCase):
+    def datos(self, rut):
+        comuna = Comuna.objects.filter(region__isnull=False).select_related('region').order_by('id').first()
+        return {
+            'rut': rut, 'nombre': 'Ana', 'apellido_paterno': 'Pérez', 'apellido_materno': 'Soto',
+            'direccion': 'Calle 1', 'telefono': '912345678', 'region': comuna.region.nombre, 'comuna': comuna.nombre,
+        }
+
+    def test_se_guarda_en_formato_canonico(self):
+        self.assertEqual(crear_solicitud('12.345.678-5').rut, '12345678-5')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            crear_solicitud(' 12345678-5')
+        self.assertEqual(Solicitud.objects.count(), 1)
+
+    def test_ingreso_concurrente_del_mismo_rut_en_otro_formato(self):
+        form = SolicitudForm(self.datos('12.345.678-5'))
+        self.assertTrue(form.is_valid(), form.errors)
+        # Otra petición guarda el mismo RUT entre la validación y el INSERT
+        crear_solicitud('12345678-5')
+        with self.assertRaises(IntegrityError):
+            _guardar_solicitud(form)
+        self.assertEqual(Solicitud.objects.filter(rut_cuerpo=12345678).count(), 1)
+
+
+class ApiRutTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        crear_solicitud('13737773-K', estado='Aceptada', fecha_aceptacion=timezone.now())
+        self.autorizacion = f'Token {generar_token(crear_usuario("vendedor@mail.cl", "Vendedor"))}'
+
+    def test_digito_verificador_invalido_responde_400(self):
+        # 13737773-0 comparte el cuerpo con 13737773-K, pero su dígito no es válido
+        respuesta = self.client.get(reverse('api_consultar_rut', args=['13737773-0']), HTTP_AUTHORIZATION=self.autorizacion)
+        self.assertEqual(respuesta.status_code, 400)
+        respuesta = self.client.post(reverse('api_canjear_rut', args=['13737773-0']), HTTP_AUTHORIZATION=self.autorizacion)
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertFalse(Canje.objects.exists())
+
+        respuesta = self.client.get(reverse('api_consultar_rut', args=['13.737.773-k']), HTTP_AUTHORIZATION=self.autorizacion)
+        self.assertEqual(respuesta.json()['estado'], 'Aceptada')
+
+    def test_consulta_multiple_marca_el_digito_invalido(self):
+        respuesta = self.client.post(
+            reverse('api_consultar_ruts'), {'ruts': ['13737773-0', '13737773-K']},
+            content_type='application/json', HTTP_AUTHORIZATION=self.autorizacion,
+        )
+        invalido, valido = respuesta.json()['resultados']
+        self.assertEqual(invalido, {'rut': '13737773-0', 'error': 'Dígito verificador inválido.'})
+        self.assertEqual(valido['estado'], 'Aceptada')
+
+
+class ExportacionTests(TestCase):
+    def setUp(self):
+        for rut in ['12345678-5', '11111111-1', '22222222-2']:
+            crear_solicitud(rut)
+        self.admin = crear_usuario('admin@mail.cl', 'Administrador')
+
+    async def test_bajo_asgi_se_envia_con_un_iterador_async(self):
+        cliente = AsyncClient()
+        await cliente.aforce_login(self.admin)
+        for formato in ['csv', 'ndjson']:
+            with self.subTest(formato=formato):
+                respuesta = await cliente.get(reverse('exportar_solicitudes'), {'formato': formato})
+                self.assertTrue(respuesta.is_async)
+                contenido = b''.join([bloque async for bloque in respuesta.streaming_content]).decode()
+                sincrono = Client()
+                await sync_to_async(sincrono.force_login)(self.admin)
+                esperado = await sync_to_async(
+                    lambda: b''.join(sincrono.get(reverse('exportar_solicitudes'), {'formato': formato}).streaming_content)
+                )()
+                self.assertEqual(contenido, esperado.decode())
+                self.assertEqual(len(contenido.splitlines()), 3 + (formato == 'csv'))
+
+
+    def test_recorre_la_tabla_en_lotes_por_id(self):
+        with mock.patch.object(exportacion, 'TAMANO_BLOQUE', 2), CaptureQueriesContext(connection) as consultas:
+            lineas = list(exportacion.exportar(Solicitud.objects.all(), 'csv'))
+        self.assertEqual([linea.split(',')[1] for linea in lineas[1:]], ['12345678-5', '11111111-1', '22222222-2'])
+        lotes = [c['sql'] for c in consultas.captured_queries if 'descuentoGasApp_solicitud' in c['sql']]
+        self.assertEqual(len(lotes), 2)
+        self.assertTrue(all('LIMIT 2' in sql for sql in lotes))
+
+
+class CachePaginasTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.vendedor = crear_usuario('vendedor@mail.cl', 'Vendedor')
+
+    def test_inicio_se_guarda_por_rol(self):
+        anonimo = Client()
+        primera = anonimo.get(reverse('index'))
+        self.assertEqual(anonimo.get(reverse('index')).content, primera.content)
+        admin = Client()
+        admin.force_login(crear_usuario('admin@mail.cl', 'Administrador'))
+        self.assertNotEqual(admin.get(reverse('index')).content, primera.content)
+
+    def test_dashboard_se_sirve_del_cache_por_usuario(self):
+        cliente = Client()
+        cliente.force_login(self.vendedor)
+        with CaptureQueriesContext(connection) as primera:
+            cliente.get(reverse('dashboard_vendedor'))
+        with CaptureQueriesContext(connection) as segunda:
+            self.assertEqual(cliente.get(reverse('dashboard_vendedor')).status_code, 200)
+        self.assertLess(len(segunda), len(primera))
+
+        otro = Client()
+        otro.force_login(crear_usuario('otro@mail.cl', 'Vendedor'))
+        self.assertContains(otro.get(reverse('perfil_usuario')), 'otro@mail.cl')
+        self.assertNotContains(otro.get(reverse('perfil_usuario')), 'vendedor@mail.cl')
+
+    def test_perfil_muestra_los_roles_vigentes(self):
+        cliente = Client()
+        cliente.force_login(self.vendedor)
+        self.assertContains(cliente.get(reverse('perfil_usuario')), 'badge-primary">Vendedor<')
+        self.vendedor.groups.add(Group.objects.get_or_create(name='Administrador')[0])
+        self.vendedor.groups.add(Group.objects.create(name='Soporte'))
+
+        respuesta = cliente.get(reverse('perfil_usuario'))
+        self.assertContains(respuesta, 'badge-primary">Administrador<')
+        self.assertNotContains(respuesta, 'Soporte')
+
+    def test_pagina_con_mensajes_no_se_guarda(self):
+        otra_sesion = Client()
+        otra_sesion.force_login(self.vendedor)
+        otra_sesion.get(reverse('dashboard_vendedor'))
+        # El mensaje de bienvenida se muestra aunque la página ya esté en caché, y solo una vez
+        cliente = Client()
+        respuesta = cliente.post(reverse('login'), {'email': 'vendedor@mail.cl', 'password': 'clave-segura-123'}, follow=True)
+        self.assertContains(respuesta, 'Bienvenido, !')
+        self.assertNotContains(cliente.get(reverse('dashboard_vendedor')), 'Bienvenido, !')
+
+
+class GetCondicionalTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.solicitud = crear_solicitud('12345678-5')
+        self.url = reverse('detalle_solicitud', args=[self.solicitud.id])
+        self.admin = Client()
+        self.admin.force_login(crear_usuario('admin@mail.cl', 'Administrador'))
+
+    def etag(self):
+        return self.admin.get(self.url)['ETag']
+
+    def test_responde_304_sin_renderizar(self):
+        respuesta = self.admin.get(self.url)
+        self.assertEqual(respuesta['Cache-Control'], 'private, no-cache')
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.admin.get(self.url, HTTP_IF_NONE_MATCH=respuesta['ETag']).status_code, 304)
+        self.assertLessEqual(len(consultas), 3)
+        self.assertEqual(self.admin.get(self.url, HTTP_IF_MODIFIED_SINCE=respuesta['Last-Modified']).status_code, 304)
+
+    def test_cambio_de_estado_invalida_la_version(self):
+        etag = self.etag()
+        self.admin.post(reverse('cambiar_estado', args=[self.solicitud.id]), {'estado': 'Aceptada'})
+        self.assertEqual(self.admin.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_canje_invalida_la_version(self):
+        Solicitud.objects.filter(id=self.solicitud.id).update(estado='Aceptada', fecha_aceptacion=timezone.now())
+        etag = self.etag()
+        canjear(self.solicitud)
+        self.assertEqual(self.admin.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_expiracion_invalida_la_version(self):
+        Solicitud.objects.filter(id=self.solicitud.id).update(
+            estado='Aceptada', fecha_aceptacion=timezone.now() - timedelta(days=400)
+        )
+        etag = self.etag()
+        expiracion.expirar_solicitudes()
+        self.solicitud.refresh_from_db()
+        self.assertEqual(self.solicitud.estado, 'Expirada')
+        self.assertEqual(self.admin.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ImportacionTests(TestCase):
+    ENCABEZADO = ['rut', 'nombre', 'apellido_paterno', 'apellido_materno', 'direccion', 'telefono', 'comuna']
+
+    def setUp(self):
+        cache.clear()
+        self.comuna = Comuna.objects.filter(region__isnull=False).order_by('id').first()
+        self.admin = Client()
+        self.admin.force_login(crear_usuario('admin@mail.cl', 'Administrador'))
+
+    def fila(self, rut, telefono='912345678', comuna=None):
+        return [rut, 'Ana', 'Pérez', 'Soto', 'Calle 1', telefono, comuna or self.comuna.nombre]
+
+    def filas(self):
+        return [
+            self.fila('12345678-5'),
+            self.fila('12345678-0'),
+            self.fila('11111111-1', telefono='12345'),
+            self.fila('22222222-2', comuna='Gotham'),
+            self.fila('33333333-3', telefono='+56 9 8765 4321'),
+            self.fila('12.345.678-5'),
+            self.fila('13737773-k'),
+        ]
+
+    def archivo_csv(self):
+        texto = io.StringIO()
+        csv.writer(texto).writerows([self.ENCABEZADO, *self.filas()])
+        return SimpleUploadedFile('lote.csv', texto.getvalue().encode(), content_type='text/csv')
+
+    def archivo_xlsx(self):
+        libro = Workbook()
+        for fila in [self.ENCABEZADO, *self.filas()]:
+            libro.active.append(fila)
+        contenido = io.BytesIO()
+        libro.save(contenido)
+        return SimpleUploadedFile('lote.xlsx', contenido.getvalue())
+
+    def importar(self, archivo, lote=''):
+        respuesta = self.admin.post(reverse('importar_solicitudes'), {'archivo': archivo, 'lote': lote})
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.context['resultado']
+
+    def test_informa_cada_fila_rechazada(self):
+        for archivo in [self.archivo_csv, self.archivo_xlsx]:
+            Solicitud.objects.all().delete()
+            with self.subTest(archivo=archivo.__name__):
+                resultado = self.importar(archivo())
+                self.assertEqual((resultado['creadas'], resultado['rechazadas']), (3, 4))
+                errores = [(e['fila'], e['rut'], e['mensaje']) for e in resultado['errores']]
+                self.assertEqual([e[:2] for e in errores], [
+                    (3, '12345678-0'), (4, '11111111-1'), (5, '22222222-2'), (7, '12345678-5'),
+                ])
+                self.assertIn('Dígito verificador inválido', errores[0][2])
+                self.assertIn('teléfono inválido', errores[1][2])
+                self.assertIn('"Gotham" no es una comuna', errores[2][2])
+                # Repetido dentro del mismo archivo, en otro formato
+                self.assertEqual(errores[3][2], 'Ya existe una solicitud con ese RUT.')
+
+                self.assertEqual(
+                    list(Solicitud.objects.order_by('id').values_list('rut', 'telefono', 'comuna_id')),
+                    [('12345678-5', '912345678', self.comuna.id),
+                     ('33333333-3', '987654321', self.comuna.id),
+                     ('13737773-K', '912345678', self.comuna.id)],
+                )
+
+    def test_inserta_en_lotes(self):
+        with mock.patch.object(Solicitud.objects, 'bulk_create', wraps=Solicitud.objects.bulk_create) as bulk_create:
+            resultado = self.importar(self.archivo_csv(), lote=2)
+        # Cuatro filas válidas en dos lotes; el repetido del segundo no llega al INSERT
+        self.assertEqual([len(llamada.args[0]) for llamada in bulk_create.call_args_list], [2, 1])
+        self.assertEqual((resultado['creadas'], resultado['rechazadas']), (3, 4))
+        self.assertEqual(Solicitud.objects.count(), 3)
+        self.assertTrue(TerminoBusqueda.objects.filter(solicitud__rut='13737773-K').exists())
+
+    def test_reintenta_fila_por_fila_si_otra_escritura_gana_un_rut(self):
+        original = Solicitud.objects.filter
+
+        def filtrar_concurrente(*args, **kwargs):
+            if 'rut_cuerpo__in' not in kwargs:
+                return original(*args, **kwargs)
+            # Otra petición inserta uno de los RUT justo después de consultar los existentes
+            existentes = original(*args, **kwargs)
+            existentes = original(id__in=list(existentes.values_list('id', flat=True)))
+            crear_solicitud('33333333-3', nombre='OTRO')
+            return existentes
+
+        errores = []
+        filas = [(n, dict(zip(self.ENCABEZADO, f))) for n, f in enumerate(self.filas(), start=2)]
+        with mock.patch.object(Solicitud.objects, 'filter', filtrar_concurrente):
+            creadas, rechazadas = importar_solicitudes(filas, al_error=lambda *error: errores.append(error))
+
+        self.assertEqual((creadas, rechazadas), (2, 5))
+        self.assertIn((6, '33333333-3', 'Ya existe una solicitud con ese RUT.'), errores)
+        self.assertEqual(
+            sorted(Solicitud.objects.values_list('rut', 'nombre')),
+            [('12345678-5', 'Ana'), ('13737773-K', 'Ana'), ('33333333-3', 'OTRO')],
+        )
+        # El resumen cuenta solo las dos insertadas: lo aplicado por el bulk_create fallido se revirtió
+        self.assertEqual(estadisticas.totales_por_estado(), {'Pendiente': 2})
+
+    def test_csv_guardado_en_cp1252(self):
+        texto = io.StringIO()
+        csv.writer(texto).writerows([self.ENCABEZADO, self.fila('12345678-5', comuna='Ñuñoa'), self.fila('11111111-1')])
+        archivo = SimpleUploadedFile('lote.csv', texto.getvalue().encode('cp1252'), content_type='text/csv')
+        resultado = self.importar(archivo, lote=1)
+        self.assertEqual((resultado['creadas'], resultado['rechazadas']), (2, 0))
+        self.assertEqual(
+            list(Solicitud.objects.order_by('id').values_list('apellido_paterno', 'comuna__nombre')),
+            [('Pérez', 'Ñuñoa'), ('Pérez', self.comuna.nombre)],
+        )
+
+    def test_csv_con_un_byte_invalido_al_final_no_deja_lotes_a_medias(self):
+        # UTF-8 válido hasta la última fila: se lee completo como cp1252 desde el comienzo
+        contenido = '\n'.join(','.join(f) for f in [self.ENCABEZADO, self.fila('12345678-5'), self.fila('11111111-1')])
+        archivo = SimpleUploadedFile('lote.csv', contenido.encode() + b'\n13737773-K,Jos\xe9,P,S,Calle 1,912345678,' + self.comuna.nombre.encode())
+        resultado = self.importar(archivo, lote=1)
+        self.assertEqual((resultado['creadas'], resultado['rechazadas']), (3, 0))
+        self.assertEqual(Solicitud.objects.get(rut='13737773-K').nombre, 'José')
+
+    def test_xlsx_danado(self):
+        for contenido in [b'no es un zip', self.archivo_xlsx().read()[:200]]:
+            with self.subTest(contenido=contenido[:12]):
+                respuesta = self.admin.post(
+                    reverse('importar_solicitudes'), {'archivo': SimpleUploadedFile('lote.xlsx', contenido)}, follow=True
+                )
+                self.assertEqual(respuesta.status_code, 200)
+                self.assertIsNone(respuesta.context['resultado'])
+                self.assertEqual([str(m) for m in respuesta.context['messages']], ['El archivo no es un XLSX válido o está dañado.'])
+
+        with tempfile.NamedTemporaryFile(suffix='.xlsx') as archivo:
+            archivo.write(b'no es un zip')
+            archivo.flush()
+            with self.assertRaisesMessage(CommandError, 'El archivo no es un XLSX válido o está dañado.'):
+                call_command('importar_solicitudes', archivo.name, stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertFalse(Solicitud.objects.exists())
+
+
+class CambioEstadoMasivoTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.comunas = list(Comuna.objects.filter(region__isnull=False).order_by('id')[:2])
+        vencida = timezone.now() - timedelta(days=400)
+        self.solicitudes = [
+            crear_solicitud('12345678-5', comuna=self.comunas[0]),
+            crear_solicitud('11111111-1', comuna=self.comunas[1]),
+            crear_solicitud('22222222-2', comuna=self.comunas[0], estado='Aceptada', fecha_aceptacion=vencida),
+            crear_solicitud('33333333-3', comuna=self.comunas[1], estado='Rechazada'),
+            crear_solicitud('44444444-4', comuna=self.comunas[0], estado='Aceptada', fecha_aceptacion=timezone.now()),
+        ]
+        self.ids = [s.id for s in self.solicitudes]
+        self.antes = timezone.now() - timedelta(days=1)
+        Solicitud.objects.update(fecha_modificacion=self.antes)
+        self.usuario = crear_usuario('admin@mail.cl', 'Administrador')
+        self.admin = Client()
+        self.admin.force_login(self.usuario)
+
+    def estados(self):
+        return dict(Solicitud.objects.values_list('id', 'estado'))
+
+    def test_ids_explicitos(self):
+        elegidos = [self.ids[0], self.ids[2]]
+        respuesta = self.admin.post(reverse('cambiar_estado_masivo'), {'estado': 'Rechazada', 'ids': elegidos}, follow=True)
+        self.assertContains(respuesta, 'Se cambiaron 2 solicitudes a Rechazada (Expirada: 1, Pendiente: 1).')
+
+        estados = self.estados()
+        self.assertEqual([estados[id_] for id_ in self.ids], ['Rechazada', 'Pendiente', 'Rechazada', 'Rechazada', 'Aceptada'])
+        self.assertEqual(
+            sorted(SolicitudEvento.objects.values_list('solicitud_id', 'tipo', 'estado_anterior', 'estado_nuevo', 'usuario')),
+            [(self.ids[0], 'estado', 'Pendiente', 'Rechazada', self.usuario.id),
+             (self.ids[2], 'estado', 'Aceptada', 'Rechazada', self.usuario.id)],
+        )
+        cambiadas = Solicitud.objects.filter(id__in=elegidos)
+        self.assertFalse(cambiadas.filter(fecha_aceptacion__isnull=False).exists())
+        self.assertFalse(cambiadas.filter(fecha_modificacion__lte=self.antes).exists())
+        self.assertEqual(Solicitud.objects.filter(fecha_modificacion=self.antes).count(), 3)
+
+    def test_todas_con_los_filtros_de_la_url(self):
+        url = reverse('cambiar_estado_masivo') + f'?comuna={self.comunas[1].nombre}'
+        respuesta = self.admin.post(url, {'estado': 'Aceptada', 'todas': 'on'})
+        self.assertEqual(respuesta['Location'], reverse('administrar_solicitudes') + f'?comuna={self.comunas[1].nombre}')
+
+        estados = self.estados()
+        self.assertEqual([estados[id_] for id_ in self.ids], ['Pendiente', 'Aceptada', 'Aceptada', 'Aceptada', 'Aceptada'])
+        self.assertEqual(
+            set(SolicitudEvento.objects.values_list('solicitud_id', flat=True)), {self.ids[1], self.ids[3]}
+        )
+        # La vencida del otro filtro conserva su fecha y sigue expirada
+        self.assertEqual(Solicitud.objects.get(id=self.ids[2]).estado_efectivo, 'Expirada')
+
+    def test_recorre_varios_lotes(self):
+        ahora = timezone.now()
+        with CaptureQueriesContext(connection) as consultas:
+            resumen = cambiar_estado_masivo(Solicitud.objects.all(), 'Aceptada', tamano_lote=2, ahora=ahora, usuario=self.usuario)
+
+        self.assertEqual(resumen, Counter({'Pendiente': 2, 'Expirada': 1, 'Rechazada': 1, 'Aceptada': 1}))
+        actualizaciones = [c for c in consultas.captured_queries if c['sql'].startswith('UPDATE "descuentoGasApp_solicitud"')]
+        self.assertEqual(len(actualizaciones), 3)
+        self.assertEqual(set(Solicitud.objects.values_list('estado', 'fecha_aceptacion')), {('Aceptada', ahora)})
+        self.assertFalse(Solicitud.objects.filter(fecha_modificacion__lte=self.antes).exists())
+        self.assertEqual(
+            Counter(SolicitudEvento.objects.values_list('solicitud_id', flat=True)), Counter(self.ids)
+        )
+
+    def test_rechaza_estados_invalidos_y_seleccion_vacia(self):
+        for datos in [{'estado': 'Cancelada', 'ids': self.ids}, {'estado': '', 'todas': 'on'}, {'estado': 'Aceptada'}]:
+            with self.subTest(datos=datos):
+                respuesta = self.admin.post(reverse('cambiar_estado_masivo'), datos, follow=True)
+                self.assertEqual([m.level for m in respuesta.context['messages']], [messages.ERROR])
+        self.assertEqual(list(Solicitud.objects.order_by('id').values_list('estado', flat=True)),
+                         ['Pendiente', 'Pendiente', 'Aceptada', 'Rechazada', 'Aceptada'])
+        self.assertFalse(SolicitudEvento.objects.exists())
+        self.assertFalse(Solicitud.objects.exclude(fecha_modificacion=self.antes).exists())
+
+
+class BusquedaTests(TestCase):
+    def setUp(self):
+        self.jose = crear_solicitud('12345678-5', nombre='José')
+        self.pasaje = crear_solicitud('11111111-1', direccion='Pasaje José Miguel 12')
+        self.josefa = crear_solicitud('22222222-2', nombre='Josefa', apellido_paterno='Muñoz')
+        self.otra_josefa = crear_solicitud('33333333-3', nombre='Josefa')
+
+    def ids(self, texto, cursor=None, tamano=10):
+        solicitudes, siguiente = buscar(texto, cursor, tamano)
+        return [s.id for s in solicitudes], siguiente
+
+    def test_prefijo_sin_tildes_ni_mayusculas(self):
+        esperado = [self.jose.id, self.otra_josefa.id, self.josefa.id, self.pasaje.id]
+        for texto in ['jose', 'JOSÉ', ' José, ']:
+            with self.subTest(texto=texto):
+                self.assertEqual(self.ids(texto), (esperado, None))
+        self.assertEqual(self.ids('MUÑ'), ([self.josefa.id], None))
+        # Cada término debe coincidir: aquí solo la del pasaje
+        self.assertEqual(self.ids('jos pasaj'), ([self.pasaje.id], None))
+        self.assertEqual(self.ids('joaquin'), ([], None))
+
+    def test_ordena_por_peso_y_luego_por_id(self):
+        solicitudes, _ = buscar('jose', None, 10)
+        # Coincidencia completa en nombre (3 * 2), prefijo en nombre (3), completa en dirección (1 * 2)
+        self.assertEqual([s.puntaje for s in solicitudes], [6, 3, 3, 2])
+        self.assertEqual(solicitudes[1].id, self.otra_josefa.id)
+
+    def test_pagina_con_cursor(self):
+        primera, cursor = self.ids('jose', tamano=2)
+        self.assertEqual(primera, [self.jose.id, self.otra_josefa.id])
+        segunda, cursor = self.ids('jose', cursor, tamano=2)
+        self.assertEqual((segunda, cursor), ([self.josefa.id, self.pasaje.id], None))
+        # Un cursor inválido vuelve a la primera página
+        self.assertEqual(self.ids('jose', 'x.1', tamano=2)[0], primera)
+
+        admin = Client()
+        admin.force_login(crear_usuario('admin@mail.cl', 'Administrador'))
+        with override_settings(SOLICITUDES_POR_PAGINA=3):
+            respuesta = admin.get(reverse('buscar_solicitudes'), {'q': 'jose'})
+            self.assertEqual(len(respuesta.context['solicitudes']), 3)
+            respuesta = admin.get(reverse('buscar_solicitudes') + '?' + respuesta.context['pagina_siguiente'])
+        self.assertEqual([s.id for s in respuesta.context['solicitudes']], [self.pasaje.id])
+
+    def test_save_mantiene_el_indice(self):
+        self.jose.nombre = 'Joaquín'
+        self.jose.save()
+        self.assertEqual(self.ids('joaquin'), ([self.jose.id], None))
+        self.assertNotIn(self.jose.id, self.ids('jose')[0])
+        self.assertEqual(TerminoBusqueda.objects.filter(solicitud=self.jose, termino='joaquin').count(), 1)
+
+        self.pasaje.direccion = 'Calle 2'
+        self.pasaje.save(update_fields=['direccion'])
+        self.assertEqual(self.ids('pasaje'), ([], None))
+
+        with CaptureQueriesContext(connection) as consultas:
+            self.josefa.estado = 'Aceptada'
+            self.josefa.save(update_fields=['estado'])
+        self.assertFalse([c for c in consultas.captured_queries if 'terminobusqueda' in c['sql']])
+
+
+class ListadoSolicitudesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.comunas = [
+            Comuna.objects.filter(region=region).order_by('id').first()
+            for region in Region.objects.order_by('id')[:2]
+        ]
+        hoy = timezone.now().replace(hour=12, minute=0, second=0, microsecond=0)
+        self.fechas = [hoy - timedelta(days=d) for d in (1, 2, 2, 2, 3)]
+        estados = [
+            {}, {'estado': 'Aceptada', 'fecha_aceptacion': hoy - timedelta(days=400)},
+            {'estado': 'Aceptada', 'fecha_aceptacion': hoy}, {'estado': 'Rechazada'}, {'estado': 'Expirada'},
+        ]
+        ruts = ['12345678-5', '11111111-1', '22222222-2', '33333333-3', '44444444-4']
+        self.ids = []
+        for numero, (rut, fecha, campos) in enumerate(zip(ruts, self.fechas, estados)):
+            solicitud = crear_solicitud(rut, comuna=self.comunas[numero % 2], **campos)
+            Solicitud.objects.filter(id=solicitud.id).update(fecha_solicitud=fecha)
+            self.ids.append(solicitud.id)
+        # Más reciente primero y, con la misma fecha, el id mayor primero
+        self.orden = [self.ids[0], self.ids[3], self.ids[2], self.ids[1], self.ids[4]]
+        self.admin = Client()
+        self.admin.force_login(crear_usuario('admin@mail.cl', 'Administrador'))
+
+    def pagina(self, cursor=None, tamano=2):
+        filas, siguiente, anterior = paginar_por_cursor(Solicitud.objects.all(), cursor, tamano)
+        return [s.id for s in filas], siguiente, anterior
+
+    def listar(self, **parametros):
+        with override_settings(SOLICITUDES_POR_PAGINA=10):
+            respuesta = self.admin.get(reverse('administrar_solicitudes'), parametros)
+        return [s.id for s in respuesta.context['solicitudes']]
+
+    def test_avanza_y_retrocede_con_empates_de_fecha(self):
+        primera, siguiente, anterior = self.pagina()
+        self.assertEqual((primera, anterior), (self.orden[:2], None))
+        # El límite de página cae entre filas con la misma fecha_solicitud
+        segunda, siguiente, anterior = self.pagina(siguiente)
+        self.assertEqual(segunda, self.orden[2:4])
+        tercera, fin, anterior_tercera = self.pagina(siguiente)
+        self.assertEqual((tercera, fin), (self.orden[4:], None))
+
+        self.assertEqual(self.pagina(anterior_tercera)[:2], (segunda, siguiente))
+        self.assertEqual(self.pagina(anterior), (primera, self.pagina()[1], None))
+
+    def test_la_vista_enlaza_ambas_direcciones(self):
+        with override_settings(SOLICITUDES_POR_PAGINA=2):
+            url = reverse('administrar_solicitudes')
+            respuesta = self.admin.get(url, {'estado': ''})
+            self.assertTrue(respuesta.context['es_primera_pagina'])
+            respuesta = self.admin.get(f"{url}?{respuesta.context['pagina_siguiente']}")
+            self.assertEqual([s.id for s in respuesta.context['solicitudes']], self.orden[2:4])
+            self.assertContains(respuesta, '‹ Anterior')
+            respuesta = self.admin.get(f"{url}?{respuesta.context['pagina_anterior']}")
+        self.assertEqual([s.id for s in respuesta.context['solicitudes']], self.orden[:2])
+        self.assertTrue(respuesta.context['es_primera_pagina'])
+        self.assertEqual(respuesta.context['primera_pagina'], 'estado=')
+
+    def test_cursor_invalido_muestra_la_primera_pagina(self):
+        valido = codificar_cursor(self.fechas[1], self.ids[1])
+        adulterados = [
+            'no-es-base64!', valido[:-3], 'YWJj', valido + 'AAAA',
+            base64.urlsafe_b64encode(b'2024-13-40T00:00:00|5').decode(),
+            base64.urlsafe_b64encode(f'{self.fechas[1].isoformat()}|5|>'.encode()).decode(),
+        ]
+        for cursor in adulterados:
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.pagina(cursor), self.pagina())
+                self.assertEqual(self.listar(cursor=cursor), self.orden)
+
+    def test_filtros(self):
+        self.assertEqual(self.listar(), self.orden)
+        self.assertEqual(self.listar(estado='Expirada'), [self.ids[1], self.ids[4]])
+        self.assertEqual(self.listar(estado='Aceptada'), [self.ids[2]])
+        self.assertEqual(self.listar(estado='Pendiente'), [self.ids[0]])
+        self.assertEqual(self.listar(region=self.comunas[1].region.nombre), [self.ids[3], self.ids[1]])
+        self.assertEqual(self.listar(comuna=self.comunas[0].nombre.upper()), [self.ids[0], self.ids[2], self.ids[4]])
+        dia = timezone.localtime(self.fechas[1]).date()
+        self.assertEqual(self.listar(fecha_desde=dia, fecha_hasta=dia), self.orden[1:4])
+        self.assertEqual(self.listar(fecha_desde=dia), self.orden[:4])
+        self.assertEqual(self.listar(fecha_hasta=dia), self.orden[1:])
+        self.assertEqual(self.listar(estado='Expirada', region=self.comunas[0].region.nombre), [self.ids[4]])
+
+    def test_fechas_invalidas_no_filtran(self):
+        dia = timezone.localtime(self.fechas[1]).date()
+        for parametros in [{'fecha_desde': '2024-13-40'}, {'fecha_desde': dia, 'fecha_hasta': dia - timedelta(days=1)}]:
+            with self.subTest(parametros=parametros):
+                self.assertEqual(self.listar(**parametros), self.orden)
+
+
+class VistasAsyncTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.solicitud = crear_solicitud('13737773-K', estado='Aceptada', fecha_aceptacion=timezone.now())
+        self.vendedor = crear_usuario('vendedor@mail.cl', 'Vendedor')
+        self.admin = crear_usuario('admin@mail.cl', 'Administrador')
+        comuna = Comuna.objects.filter(region__isnull=False).select_related('region').order_by('id').first()
+        self.datos = {
+            'rut': '12.345.678-5', 'nombre': 'Ana', 'apellido_paterno': 'Pérez', 'apellido_materno': 'Soto',
+            'direccion': 'Calle 1', 'telefono': '912345678', 'region': comuna.region.nombre, 'comuna': comuna.nombre,
+        }
+
+    async def cliente(self, usuario=None):
+        cliente = AsyncClient()
+        if usuario:
+            await cliente.aforce_login(usuario)
+        return cliente
+
+    def mensajes(self, respuesta):
+        return [str(m) for m in respuesta.context['messages']]
+
+    async def test_ingreso_valido_y_rut_repetido(self):
+        cliente = await self.cliente()
+        respuesta = await cliente.post(reverse('ingresar_solicitud'), self.datos, follow=True)
+        self.assertEqual(self.mensajes(respuesta), ['Solicitud ingresada correctamente.'])
+        solicitud = await Solicitud.objects.aget(rut_cuerpo=12345678)
+        self.assertEqual(solicitud.rut, '12345678-5')
+
+        respuesta = await cliente.post(reverse('ingresar_solicitud'), {**self.datos, 'rut': '12345678-5'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn('rut', respuesta.context['form'].errors)
+        self.assertEqual(await Solicitud.objects.filter(rut_cuerpo=12345678).acount(), 1)
+
+    async def test_busqueda_del_vendedor(self):
+        cliente = await self.cliente(self.vendedor)
+        respuesta = await cliente.post(reverse('buscar_solicitud_vendedor'), {'rut': '13.737.773-k'})
+        self.assertEqual([s.id for s in respuesta.context['solicitudes']], [self.solicitud.id])
+        self.assertContains(respuesta, 'Registrar canje')
+
+        respuesta = await cliente.post(reverse('buscar_solicitud_vendedor'), {'rut': '12345678-5'})
+        self.assertEqual(respuesta.context['solicitudes'], [])
+        self.assertEqual(self.mensajes(respuesta), ['No se encontraron solicitudes con el RUT 12345678-5'])
+
+    async def test_canje_hasta_el_cupo(self):
+        cliente = await self.cliente(self.vendedor)
+        url = reverse('canjear_solicitud', args=[self.solicitud.id])
+        with override_settings(CANJES_POR_MES=1):
+            respuesta = await cliente.post(url)
+            self.assertEqual(respuesta['Location'], f"{reverse('buscar_solicitud_vendedor')}?rut=13737773-K")
+            respuesta = await cliente.post(url, follow=True)
+        self.assertEqual(len(self.mensajes(respuesta)), 2)
+        self.assertEqual(self.mensajes(respuesta)[0], 'Canje registrado correctamente.')
+        self.assertIn('no tiene canjes disponibles', self.mensajes(respuesta)[1])
+        self.assertEqual(await Canje.objects.filter(solicitud_id=self.solicitud.id, vendedor=self.vendedor).acount(), 1)
+
+    async def test_acceso_segun_sesion_y_rol(self):
+        anonimo = await self.cliente()
+        admin = await self.cliente(self.admin)
+        login = reverse('login')
+        for metodo, url in [
+            ('get', reverse('buscar_solicitud_vendedor')),
+            ('post', reverse('canjear_solicitud', args=[self.solicitud.id])),
+        ]:
+            with self.subTest(url=url):
+                respuesta = await getattr(anonimo, metodo)(url)
+                self.assertEqual(respuesta.status_code, 302)
+                self.assertTrue(respuesta['Location'].startswith(f'{login}?next='))
+                respuesta = await getattr(admin, metodo)(url)
+                self.assertEqual(respuesta.status_code, 302)
+                self.assertTrue(respuesta['Location'].startswith('/?next='))
+        self.assertFalse(await Canje.objects.aexists())
+        # El ingreso es público
+        self.assertEqual((await anonimo.get(reverse('ingresar_solicitud'))).status_code, 200)
+
+
+@override_settings(METRICAS_MUESTREO=1)
+class MetricasTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        registro_metricas.reiniciar()
+        self.addCleanup(registro_metricas.reiniciar)
+        crear_solicitud('12345678-5')
+
+    def test_expone_las_vistas_medidas(self):
+        vendedor = Client()
+        vendedor.force_login(crear_usuario('vendedor@mail.cl', 'Vendedor'))
+        vendedor.post(reverse('buscar_solicitud_vendedor'), {'rut': '12345678-5'})
+        vendedor.post(reverse('buscar_solicitud_vendedor'), {'rut': '12345678-5'})
+        Client().get(reverse('index'))
+
+        admin = Client()
+        admin.force_login(crear_usuario('admin@mail.cl', 'Administrador'))
+        respuesta = admin.get(reverse('metricas'))
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        lineas = respuesta.content.decode().splitlines()
+
+        self.assertIn('# TYPE descuentogas_vista_duracion_segundos histogram', lineas)
+        self.assertIn('descuentogas_vista_duracion_segundos_count{vista="buscar_solicitud_vendedor"} 2', lineas)
+        self.assertIn('descuentogas_vista_duracion_segundos_bucket{vista="buscar_solicitud_vendedor",le="+Inf"} 2', lineas)
+        self.assertIn('descuentogas_vista_duracion_segundos_count{vista="index"} 1', lineas)
+        self.assertIn('descuentogas_vista_consultas_count{vista="buscar_solicitud_vendedor"} 2', lineas)
+        self.assertIn('descuentogas_vista_n_mas_1_total{vista="index"} 0', lineas)
+        self.assertTrue(any(linea.startswith('descuentogas_vista_consultas_segundos_total{vista="buscar_solicitud_vendedor"} ') for linea in lineas))
+        self.assertTrue(any(linea.startswith('descuentogas_cache_rut_total{resultado="acierto"} ') for linea in lineas))
+        # Los acumulados de las cubetas nunca bajan y terminan en el total
+        cubetas = [
+            int(linea.rsplit(' ', 1)[1]) for linea in lineas
+            if linea.startswith('descuentogas_vista_consultas_bucket{vista="buscar_solicitud_vendedor"')
+        ]
+        self.assertEqual(cubetas, sorted(cubetas))
+        self.assertEqual(cubetas[-1], 2)
+        # La medición de /metricas queda para el siguiente scrape
+        self.assertFalse([linea for linea in lineas if 'vista="metricas"' in linea])
+        self.assertIn('descuentogas_vista_duracion_segundos_count{vista="metricas"} 1', admin.get(reverse('metricas')).content.decode())
+
+    def test_solo_para_administradores(self):
+        respuesta = Client().get(reverse('metricas'))
+        self.assertEqual(respuesta.status_code, 302)
+        self.assertTrue(respuesta['Location'].startswith(reverse('login')))
+        vendedor = Client()
+        vendedor.force_login(crear_usuario('vendedor@mail.cl', 'Vendedor'))
+        respuesta = vendedor.get(reverse('metricas'))
+        self.assertEqual(respuesta.status_code, 302)
+        self.assertNotIn(b'descuentogas_', respuesta.content)
+
+
+class AuditoriaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.solicitud = crear_solicitud('12345678-5')
+        self.usuario = crear_usuario('admin@mail.cl', 'Administrador')
+        self.admin = Client()
+        self.admin.force_login(self.usuario)
+
+    def eventos(self):
+        return list(
+            SolicitudEvento.objects.filter(solicitud_id=self.solicitud.id).order_by('id')
+            .values_list('tipo', 'estado_anterior', 'estado_nuevo', 'usuario_id')
+        )
+
+    def test_cada_cambio_agrega_un_evento(self):
+        self.admin.post(reverse('cambiar_estado', args=[self.solicitud.id]), {'estado': 'Aceptada'})
+        self.assertEqual(self.eventos(), [('estado', 'Pendiente', 'Aceptada', self.usuario.id)])
+
+        Solicitud.objects.filter(id=self.solicitud.id).update(fecha_aceptacion=timezone.now() - timedelta(days=400))
+        expiracion.expirar_solicitudes()
+        self.assertEqual(self.eventos()[1:], [('expiracion', 'Aceptada', 'Expirada', None)])
+
+        self.admin.post(reverse('eliminar_solicitud', args=[self.solicitud.id]))
+        self.assertEqual(self.eventos()[2:], [('eliminacion', 'Expirada', '', self.usuario.id)])
+
+    def test_los_eventos_sobreviven_a_la_eliminacion(self):
+        self.admin.post(reverse('cambiar_estado', args=[self.solicitud.id]), {'estado': 'Rechazada'})
+        self.admin.post(reverse('eliminar_solicitud', args=[self.solicitud.id]))
+        self.assertFalse(Solicitud.objects.filter(id=self.solicitud.id).exists())
+        self.assertEqual([tipo for tipo, *_ in self.eventos()], ['estado', 'eliminacion'])
+        self.assertEqual(len(linea_de_tiempo(self.solicitud.id)), 2)
+
+    def test_eliminar_usa_el_estado_de_la_fila_bloqueada(self):
+        estadisticas.registrar_alta(self.solicitud)
+        original = views.get_object_or_404
+
+        def leer_y_cambiar(*args, **kwargs):
+            solicitud = original(*args, **kwargs)
+            if not isinstance(args[0], QuerySet):
+                # Otro administrador la acepta justo después de la primera lectura
+                Solicitud.objects.filter(id=solicitud.id).update(estado='Aceptada', fecha_aceptacion=timezone.now())
+                estadisticas.registrar_cambio_estado(Solicitud.objects.get(id=solicitud.id), 'Pendiente')
+            return solicitud
+
+        with mock.patch.object(views, 'get_object_or_404', leer_y_cambiar):
+            self.admin.post(reverse('eliminar_solicitud', args=[self.solicitud.id]))
+        self.assertEqual(self.eventos(), [('eliminacion', 'Aceptada', '', self.usuario.id)])
+        self.assertFalse(ResumenSolicitudes.objects.exclude(cantidad=0).exists())
+
+    def test_el_detalle_muestra_la_linea_de_tiempo_en_orden(self):
+        inicio = timezone.now() - timedelta(days=3)
+        # Insertados fuera de orden: el detalle ordena por created_at
+        for dias, anterior, nuevo in [(2, 'Aceptada', 'Rechazada'), (0, 'Rechazada', 'Pendiente'), (1, 'Pendiente', 'Aceptada')]:
+            SolicitudEvento.objects.create(
+                solicitud=self.solicitud, tipo='estado', estado_anterior=anterior, estado_nuevo=nuevo,
+                usuario=self.usuario, created_at=inicio + timedelta(days=dias),
+            )
+        respuesta = self.admin.get(reverse('detalle_solicitud', args=[self.solicitud.id]))
+        self.assertEqual(
+            [(e.estado_anterior, e.estado_nuevo) for e in respuesta.context['eventos']],
+            [('Rechazada', 'Pendiente'), ('Pendiente', 'Aceptada'), ('Aceptada', 'Rechazada')],
+        )
+        html = respuesta.content.decode()
+        posiciones = [html.index(f'{a} → {n}') for a, n in [('Rechazada', 'Pendiente'), ('Pendiente', 'Aceptada'), ('Aceptada', 'Rechazada')]]
+        self.assertEqual(posiciones, sorted(posiciones))
+        self.assertContains(respuesta, 'admin@mail.cl', count=3)
+
+
+class ValidacionComunaTests(TestCase):
+    def form(self, comuna, region=None):
+        return SolicitudForm({
+            'rut': '12345678-5', 'nombre': 'Ana', 'apellido_paterno': 'Pérez', 'apellido_materno': 'Soto',
+            'direccion': 'Calle 1', 'telefono': '912345678', 'comuna': comuna,
+            'region': get_region_de_comuna('Ñuñoa') if region is None else region,
+        })
+
+    def test_acepta_una_comuna_de_la_region(self):
+        form = self.form('Ñuñoa')
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.cleaned_data['comuna'], Comuna.objects.get(nombre='Ñuñoa'))
+        # La región es opcional
+        self.assertTrue(self.form('Ñuñoa', region='').is_valid())
+
+    def test_normaliza_tildes_mayusculas_y_espacios(self):
+        for escrita in ['nunoa', 'ÑUÑOA', '  ñuñoa ', 'NuÑoa']:
+            with self.subTest(escrita=escrita):
+                form = self.form(escrita)
+                self.assertTrue(form.is_valid(), form.errors)
+                self.assertEqual(form.cleaned_data['comuna'].nombre, 'Ñuñoa')
+        form = self.form('san pedro de la paz', region=get_region_de_comuna('San Pedro de la Paz'))
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.cleaned_data['comuna'].nombre, 'San Pedro de la Paz')
+
+    def test_rechaza_una_comuna_desconocida(self):
+        form = self.form('Gotham')
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors['comuna'], ['"Gotham" no es una comuna de Chile.'])
+
+    def test_rechaza_una_comuna_de_otra_region(self):
+        region = get_region_de_comuna('Temuco')
+        form = self.form('nunoa', region=region)
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors['comuna'], [f'La comuna Ñuñoa no pertenece a la {region}.'])
+        self.assertNotIn('region', form.errors)
+
+    def test_indice_de_comunas(self):
+        indice = IndiceComunas({'Región A': ['Ñuñoa', 'La  Reina'], 'Región B': ['Temuco']})
+        self.assertEqual(indice.comuna_normalizada['nunoa'], 'Ñuñoa')
+        self.assertEqual(indice.comuna_normalizada['la reina'], 'La  Reina')
+        self.assertEqual(indice.region_de_comuna['Temuco'], 'Región B')
+        self.assertEqual(indice.comunas, ('La  Reina', 'Temuco', 'Ñuñoa'))
+        # La huella del JSON cambia con los datos, así la URL del formulario también
+        self.assertNotEqual(indice.huella, IndiceComunas({'Región A': ['Ñuñoa']}).huella)
+
+
+class NormalizarComunasTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.nunoa = Comuna.objects.get(nombre='Ñuñoa')
+        self.santiago = Comuna.objects.get(nombre='Santiago')
+        # Nombres heredados del texto libre que la migración dejó sin región
+        heredadas = {nombre: Comuna.objects.create(nombre=nombre) for nombre in ['NUNOA', 'ñuñoa ', 'santiago', 'Gotham']}
+        self.solicitudes = {}
+        for rut, comuna in [('12345678-5', 'NUNOA'), ('11111111-1', 'ñuñoa '), ('22222222-2', 'santiago'),
+                            ('33333333-3', 'Gotham'), ('44444444-4', None)]:
+            solicitud = crear_solicitud(rut, comuna=heredadas[comuna] if comuna else self.nunoa)
+            estadisticas.registrar_alta(solicitud)
+            self.solicitudes[rut] = solicitud
+
+    def normalizar(self, *opciones):
+        salida = io.StringIO()
+        call_command('normalizar_comunas', *opciones, stdout=salida)
+        return salida.getvalue()
+
+    def comunas(self):
+        return {rut: Solicitud.objects.get(id=s.id).comuna.nombre for rut, s in self.solicitudes.items()}
+
+    def test_reasigna_las_variantes_a_la_comuna_oficial(self):
+        salida = self.normalizar('--dry-run')
+        self.assertIn('Modo dry-run: se corregirían 3 solicitudes', salida)
+        self.assertEqual(Comuna.objects.filter(region__isnull=True).count(), 4)
+
+        salida = self.normalizar()
+        self.assertIn("'NUNOA' -> 'Ñuñoa' (1 solicitudes)", salida)
+        self.assertIn("Comuna desconocida: 'Gotham' (1 solicitudes)", salida)
+        self.assertIn('Solicitudes corregidas: 3', salida)
+        self.assertEqual(self.comunas(), {
+            '12345678-5': 'Ñuñoa', '11111111-1': 'Ñuñoa', '22222222-2': 'Santiago',
+            '33333333-3': 'Gotham', '44444444-4': 'Ñuñoa',
+        })
+        self.assertEqual(list(Comuna.objects.filter(region__isnull=True).values_list('nombre', flat=True)), ['Gotham'])
+        self.assertEqual(Solicitud.objects.get(id=self.solicitudes['11111111-1'].id).comuna.region, self.nunoa.region)
+        por_comuna = {f['comuna_id']: f['total'] for f in estadisticas.totales('comuna_id')}
+        self.assertEqual(por_comuna, {
+            self.nunoa.id: 3, self.santiago.id: 1, self.solicitudes['33333333-3'].comuna_id: 1,
+        })
+
+        # Una segunda pasada no encuentra nada que corregir
+        antes = (self.comunas(), list(Comuna.objects.order_by('id').values_list('id', 'nombre', 'region_id')))
+        self.assertIn('Solicitudes corregidas: 0', self.normalizar())
+        self.assertEqual((self.comunas(), list(Comuna.objects.order_by('id').values_list('id', 'nombre', 'region_id'))), antes)
+
+
+class CacheRutTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = Client()
+        self.admin.force_login(crear_usuario('admin@mail.cl', 'Administrador'))
+
+    def consultar(self, rut_cuerpo):
+        return [(s.id, s.estado) for s in async_to_sync(asolicitudes_por_rut)(rut_cuerpo)[rut_cuerpo]]
+
+    def test_cambiar_estado(self):
+        solicitud = crear_solicitud('12345678-5')
+        self.assertEqual(self.consultar(12345678), [(solicitud.id, 'Pendiente')])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.admin.post(reverse('cambiar_estado', args=[solicitud.id]), {'estado': 'Aceptada'})
+            # Hasta el commit se sigue leyendo la versión anterior
+            self.assertEqual(self.consultar(12345678), [(solicitud.id, 'Pendiente')])
+        self.assertEqual(self.consultar(12345678), [(solicitud.id, 'Aceptada')])
+
+    def test_eliminar_solicitud(self):
+        solicitud = crear_solicitud('12345678-5')
+        self.assertEqual(len(self.consultar(12345678)), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.admin.post(reverse('eliminar_solicitud', args=[solicitud.id]))
+        self.assertEqual(self.consultar(12345678), [])
+
+    def test_eliminar_duplicados(self):
+        original = crear_solicitud('12345678-5')
+        crear_duplicado_heredado('12.345.678-5', 12345678, '5', '11111111-1')
+        self.assertEqual(len(self.consultar(12345678)), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.admin.post(reverse('eliminar_duplicados'))
+        self.assertEqual(self.consultar(12345678), [(original.id, 'Pendiente')])
+
+    def test_expiracion(self):
+        solicitud = crear_solicitud('12345678-5', estado='Aceptada', fecha_aceptacion=timezone.now() - timedelta(days=400))
+        self.assertEqual(self.consultar(12345678), [(solicitud.id, 'Aceptada')])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(expiracion.expirar_solicitudes(), 1)
+        self.assertEqual(self.consultar(12345678), [(solicitud.id, 'Expirada')])
+
+    def test_el_ingreso_reemplaza_la_entrada_negativa(self):
+        self.assertEqual(self.consultar(12345678), [])
+        self.assertEqual(cache.get('rut:12345678'), [])
+        comuna = Comuna.objects.filter(region__isnull=False).select_related('region').order_by('id').first()
+        form = SolicitudForm({
+            'rut': '12.345.678-5', 'nombre': 'Ana', 'apellido_paterno': 'Pérez', 'apellido_materno': 'Soto',
+            'direccion': 'Calle 1', 'telefono': '912345678', 'region': comuna.region.nombre, 'comuna': comuna.nombre,
+        })
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(_guardar_solicitud(form))
+        self.assertEqual(self.consultar(12345678), [(Solicitud.objects.get(rut_cuerpo=12345678).id, 'Pendiente')])
+
+
+class BenchmarkTests(TestCase):
+    def muestras(self, semilla):
+        prueba = benchmark.Benchmark(iteraciones=5, calentamiento=1, semilla=semilla)
+        with transaction.atomic():
+            prueba._preparar()
+            transaction.set_rollback(True)
+        return prueba.ruts, prueba.ids, prueba.comuna.id
+
+    def test_la_semilla_fija_las_muestras(self):
+        benchmark.generar_solicitudes(200, semilla=1)
+        primera = self.muestras(7)
+        self.assertEqual(self.muestras(7), primera)
+        self.assertNotEqual(self.muestras(8), primera)
+        ruts, ids, _ = primera
+        self.assertEqual(len(ids), 7)
+        self.assertEqual(ruts[:7], [Solicitud.objects.get(id=id_).rut for id_ in ids])
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     # Página de inicio
@@ -11,19 +11,34 @@ urlpatterns = [
     
     # Solicitudes - todos los usuarios
     path('ingresar/', views.ingresar_solicitud, name='ingresar_solicitud'),
+    path('ingresar/comprobante/', views.consultar_comprobante, name='consultar_comprobante'),
+    path('regiones-comunas/<str:huella>.json', views.regiones_comunas_json, name='regiones_comunas_json'),
     
     # Vendedor
     path('vendedor/dashboard/', views.dashboard_vendedor, name='dashboard_vendedor'),
     path('vendedor/buscar/', views.buscar_solicitud_vendedor, name='buscar_solicitud_vendedor'),
+    path('vendedor/canjear/<int:solicitud_id>/', views.canjear_solicitud, name='canjear_solicitud'),
+
+    # API JSON para vendedores (autenticación por token)
+    path('api/solicitudes/consulta/', api.consultar_ruts, name='api_consultar_ruts'),
+    path('api/solicitudes/<str:rut>/', api.consultar_rut, name='api_consultar_rut'),
+    path('api/solicitudes/<str:rut>/canjes/', api.canjear_rut, name='api_canjear_rut'),
     
     # Administrador - Solicitudes
     path('administrador/solicitudes/', views.administrar_solicitudes, name='administrar_solicitudes'),
+    path('administrador/solicitudes/buscar/', views.buscar_solicitudes, name='buscar_solicitudes'),
     path('administrador/solicitudes/detalle/<int:solicitud_id>/', views.detalle_solicitud, name='detalle_solicitud'),
     path('administrador/solicitudes/cambiar-estado/<int:solicitud_id>/', views.cambiar_estado_page, name='cambiar_estado_page'),
     path('administrador/solicitudes/cambiar-estado/<int:solicitud_id>/guardar/', views.cambiar_estado, name='cambiar_estado'),
+    path('administrador/solicitudes/cambiar-estado-masivo/', views.cambiar_estado_masivo, name='cambiar_estado_masivo'),
     path('administrador/solicitudes/eliminar/<int:solicitud_id>/', views.eliminar_solicitud, name='eliminar_solicitud'),
     path('administrador/solicitudes/eliminar-duplicados/', views.eliminar_duplicados, name='eliminar_duplicados'),
+    path('administrador/solicitudes/importar/', views.importar_solicitudes, name='importar_solicitudes'),
+    path('administrador/solicitudes/exportar/', views.exportar_solicitudes, name='exportar_solicitudes'),
+    path('administrador/solicitudes/estadisticas/', views.estadisticas_solicitudes, name='estadisticas_solicitudes'),
     
+    path('administrador/metricas/', views.metricas, name='metricas'),
+
     # Administrador - Usuarios
     path('administrador/usuarios/', views.listar_usuarios, name='listar_usuarios'),
     path('administrador/usuarios/crear/', views.crear_usuario, name='crear_usuario'),
@@ -1,25 +1,52 @@
 # Create your views here.
-from django.shortcuts import render, get_object_or_404, redirect
+from datetime import datetime, time
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, aget_object_or_404, get_object_or_404, redirect
+from django.urls import reverse
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.models import User
 from django.contrib import messages
-from django.db.models import Count
-from django.db import IntegrityError
-from django.http import Http404
-from .models import Solicitud
-from .forms import SolicitudForm, BuscarSolicitudForm, CrearUsuarioForm, ReestablecerPasswordForm
+from django.db import IntegrityError, transaction
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.views.decorators.http import require_POST
+from .models import Canje, Solicitud
+from .forms import SolicitudForm, BuscarSolicitudForm, BusquedaSolicitudesForm, FiltroSolicitudesForm, CambioEstadoMasivoForm, ImportarSolicitudesForm, CrearUsuarioForm, ReestablecerPasswordForm
+from .paginacion import paginar_por_cursor
+from .duplicados import eliminar_duplicados as purgar_duplicados
+from .exportacion import FORMATOS, aexportar, exportar
+from .importacion import TAMANO_LOTE, ArchivoInvalido, importar_solicitudes as importar_filas, leer_filas
+from .rut import separar_rut
+from .roles import aroles_de, cargar_roles, roles_de
+from .regiones_comunas import get_indice
+from . import estadisticas
+from .auditoria import linea_de_tiempo, registrar_evento
+from .metricas import registro as registro_metricas
+from .cache_rut import asolicitudes_por_rut, contadores as contadores_cache_rut, invalidar as invalidar_rut
+from .cambio_estado import cambiar_estado_masivo as aplicar_estado_masivo
+from .busqueda import buscar
+from .limites import contadores as contadores_limites, email_enviado, ip_cliente, limitar, rut_enviado
+from .ingreso_diferido import RutEnCola, consultar as consultar_ingreso, datos_de, encolar
+from .canjes import CanjeRechazado, ausados_en, canjear, historial as historial_canjes, periodo_de, usados_en
+from .cache_paginas import cachear_pagina, condicional, contadores as contadores_paginas, por_rol, por_usuario
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
 from django.utils import timezone
 
 # FUNCIONES AUXILIARES
 
 def es_administrador(user):
     """Verifica si el usuario pertenece al grupo Administrador"""
-    return user.groups.filter(name='Administrador').exists()
+    return 'Administrador' in roles_de(user)
 
 def es_vendedor(user):
     """Verifica si el usuario pertenece al grupo Vendedor"""
-    return user.groups.filter(name='Vendedor').exists()
+    return 'Vendedor' in roles_de(user)
+
+async def aes_vendedor(user):
+    """es_vendedor para vistas async, sin pasar a otro hilo"""
+    return 'Vendedor' in await aroles_de(user)
 
 def error_page(request, codigo_error="404", mensaje="Página no encontrada", detalle="Lo sentimos, no pudimos encontrar la página que buscas."):
     """Página de error centralizada"""
@@ -31,25 +58,71 @@ def error_page(request, codigo_error="404", mensaje="Página no encontrada", det
 
 # VISTAS PÚBLICAS
 
+@cachear_pagina(por_rol)
 def index(request):
     return render(request, 'index.html')
 
-def ingresar_solicitud(request):
+def _guardar_solicitud(form):
+    """Valida y guarda en una sola pasada síncrona: la validación consulta la BD y la transacción no admite async"""
+    if not form.is_valid():
+        return False
+    with transaction.atomic():
+        solicitud = form.save()
+        estadisticas.registrar_alta(solicitud)
+        invalidar_rut(solicitud.rut_cuerpo)
+    return True
+
+def _encolar_solicitud(form):
+    """Como _guardar_solicitud, pero anota la solicitud en el diario de ingreso diferido. Retorna el comprobante."""
+    if not form.is_valid():
+        return None
+    return encolar(datos_de(form.save(commit=False)))
+
+@limitar(ingreso_ip=ip_cliente, ingreso_rut=rut_enviado)
+async def ingresar_solicitud(request):
     if request.method == 'POST':
         form = SolicitudForm(request.POST)
-        if form.is_valid():
-            try:
-                form.save()
+        try:
+            if settings.INGRESO_DIFERIDO:
+                comprobante = await sync_to_async(_encolar_solicitud)(form)
+                if comprobante:
+                    messages.success(request, f'Solicitud recibida. Su número de comprobante es {comprobante}.')
+                    return redirect(f"{reverse('consultar_comprobante')}?codigo={comprobante}")
+            elif await sync_to_async(_guardar_solicitud)(form):
                 messages.success(request, 'Solicitud ingresada correctamente.')
                 return redirect('ingresar_solicitud')
-            except IntegrityError:
-                messages.error(request, 'Ya existe una solicitud con ese RUT.')
+        except IntegrityError:
+            messages.error(request, 'Ya existe una solicitud con ese RUT.')
+        except RutEnCola:
+            messages.error(request, 'Ya hay una solicitud con ese RUT en proceso.')
     else:
         form = SolicitudForm()
-    return render(request, 'solicitudes/ingresar_solicitud.html', {'form': form})
+    # La plantilla (navbar) usa el usuario: se carga aquí para no consultar la BD al renderizar
+    request.user = await request.auser()
+    return render(request, 'solicitudes/ingresar_solicitud.html', {
+        'form': form,
+        'huella_comunas': get_indice().huella,
+    })
+
+def consultar_comprobante(request):
+    codigo = request.GET.get('codigo', '').strip().upper()
+    return render(request, 'solicitudes/comprobante.html', {
+        'codigo': codigo,
+        'resultado': consultar_ingreso(codigo) if codigo else None,
+    })
+
+def regiones_comunas_json(request, huella):
+    """Regiones y comunas para el formulario; la URL cambia cuando cambian los datos"""
+    indice = get_indice()
+    if huella != indice.huella:
+        return redirect('regiones_comunas_json', huella=indice.huella)
+    response = HttpResponse(indice.json, content_type='application/json')
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
 
 # AUTENTICACIÓN
 
+@limitar(login_ip=ip_cliente, login_email=email_enviado)
 def login_view(request):
     if request.user.is_authenticated:
         return redirect('index')
@@ -62,6 +135,7 @@ def login_view(request):
         
         if user is not None:
             login(request, user)
+            cargar_roles(request, user)
             messages.success(request, f'Bienvenido, {user.first_name}!')
             
             # Redirigir según rol
@@ -85,38 +159,153 @@ def logout_view(request):
 
 @login_required
 @user_passes_test(es_vendedor, login_url='/')
+@cachear_pagina(por_usuario)
 def dashboard_vendedor(request):
     return render(request, 'vendedor/dashboard.html')
 
 @login_required
-@user_passes_test(es_vendedor, login_url='/')
-def buscar_solicitud_vendedor(request):
+@user_passes_test(aes_vendedor, login_url='/')
+async def buscar_solicitud_vendedor(request):
     solicitudes = []
-    if request.method == 'POST':
-        form = BuscarSolicitudForm(request.POST)
+    request.user = await request.auser()
+    # Por GET llega desde canjear_solicitud, para volver a mostrar el resultado
+    if request.method == 'POST' or 'rut' in request.GET:
+        form = BuscarSolicitudForm(request.POST if request.method == 'POST' else request.GET)
         if form.is_valid():
             rut = form.cleaned_data['rut']
-            solicitudes = list(Solicitud.objects.filter(rut=rut))
+            rut_cuerpo, _ = separar_rut(rut)
+            solicitudes = (await asolicitudes_por_rut(rut_cuerpo))[rut_cuerpo]
             if not solicitudes:
                 messages.info(request, f'No se encontraron solicitudes con el RUT {rut}')
+            usados = await ausados_en([s.id for s in solicitudes if s.estado_efectivo == 'Aceptada'])
+            for solicitud in solicitudes:
+                solicitud.canjes_usados = usados.get(solicitud.id, 0)
     else:
         form = BuscarSolicitudForm()
-    return render(request, 'vendedor/buscar_solicitud.html', {'form': form, 'solicitudes': solicitudes})
+    return render(request, 'vendedor/buscar_solicitud.html', {
+        'form': form,
+        'solicitudes': solicitudes,
+        'cupo_canjes': settings.CANJES_POR_MES,
+    })
+
+@login_required
+@user_passes_test(aes_vendedor, login_url='/')
+@require_POST
+async def canjear_solicitud(request, solicitud_id):
+    request.user = await request.auser()
+    solicitud = await aget_object_or_404(Solicitud, id=solicitud_id)
+    try:
+        await sync_to_async(canjear)(solicitud, request.user)
+        messages.success(request, 'Canje registrado correctamente.')
+    except CanjeRechazado as e:
+        messages.error(request, str(e))
+    return redirect(f"{reverse('buscar_solicitud_vendedor')}?rut={solicitud.rut}")
 
 # ADMINISTRADOR - SOLICITUDES
 
 @login_required
 @user_passes_test(es_administrador, login_url='/')
 def administrar_solicitudes(request):
-    solicitudes = Solicitud.objects.all().order_by('-fecha_solicitud')
-    return render(request, 'administrador/solicitudes/listar.html', {'solicitudes': solicitudes})
+    filtros = FiltroSolicitudesForm(request.GET or None)
+    solicitudes = Solicitud.objects.select_related('comuna').only(
+        'id', 'rut', 'nombre', 'apellido_paterno', 'apellido_materno',
+        'comuna__nombre', 'estado', 'fecha_solicitud', 'fecha_aceptacion'
+    )
+    if filtros.is_bound and filtros.is_valid():
+        solicitudes = solicitudes.filtrar(**filtros.cleaned_data)
+
+    solicitudes, cursor_siguiente, cursor_anterior = paginar_por_cursor(
+        solicitudes, request.GET.get('cursor'), settings.SOLICITUDES_POR_PAGINA
+    )
+
+    # Conserva los filtros activos en los enlaces de paginación
+    parametros = request.GET.copy()
+    parametros.pop('cursor', None)
+    pagina_siguiente = pagina_anterior = None
+    if cursor_siguiente:
+        parametros['cursor'] = cursor_siguiente
+        pagina_siguiente = parametros.urlencode()
+        parametros.pop('cursor')
+    if cursor_anterior:
+        parametros['cursor'] = cursor_anterior
+        pagina_anterior = parametros.urlencode()
+        parametros.pop('cursor')
+
+    return render(request, 'administrador/solicitudes/listar.html', {
+        'solicitudes': solicitudes,
+        'filtros': filtros,
+        'masivo': CambioEstadoMasivoForm(),
+        'pagina_siguiente': pagina_siguiente,
+        'pagina_anterior': pagina_anterior,
+        'primera_pagina': parametros.urlencode(),
+        'es_primera_pagina': pagina_anterior is None,
+    })
+
+@login_required
+@user_passes_test(es_administrador, login_url='/')
+def buscar_solicitudes(request):
+    form = BusquedaSolicitudesForm(request.GET or None)
+    solicitudes, cursor_siguiente = [], None
+    if form.is_bound and form.is_valid():
+        solicitudes, cursor_siguiente = buscar(
+            form.cleaned_data['q'], request.GET.get('cursor'), settings.SOLICITUDES_POR_PAGINA
+        )
+
+    parametros = request.GET.copy()
+    parametros.pop('cursor', None)
+    pagina_siguiente = None
+    if cursor_siguiente:
+        parametros['cursor'] = cursor_siguiente
+        pagina_siguiente = parametros.urlencode()
+        parametros.pop('cursor')
+
+    return render(request, 'administrador/solicitudes/buscar.html', {
+        'form': form,
+        'solicitudes': solicitudes,
+        'pagina_siguiente': pagina_siguiente,
+        'primera_pagina': parametros.urlencode(),
+        'es_primera_pagina': 'cursor' not in request.GET,
+    })
+
+def _version_detalle(request, solicitud_id):
+    """
+    Versión del detalle con una sola consulta. El contenido también cambia sin
+    escribir la fila: con cada canje, al vencer la vigencia y al empezar el mes
+    (se reinicia el cupo de canjes).
+    """
+    ultimo_canje = Canje.objects.filter(solicitud=OuterRef('pk')).order_by('-created_at').values('created_at')[:1]
+    solicitud = (
+        Solicitud.objects.filter(id=solicitud_id)
+        .only('estado', 'fecha_aceptacion', 'fecha_modificacion')
+        .annotate(ultimo_canje=Subquery(ultimo_canje))
+        .first()
+    )
+    if solicitud is None:
+        return None
+    ahora = timezone.now()
+    inicio_mes = timezone.make_aware(datetime.combine(periodo_de(ahora), time.min))
+    cambios = [solicitud.fecha_modificacion, inicio_mes]
+    if solicitud.ultimo_canje:
+        cambios.append(solicitud.ultimo_canje)
+    if solicitud.vigente_hasta and solicitud.vigente_hasta <= ahora:
+        cambios.append(solicitud.vigente_hasta)
+    modificada = max(cambios)
+    etag = f'{solicitud_id}-{modificada.timestamp()}-{settings.CANJES_POR_MES}-{settings.SOLICITUD_VIGENCIA_DIAS}'
+    return etag, modificada
 
 @login_required
 @user_passes_test(es_administrador, login_url='/')
+@condicional(_version_detalle)
 def detalle_solicitud(request, solicitud_id):
     try:
-        solicitud = get_object_or_404(Solicitud, id=solicitud_id)
-        return render(request, 'administrador/solicitudes/detalle.html', {'solicitud': solicitud})
+        solicitud = get_object_or_404(Solicitud.objects.select_related('comuna__region'), id=solicitud_id)
+        return render(request, 'administrador/solicitudes/detalle.html', {
+            'solicitud': solicitud,
+            'eventos': linea_de_tiempo(solicitud.id),
+            'canjes': historial_canjes(solicitud.id),
+            'canjes_mes': usados_en([solicitud.id]).get(solicitud.id, 0),
+            'cupo_canjes': settings.CANJES_POR_MES,
+        })
     except Http404:
         return error_page(
             request,
@@ -133,28 +322,75 @@ def cambiar_estado_page(request, solicitud_id):
 @login_required
 @user_passes_test(es_administrador, login_url='/')
 def cambiar_estado(request, solicitud_id):
-    solicitud = get_object_or_404(Solicitud, id=solicitud_id)
+    get_object_or_404(Solicitud, id=solicitud_id)
     if request.method == 'POST':
         nuevo_estado = request.POST.get('estado')
         if nuevo_estado in dict(Solicitud.ESTADOS).keys():
-            solicitud.estado = nuevo_estado
-            if nuevo_estado == "Aceptada":
-                solicitud.fecha_aceptacion = timezone.now()
-            else:
-                solicitud.fecha_aceptacion = None
-            solicitud.save(update_fields=["estado", "fecha_aceptacion"])
+            with transaction.atomic():
+                # El estado anterior se lee con la fila bloqueada: otro administrador o
+                # la expiración pueden haberlo cambiado, y las estadísticas dependen de él
+                solicitud = get_object_or_404(Solicitud.objects.select_for_update(), id=solicitud_id)
+                estado_anterior = solicitud.estado
+                solicitud.estado = nuevo_estado
+                if nuevo_estado == "Aceptada":
+                    solicitud.fecha_aceptacion = timezone.now()
+                else:
+                    solicitud.fecha_aceptacion = None
+                solicitud.save(update_fields=["estado", "fecha_aceptacion"])
+                estadisticas.registrar_cambio_estado(solicitud, estado_anterior)
+                registrar_evento(solicitud.id, 'estado', estado_anterior, nuevo_estado, request.user)
+                invalidar_rut(solicitud.rut_cuerpo)
             messages.success(request, f'Estado cambiado a {nuevo_estado} correctamente.')
         else:
             messages.error(request, 'Estado inválido.')
     return redirect('administrar_solicitudes')
 
+@login_required
+@user_passes_test(es_administrador, login_url='/')
+def cambiar_estado_masivo(request):
+    # Los filtros llegan en la URL, igual que en el listado; la acción en el POST
+    destino = reverse('administrar_solicitudes')
+    if request.GET:
+        destino += '?' + request.GET.urlencode()
+    if request.method != 'POST':
+        return redirect(destino)
+
+    form = CambioEstadoMasivoForm(request.POST)
+    if not form.is_valid():
+        messages.error(request, next(iter(form.errors.values()))[0])
+        return redirect(destino)
+
+    if form.cleaned_data['ids']:
+        solicitudes = Solicitud.objects.filter(id__in=form.cleaned_data['ids'])
+    else:
+        filtros = FiltroSolicitudesForm(request.GET)
+        if not filtros.is_valid():
+            messages.error(request, 'Filtros inválidos.')
+            return redirect(destino)
+        solicitudes = Solicitud.objects.filtrar(**filtros.cleaned_data)
+
+    nuevo_estado = form.cleaned_data['estado']
+    resumen = aplicar_estado_masivo(solicitudes, nuevo_estado, usuario=request.user)
+    if resumen:
+        detalle = ', '.join(f'{estado}: {cantidad}' for estado, cantidad in sorted(resumen.items()))
+        messages.success(request, f'Se cambiaron {resumen.total()} solicitudes a {nuevo_estado} ({detalle}).')
+    else:
+        messages.info(request, 'Ninguna solicitud coincide con la selección.')
+    return redirect(destino)
+
 @login_required
 @user_passes_test(es_administrador, login_url='/')
 def eliminar_solicitud(request, solicitud_id):
     try:
         solicitud = get_object_or_404(Solicitud, id=solicitud_id)
         if request.method == 'POST':
-            solicitud.delete()
+            with transaction.atomic():
+                # Igual que en cambiar_estado: el estado registrado y descontado es el de la fila bloqueada
+                solicitud = get_object_or_404(Solicitud.objects.select_for_update(), id=solicitud_id)
+                registrar_evento(solicitud.id, 'eliminacion', solicitud.estado, usuario=request.user)
+                solicitud.delete()
+                estadisticas.registrar_baja(solicitud)
+                invalidar_rut(solicitud.rut_cuerpo)
             messages.success(request, 'Solicitud eliminada correctamente.')
             return redirect('administrar_solicitudes')
         return render(request, 'administrador/solicitudes/eliminar_confirmacion.html', {'solicitud': solicitud})
@@ -168,18 +404,7 @@ def eliminar_solicitud(request, solicitud_id):
 @login_required
 @user_passes_test(es_administrador, login_url='/')
 def eliminar_duplicados(request):
-    duplicados = Solicitud.objects.values('rut').annotate(cantidad=Count('id')).filter(cantidad__gt=1)
-    total_eliminados = 0
-    
-    for item in duplicados:
-        rut = item['rut']
-        solicitudes = Solicitud.objects.filter(rut=rut).order_by('fecha_solicitud')
-        primera = solicitudes.first()
-        if primera:
-            dobles = solicitudes.exclude(pk=primera.pk)
-            count = dobles.count()
-            dobles.delete()
-            total_eliminados += count
+    total_eliminados = purgar_duplicados(usuario=request.user)
     
     if total_eliminados > 0:
         messages.success(request, f'Se eliminaron {total_eliminados} solicitudes duplicadas.')
@@ -188,6 +413,91 @@ def eliminar_duplicados(request):
     
     return redirect('administrar_solicitudes')
 
+@login_required
+@user_passes_test(es_administrador, login_url='/')
+def importar_solicitudes(request):
+    resultado = None
+    if request.method == 'POST':
+        form = ImportarSolicitudesForm(request.POST, request.FILES)
+        if form.is_valid():
+            archivo = form.cleaned_data['archivo']
+            errores = []
+
+            def registrar_error(fila, rut, mensaje):
+                # Solo se muestran las primeras filas rechazadas
+                if len(errores) < 200:
+                    errores.append({'fila': fila, 'rut': rut, 'mensaje': mensaje})
+
+            try:
+                creadas, rechazadas = importar_filas(
+                    leer_filas(archivo.file, archivo.name),
+                    tamano_lote=form.cleaned_data['lote'] or TAMANO_LOTE,
+                    al_error=registrar_error,
+                )
+            except ArchivoInvalido as e:
+                messages.error(request, str(e))
+            else:
+                resultado = {'creadas': creadas, 'rechazadas': rechazadas, 'errores': errores}
+                messages.success(request, f'Se importaron {creadas} solicitudes.')
+    else:
+        form = ImportarSolicitudesForm()
+    return render(request, 'administrador/solicitudes/importar.html', {'form': form, 'resultado': resultado})
+
+@login_required
+@user_passes_test(es_administrador, login_url='/')
+def exportar_solicitudes(request):
+    filtros = FiltroSolicitudesForm(request.GET)
+    if not filtros.is_valid():
+        messages.error(request, 'Filtros de exportación inválidos.')
+        return redirect('administrar_solicitudes')
+
+    formato = request.GET.get('formato', 'csv')
+    if formato not in FORMATOS:
+        formato = 'csv'
+
+    solicitudes = Solicitud.objects.filtrar(**filtros.cleaned_data)
+    # Bajo ASGI solo un iterador async se envía a medida que se genera
+    contenido = aexportar(solicitudes, formato) if isinstance(request, ASGIRequest) else exportar(solicitudes, formato)
+    response = StreamingHttpResponse(contenido, content_type=FORMATOS[formato])
+    response['Content-Disposition'] = f'attachment; filename="solicitudes.{formato}"'
+    return response
+
+@login_required
+@user_passes_test(es_administrador, login_url='/')
+def estadisticas_solicitudes(request):
+    por_estado = estadisticas.totales_por_estado()
+    return render(request, 'administrador/solicitudes/estadisticas.html', {
+        'por_estado': [(estado, por_estado.get(estado, 0)) for estado, _ in Solicitud.ESTADOS],
+        'total': sum(por_estado.values()),
+        'por_region': estadisticas.totales('comuna__region__nombre').order_by('-total'),
+        'por_comuna': estadisticas.totales('comuna__nombre').order_by('-total')[:20],
+        'por_mes': estadisticas.totales('mes').order_by('-mes')[:12],
+        'cache_rut': contadores_cache_rut(),
+    })
+
+@login_required
+@user_passes_test(es_administrador, login_url='/')
+def metricas(request):
+    cache_rut = contadores_cache_rut()
+    texto = registro_metricas.exponer() + (
+        '# HELP descuentogas_cache_rut_total Búsquedas por RUT según si estaban en caché.\n'
+        '# TYPE descuentogas_cache_rut_total counter\n'
+        f'descuentogas_cache_rut_total{{resultado="acierto"}} {cache_rut["aciertos"]}\n'
+        f'descuentogas_cache_rut_total{{resultado="fallo"}} {cache_rut["fallos"]}\n'
+        '# HELP descuentogas_limite_total Peticiones evaluadas por cada regla de límite, en este proceso.\n'
+        '# TYPE descuentogas_limite_total counter\n'
+    ) + ''.join(
+        f'descuentogas_limite_total{{regla="{regla}",resultado="{resultado}"}} {n}\n'
+        for (regla, resultado), n in contadores_limites.valores()
+    ) + (
+        '# HELP descuentogas_pagina_total Páginas servidas desde el caché o con GET condicional, en este proceso.\n'
+        '# TYPE descuentogas_pagina_total counter\n'
+    ) + ''.join(
+        f'descuentogas_pagina_total{{vista="{vista}",resultado="{resultado}"}} {n}\n'
+        for (vista, resultado), n in contadores_paginas.valores()
+    )
+    return HttpResponse(texto, content_type='text/plain; version=0.0.4; charset=utf-8')
+
 # ADMINISTRADOR - USUARIOS
 
 @login_required
@@ -257,8 +567,11 @@ def eliminar_usuario(request, usuario_id):
 # PERFIL DE USUARIO (TODOS LOS AUTENTICADOS)
 
 @login_required
+@cachear_pagina(por_usuario)
 def perfil_usuario(request):
-    return render(request, 'perfil/ver_perfil.html', {'usuario': request.user})
+    # Solo los roles, que son parte de la clave del caché (no todos los grupos)
+    roles = sorted(roles_de(request.user))
+    return render(request, 'perfil/ver_perfil.html', {'usuario': request.user, 'roles': roles})
 
 @login_required
 def cambiar_password_propia(request):
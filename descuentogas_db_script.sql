@@ -8,81 +8,25 @@ DESCRIBE descuentogasapp_solicitud;
 
 SELECT * FROM descuentogasapp_solicitud;
 
-INSERT INTO descuentogasapp_solicitud (rut, nombre, apellido_paterno, apellido_materno, direccion, telefono, comuna, fecha_solicitud, estado) 
-VALUES ('87654321-2', 'Antonio', 'Villegas', 'Pereira', 'Sanhuesa 123', '912345687', 'Purranque', NOW() , 'Pendiente');
-
--- PARA PRUEBAS
--- Primero, habilitar el Event Scheduler
-SET GLOBAL event_scheduler = ON;
-
--- Crear el evento que se ejecutará cada minuto para verificar solicitudes expiradas
--- DELIMITER //
-
--- CREATE EVENT check_expired_requests
--- ON SCHEDULE EVERY 1 MINUTE
--- DO
--- BEGIN
-    -- UPDATE descuentogasapp_solicitud 
-    -- SET estado = 'EXPIRADA'
-    -- WHERE estado = 'ACEPTADA'
-    -- AND TIMESTAMPADD(MINUTE, 2, fecha_aceptacion) <= NOW();
--- END //
-
--- DELIMITER ;
-
--- **************************************************
--- **************************************************
-
--- (Opcional) eliminar evento antiguo
-DROP EVENT IF EXISTS check_expired_requests;
-
--- Evento para pruebas (marca EXPIRADA si fecha_aceptacion + 2 minutos <= ahora(UTC))
-DELIMITER //
-CREATE EVENT check_expired_requests
-ON SCHEDULE EVERY 1 MINUTE
-DO
-BEGIN
-    UPDATE descuentogasapp_solicitud
-    SET estado = 'Expirada'
-    WHERE estado = 'Aceptada'
-      AND fecha_aceptacion IS NOT NULL
-      AND TIMESTAMPADD(MINUTE, 2, fecha_aceptacion) <= UTC_TIMESTAMP();
-END //
-DELIMITER ;
-
--- ***************************************************
--- ***************************************************
-
--- PARA CADA 1 MES
--- Habilitar Event Scheduler
--- SET GLOBAL event_scheduler = ON;
-
--- DELIMITER //
-
--- CREATE EVENT check_expired_requests
--- ON SCHEDULE EVERY 1 DAY
--- DO
--- BEGIN
-    -- UPDATE descuentogasapp_solicitud 
-    -- SET estado = 'EXPIRADA'
-    -- WHERE estado = 'ACEPTADA'
-    -- AND TIMESTAMPADD(MONTH, 1, fecha_aceptacion) <= UTC_TIMESTAMP();
--- END //
-
--- DELIMITER ;
-
--- ***************************************************
--- ***************************************************
--- Ver eventos existentes
-SHOW EVENTS;
-
--- Desactivar el evento si es necesario
-ALTER EVENT check_expired_requests DISABLE;
-
--- Activar el evento
-ALTER EVENT check_expired_requests ENABLE;
-
--- Eliminar el evento si necesitas recrearlo
+-- Regiones y comunas las carga `python manage.py migrate` (0008_poblar_region_comuna);
+-- la solicitud referencia la comuna por su id. El RUT va en formato canónico
+-- (cuerpo sin puntos, guion y DV en mayúscula) junto a rut_cuerpo y rut_dv.
+-- Un INSERT directo no pasa por Django: luego ejecutar
+--   python manage.py reconstruir_indice_busqueda
+--   python manage.py reconstruir_estadisticas
+INSERT INTO descuentogasapp_solicitud (rut, rut_cuerpo, rut_dv, nombre, apellido_paterno, apellido_materno, direccion, telefono, comuna_id, fecha_solicitud, fecha_modificacion, estado)
+SELECT '87654321-4', 87654321, '4', 'Antonio', 'Villegas', 'Pereira', 'Sanhuesa 123', '912345687', c.id, UTC_TIMESTAMP(), UTC_TIMESTAMP(), 'Pendiente'
+FROM descuentogasapp_comuna c
+JOIN descuentogasapp_region r ON r.id = c.region_id
+WHERE c.nombre = 'Purranque' AND r.nombre = 'Región de Los Lagos';
+
+-- EXPIRACIÓN
+-- La realiza el comando de Django (vigencia: SOLICITUD_VIGENCIA_DIAS), que
+-- además ajusta las estadísticas, el historial de eventos, fecha_modificacion
+-- y el caché por RUT. Programarlo con cron, por ejemplo una vez al día:
+--   0 3 * * * cd /ruta/descuentoGas && .venv/bin/python manage.py expirar_solicitudes
+-- El antiguo EVENT de MySQL cambiaba el estado directamente y dejaba todo eso
+-- desalineado; si sigue creado en la base de datos, eliminarlo:
 DROP EVENT IF EXISTS check_expired_requests;
 
 -- ************************************************